@@ -1,7 +1,8 @@
-
 from datetime import date, timedelta
-from models import Document, Company
-from notifications import send_email, send_whatsapp
+from models import Document
+from extensions import db
+from outbox import enqueue, dedup_key
+from queries import documents_query
 
 def build_message(docs, title):
     lines = [title, "" ]
@@ -10,30 +11,56 @@ def build_message(docs, title):
         lines.append(f"- {emp} | {d.tipo.nome if d.tipo else ''} | {d.descricao or ''} | vence: {d.data_vencimento}")
     return "\n".join(lines)
 
-def send_alerts():
-    hoje = date.today()
+def _split(s):
+    return [x.strip() for x in (s or "").split(";") if x.strip()]
+
+def collect_alerts(hoje=None):
+    """
+    Agrupa os documentos vencidos / a vencer por janela e empresa numa única consulta.
+    Retorna lista de (titulo, company, docs) — company já carregada via JOIN.
+    """
+    hoje = hoje or date.today()
     em_7 = hoje + timedelta(days=7)
     em_30 = hoje + timedelta(days=30)
+    titles = ("Documentos Vencidos", "Documentos a vencer (7 dias)", "Documentos a vencer (30 dias)")
+
+    docs = (documents_query()
+            .filter(Document.data_vencimento <= em_30)
+            .order_by(Document.data_vencimento.asc())
+            .all())
+    groups = {}
+    for d in docs:
+        dv = d.data_vencimento
+        title = titles[0] if dv < hoje else (titles[1] if dv <= em_7 else titles[2])
+        groups.setdefault((title, d.company_id or 0), []).append(d)
 
-    sets = [
-        ("Documentos Vencidos", Document.query.filter(Document.data_vencimento < hoje).all()),
-        ("Documentos a vencer (7 dias)", Document.query.filter(Document.data_vencimento >= hoje, Document.data_vencimento <= em_7).all()),
-        ("Documentos a vencer (30 dias)", Document.query.filter(Document.data_vencimento > em_7, Document.data_vencimento <= em_30).all()),
-    ]
+    out = []
+    for title in titles:
+        for (t, cid), items in groups.items():
+            if t == title:
+                out.append((title, items[0].company if cid else None, items))
+    return out
 
-    for title, docs in sets:
-        if not docs: continue
-        by_company = {}
-        for d in docs:
-            cid = d.company_id or 0
-            by_company.setdefault(cid, []).append(d)
-        for cid, items in by_company.items():
-            comp = Company.query.get(cid) if cid else None
-            message = build_message(items, title)
-            emails = (comp.alert_email or "").split(";") if comp else []
-            whats = (comp.alert_whatsapp or "").split(";") if comp else []
-            if emails:
-                send_email(emails, f"[Alertas] {title}", message)
-            if whats:
-                for w in whats:
-                    send_whatsapp(w.strip(), message)
+def send_alerts(hoje=None):
+    """
+    Enfileira na outbox os alertas do dia; o envio fica com outbox.drain.
+    Deduplica por (canal, destino, empresa, janela, documentos, dia), então
+    disparos repetidos no mesmo dia não geram mensagens novas.
+    Retorna quantas mensagens novas foram enfileiradas.
+    """
+    hoje = hoje or date.today()
+    novas = 0
+    for title, comp, items in collect_alerts(hoje):
+        if comp is None: continue
+        message = build_message(items, title)
+        doc_ids = ",".join(str(d.id) for d in items)
+        to_emails = _split(comp.alert_email)
+        if to_emails:
+            destino = ";".join(to_emails)
+            key = dedup_key("email", destino, comp.id, title, doc_ids, hoje)
+            novas += enqueue("email", destino, message, subject=f"[Alertas] {title}", key=key) is not None
+        for w in _split(comp.alert_whatsapp):
+            key = dedup_key("whatsapp", w, comp.id, title, doc_ids, hoje)
+            novas += enqueue("whatsapp", w, message, key=key) is not None
+    db.session.commit()
+    return novas
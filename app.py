@@ -1,4 +1,6 @@
 import os
+from datetime import timedelta
+import click
 from flask import Flask
 from extensions import db, login_manager, migrate
 from dotenv import load_dotenv
@@ -21,13 +23,28 @@ def create_app():
     )
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["UPLOAD_FOLDER"] = os.getenv("UPLOAD_FOLDER", "uploads")
+    # Entrega de uploads: "" (Flask), "x-accel" (nginx) ou "x-sendfile" (Apache/lighttpd)
+    app.config["UPLOAD_OFFLOAD"] = os.getenv("UPLOAD_OFFLOAD", "").lower()
+    app.config["UPLOAD_ACCEL_PREFIX"] = os.getenv("UPLOAD_ACCEL_PREFIX", "/_protected_uploads/")
+    app.config["USE_X_SENDFILE"] = app.config["UPLOAD_OFFLOAD"] == "x-sendfile"
+    # Teto de qualquer requisição; arquivos maiores vão em partes (/uploads/parcial)
+    app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("MAX_UPLOAD_MB", "32")) * 1024 * 1024
     app.config["SESSION_PERMANENT"] = False
+    app.config["DASHBOARD_CACHE_TTL"] = int(os.getenv("DASHBOARD_CACHE_TTL", "60"))
 
     # Extensões
     db.init_app(app)
     login_manager.init_app(app)
     migrate.init_app(app, db)
 
+    # Auditoria gravada em lote por uma thread
+    from audit import init_audit
+    init_audit(app)
+
+    # Métricas por endpoint, N+1 e perfis de requisições lentas (INSTRUMENTATION=1)
+    from instrumentation import init_instrumentation
+    init_instrumentation(app)
+
     # Blueprints (importar AQUI para evitar ciclos)
     from blueprints.auth.routes import auth_bp
     from blueprints.main.routes import main_bp
@@ -105,17 +122,114 @@ def create_app():
         return p
     app.jinja_env.filters["norm_upload"] = norm_upload
 
-    # Agendador de alertas
+    # Helper de paginação por cursor usado em templates/_pagination.html
+    from pagination import page_url
+    app.jinja_env.globals["page_url"] = page_url
+
+    # Upload acima do limite: volta ao formulário com aviso em vez da página 413 crua
+    from flask import flash, redirect, request
+    from werkzeug.exceptions import RequestEntityTooLarge
+    from blobstore import UploadTooLarge, UploadError
+
+    @app.errorhandler(RequestEntityTooLarge)
+    @app.errorhandler(UploadTooLarge)
+    @app.errorhandler(UploadError)
+    def _upload_rejected(e):
+        from extensions import db
+        db.session.rollback()
+        if isinstance(e, RequestEntityTooLarge):
+            msg = f"Arquivo maior que o limite de {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB por envio."
+        else:
+            msg = str(e)
+        if request.accept_mimetypes.best == "application/json" or request.is_json:
+            return {"erro": msg}, 413 if not isinstance(e, UploadError) else 400
+        flash(msg, "danger")
+        return redirect(request.referrer or request.url)
+
+    # Agendador de alertas (não sobe nos processos filhos do pool de PDFs)
+    import multiprocessing
+    if multiprocessing.parent_process() is not None:
+        return app
+
     from alerts import send_alerts
+    from outbox import drain, format_report
+
+    def drain_outbox():
+        report = drain()
+        if any(report[s] for s in ("enviado", "pendente", "falhou")):
+            app.logger.info("Outbox: %s", format_report(report))
+        return report
+
+    # os jobs rodam na thread do APScheduler: precisam de app context p/ o banco
+    def _daily_alerts():
+        with app.app_context():
+            send_alerts()
+            drain_outbox()
+
+    def _drain_outbox():
+        with app.app_context():
+            drain_outbox()
+
     sched = BackgroundScheduler(timezone=timezone("America/Sao_Paulo"))
     sched.add_job(
-        send_alerts, "cron", hour=8, minute=0, id="daily_alerts", replace_existing=True
+        _daily_alerts, "cron", hour=8, minute=0, id="daily_alerts", replace_existing=True
+    )
+    sched.add_job(
+        _drain_outbox, "interval", seconds=int(os.getenv("OUTBOX_INTERVAL", "30")),
+        id="outbox", replace_existing=True, max_instances=1, coalesce=True,
+    )
+    from search import index_pending
+
+    def _index_search():
+        with app.app_context():
+            index_pending()
+
+    sched.add_job(
+        _index_search, "interval", seconds=int(os.getenv("SEARCH_INDEX_INTERVAL", "60")),
+        id="search_index", replace_existing=True, max_instances=1, coalesce=True,
+    )
+    from blueprints.pdv import spooler
+
+    def _print_spool():
+        with app.app_context():
+            spooler.drain()
+
+    sched.add_job(
+        _print_spool, "interval", seconds=int(os.getenv("PRINT_POLL_SECONDS", "5")),
+        id="print_spool", replace_existing=True, max_instances=1, coalesce=True,
     )
+    from blueprints.pdv import cash
+
+    # refaz o resumo do caixa de ontem (corrige lançamentos alterados direto no banco)
+    def _rebuild_cash():
+        with app.app_context():
+            ontem = cash.today() - timedelta(days=1)
+            cash.rebuild(ontem, ontem)
+
+    sched.add_job(
+        _rebuild_cash, "cron", hour=0, minute=30, id="cash_rebuild", replace_existing=True
+    )
+    retention_days = int(os.getenv("AUDIT_RETENTION_DAYS", "0"))
+    if retention_days > 0:
+        from audit import archive_old
+
+        def _archive_audit():
+            with app.app_context():
+                archive_old(retention_days, _audit_archive_dir(app))
+
+        sched.add_job(
+            _archive_audit, "cron", hour=3, minute=0, id="audit_archive", replace_existing=True
+        )
     sched.start()
+    app.extensions["scheduler"] = sched
 
     return app
 
 
+def _audit_archive_dir(app):
+    return os.path.join(app.root_path, os.getenv("AUDIT_ARCHIVE_DIR", "audit_archive"))
+
+
 # Loader do usuário
 from models import User
 
@@ -166,5 +280,94 @@ def init_data():
     print("Dados iniciais criados. Login: admin / admin123")
 
 
+
+# Arquivamento da auditoria antiga (gzip JSONL mensal)
+@app.cli.command("audit-archive")
+@click.option("--days", type=int, default=lambda: int(os.getenv("AUDIT_RETENTION_DAYS", "365")),
+              help="Arquiva registros com mais de N dias.")
+def audit_archive(days):
+    from audit import archive_old
+    n = archive_old(days, _audit_archive_dir(app))
+    print(f"{n} registro(s) de auditoria arquivado(s) em {_audit_archive_dir(app)}")
+
+
+# Exportação em lote das fichas de colaboradores
+@app.cli.command("export-fichas")
+@click.option("--company-id", type=int, default=None, help="Somente desta empresa.")
+@click.option("--ativo", type=click.Choice(["1", "0"]), default=None, help="1 = ativos, 0 = inativos.")
+@click.option("--formato", type=click.Choice(["zip", "pdf"]), default="zip")
+@click.option("--saida", type=click.Path(dir_okay=False), default=None, help="Arquivo de saída.")
+def export_fichas(company_id, ativo, formato, saida):
+    import time
+    from werkzeug.datastructures import MultiDict
+    from blueprints.hr.routes import _employees_filtered
+    from models import Employee
+
+    args = MultiDict({k: v for k, v in {"company_id": company_id, "ativo": ativo}.items() if v is not None})
+    query = _employees_filtered(args).order_by(Employee.nome, Employee.id)
+    saida = saida or f"fichas_colaboradores.{formato}"
+    t0 = time.perf_counter()
+    if formato == "pdf":
+        from pdf_reports import employees_pdf
+        with open(saida, "wb") as fh:
+            employees_pdf(fh, app, query.yield_per(200))
+        print(f"{saida} gerado em {time.perf_counter() - t0:.1f}s")
+        return
+
+    from ficha_export import render_parallel, zip_stream
+    emps = query.all()
+
+    def progress(n, total, emp_id, secs):
+        print(f"[{n}/{total}] colaborador {emp_id} ({secs:.2f}s)")
+
+    with open(saida, "wb") as fh:
+        for chunk in zip_stream(render_parallel(emps, app), total=len(emps), on_progress=progress):
+            fh.write(chunk)
+    print(f"{saida}: {len(emps)} ficha(s) em {time.perf_counter() - t0:.1f}s")
+
+
+# Limpeza do armazenamento de uploads (arquivos sem referência)
+@app.cli.command("uploads-gc")
+@click.option("--migrar-legado", is_flag=True, help="Converte arquivos antigos (prefixo uuid) para o formato por hash.")
+@click.option("--dry-run", is_flag=True, help="Só mostra o que seria removido.")
+@click.option("--grace-hours", type=int, default=1, help="Não remove blobs mais novos que isso.")
+def uploads_gc(migrar_legado, dry_run, grace_hours):
+    import blobstore
+    if migrar_legado and not dry_run:
+        n, freed = blobstore.migrate_legacy()
+        print(f"{n} arquivo(s) convertido(s); {freed / 1024 / 1024:.1f} MB de duplicatas liberados")
+    n, freed = blobstore.gc(grace_hours=grace_hours, dry_run=dry_run)
+    verb = "seriam removido(s)" if dry_run else "removido(s)"
+    print(f"{n} arquivo(s) órfão(s) {verb}; {freed / 1024 / 1024:.1f} MB")
+
+@app.cli.command("search-reindex")
+@click.option("--tudo", is_flag=True, help="Reindexa tudo (ex.: após instalar o pypdf).")
+def search_reindex(tudo):
+    from search import index_pending, reindex_terms
+    from models import SearchDoc
+    if tudo:
+        SearchDoc.query.update({"pending": True, "error": None, "body": None}, synchronize_session=False)
+        db.session.commit()
+        reindex_terms()
+        print("Busca de colaboradores/empresas reindexada.")
+    total = 0
+    while True:
+        n = index_pending(limit=500)
+        if not n: break
+        total += n
+        print(f"{total} indexado(s)...")
+    print(f"Índice de busca em dia ({total} item(ns) processado(s)).")
+
+# Reconstrução do resumo diário do caixa (PDV)
+@app.cli.command("pdv-resumo")
+@click.option("--de", "de", type=click.DateTime(["%Y-%m-%d"]), required=True)
+@click.option("--ate", "ate", type=click.DateTime(["%Y-%m-%d"]), default=None, help="Padrão: igual a --de.")
+def pdv_resumo(de, ate):
+    from blueprints.pdv import cash
+    de = de.date()
+    ate = ate.date() if ate else de
+    n = cash.rebuild(de, ate)
+    print(f"Resumo do caixa refeito de {de:%d/%m/%Y} a {ate:%d/%m/%Y}: {n} linha(s).")
+
 if __name__ == "__main__":
     app.run()
@@ -1,11 +1,180 @@
-
-import json
+import atexit, gzip, json, os, queue, threading, time
+from datetime import datetime, timedelta
 from flask_login import current_user
 from extensions import db
 from models import AuditLog
 
+# Escrita assíncrona da auditoria: log_action só enfileira; uma thread grava
+# em lote (um INSERT multi-linha + um commit) quando junta AUDIT_BATCH_SIZE
+# registros ou a cada AUDIT_FLUSH_INTERVAL segundos. Fila limitada: se encher,
+# quem chama grava o lote na hora (não perde registro nem cresce sem limite).
+# Falha no banco: o lote fica em _pending e é regravado no próximo ciclo.
+
+class AuditWriter:
+    MAX_RETRIES = 3     # depois disso o lote é gravado um a um (isola o registro com problema)
+
+    def __init__(self, app, batch_size=100, interval=2.0, max_buffer=5000):
+        self.app = app
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_buffer = max_buffer
+        self.queue = queue.Queue(maxsize=max_buffer)
+        self._lock = threading.Lock()   # serializa gravações (thread x flush manual)
+        self._pending = []              # já retirados da fila e ainda não gravados (sob _lock)
+        self._failures = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, row):
+        try:
+            self.queue.put_nowait(row)
+            if self.queue.qsize() >= self.batch_size:
+                self._wake.set()
+            return
+        except queue.Full:
+            pass
+        # fila cheia: grava na hora; erro de banco não pode derrubar a requisição
+        self.flush()
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self._pending.append(row)
+                self._trim()
+
+    def _drain(self, limit=None):
+        rows = []
+        while limit is None or len(rows) < limit:
+            try: rows.append(self.queue.get_nowait())
+            except queue.Empty: break
+        return rows
+
+    def _write(self, rows):
+        if not rows: return
+        with self.app.app_context():
+            with db.engine.begin() as conn:
+                conn.execute(AuditLog.__table__.insert(), rows)
+
+    def _trim(self):
+        """Banco fora por muito tempo: limita a memória descartando os mais antigos (com log)."""
+        excess = len(self._pending) - self.max_buffer
+        if excess > 0:
+            self.app.logger.error("Auditoria: %d registro(s) descartado(s) por falta de gravação: %s",
+                                  excess, self._pending[:excess])
+            del self._pending[:excess]
+
+    def _write_pending(self):
+        """Grava _pending (com _lock). Em falha mantém os registros e devolve False."""
+        try:
+            self._write(self._pending)
+        except Exception as e:
+            self._failures += 1
+            self.app.logger.error("Auditoria: falha ao gravar %d registro(s) (tentativa %d): %s",
+                                  len(self._pending), self._failures, e)
+            if self._failures < self.MAX_RETRIES:
+                self._trim()
+                return False
+            failed = []
+            for row in self._pending:
+                try: self._write([row])
+                except Exception: failed.append(row)
+            if len(failed) == len(self._pending):   # banco fora: nada gravou, tenta de novo depois
+                self._trim()
+                return False
+            if failed:
+                self.app.logger.error("Auditoria: %d registro(s) recusado(s) pelo banco e descartado(s): %s",
+                                      len(failed), failed)
+        self._pending = []
+        self._failures = 0
+        return True
+
+    def flush(self):
+        """Grava imediatamente o lote em andamento e tudo o que estiver na fila. False se o banco falhou."""
+        with self._lock:
+            while True:
+                if not self._pending:
+                    self._pending = self._drain(self.batch_size)
+                    if not self._pending:
+                        return True
+                if not self._write_pending():
+                    return False
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+_writer = None
+
+def init_audit(app):
+    """Liga o gravador assíncrono (chamado em create_app)."""
+    global _writer
+    if os.getenv("AUDIT_ASYNC", "1") != "1":
+        return
+    _writer = AuditWriter(
+        app,
+        batch_size=int(os.getenv("AUDIT_BATCH_SIZE", "100")),
+        interval=float(os.getenv("AUDIT_FLUSH_INTERVAL", "2")),
+        max_buffer=int(os.getenv("AUDIT_BUFFER_MAX", "5000")),
+    )
+    _writer.start()
+
+def flush():
+    if _writer: _writer.flush()
+
 def log_action(action, entity, entity_id, payload=None):
     username = getattr(current_user, "username", "system")
-    log = AuditLog(user=username, action=action, entity=entity, entity_id=entity_id, payload=json.dumps(payload or {}))
-    db.session.add(log)
+    row = dict(user=username, action=action, entity=entity, entity_id=entity_id,
+               payload=json.dumps(payload or {}), created_at=datetime.utcnow())
+    if _writer:
+        _writer.put(row)
+        return
+    # sem gravador (AUDIT_ASYNC=0): grava na hora, como antes
+    db.session.add(AuditLog(**row))
     db.session.commit()
+
+def archive_old(days, dest_dir, chunk=1000):
+    """
+    Move registros com mais de `days` dias para arquivos mensais
+    <dest_dir>/audit-AAAA-MM.jsonl.gz (um JSON por linha) e os apaga da tabela.
+    Processa em blocos de `chunk` linhas por id; cada bloco é gravado no
+    arquivo antes de ser apagado. Retorna quantos registros foram arquivados.
+    """
+    flush()
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    os.makedirs(dest_dir, exist_ok=True)
+    total, last_id = 0, 0
+    while True:
+        rows = (AuditLog.query
+                .filter(AuditLog.created_at < cutoff, AuditLog.id > last_id)
+                .order_by(AuditLog.id).limit(chunk).all())
+        if not rows: break
+        by_month = {}
+        for r in rows:
+            by_month.setdefault(r.created_at.strftime("%Y-%m"), []).append(r)
+        for month, items in by_month.items():
+            # modo "at" acrescenta um novo membro gzip; o arquivo continua legível por inteiro
+            with gzip.open(os.path.join(dest_dir, f"audit-{month}.jsonl.gz"), "at", encoding="utf-8") as fh:
+                for r in items:
+                    fh.write(json.dumps({
+                        "id": r.id, "user": r.user, "action": r.action, "entity": r.entity,
+                        "entity_id": r.entity_id, "payload": r.payload,
+                        "created_at": r.created_at.isoformat(),
+                    }, ensure_ascii=False) + "\n")
+        last_id = rows[-1].id
+        AuditLog.query.filter(AuditLog.id.in_([r.id for r in rows])).delete(synchronize_session=False)
+        db.session.commit()
+        total += len(rows)
+    return total
@@ -0,0 +1,276 @@
+import hashlib, json, os, re, tempfile, uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from werkzeug.utils import secure_filename
+from extensions import db
+from models import UploadBlob, Document, EmployeeDocument, Employee
+
+# Armazenamento de uploads endereçado por conteúdo.
+# Cada arquivo é gravado uma única vez em <uploads>/<subdir>/<h[:2]>/<sha256><ext>;
+# o hash é calculado enquanto o upload é copiado para o disco. UploadBlob guarda
+# o contador de referências; gc() recalcula esse contador a partir das colunas
+# que apontam para arquivos e remove o que ficou órfão.
+
+CHUNK = 1024 * 1024
+PARTIAL_DIR = "_partial"
+_PARTIAL_ID = re.compile(r"^[0-9a-f]{32}$")
+
+class UploadTooLarge(ValueError):
+    """Upload acima do limite do tipo de arquivo."""
+    def __init__(self, limit):
+        super().__init__(f"Arquivo maior que o limite de {limit // (1024 * 1024)} MB.")
+        self.limit = limit
+
+class UploadError(ValueError):
+    """Envio em partes inválido (sessão inexistente, offset errado, tipo não aceito...)."""
+
+def max_bytes(filename):
+    """Limite por tipo: UPLOAD_MAX_PDF_MB (padrão 200) e UPLOAD_MAX_IMAGE_MB (padrão 15)."""
+    ext = os.path.splitext(str(filename or ""))[1].lower()
+    if ext in (".jpg", ".jpeg", ".png"):
+        mb = os.getenv("UPLOAD_MAX_IMAGE_MB", "15")
+    else:
+        mb = os.getenv("UPLOAD_MAX_PDF_MB", "200")
+    return int(mb) * 1024 * 1024
+
+# colunas que guardam caminhos de upload
+REFERENCES = [
+    (Document, "arquivo_path"),
+    (EmployeeDocument, "arquivo_path"),
+    (Employee, "foto_path"),
+]
+
+def upload_root():
+    return os.path.join(current_app.root_path, current_app.config.get("UPLOAD_FOLDER", "uploads"))
+
+def norm(rel):
+    rel = str(rel or "").replace("\\", "/").lstrip("/")
+    return rel[len("uploads/"):] if rel.startswith("uploads/") else rel
+
+def write_stream(stream, dst_dir, limit=None):
+    """
+    Copia `stream` em blocos para um temporário em dst_dir. Retorna (tmp, sha256, tamanho).
+    Passou de `limit` bytes: apaga o temporário e levanta UploadTooLarge.
+    """
+    os.makedirs(dst_dir, exist_ok=True)
+    h, size = hashlib.sha256(), 0
+    fd, tmp = tempfile.mkstemp(dir=dst_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                buf = stream.read(CHUNK)
+                if not buf: break
+                size += len(buf)
+                if limit is not None and size > limit:
+                    raise UploadTooLarge(limit)
+                h.update(buf); out.write(buf)
+    except Exception:
+        os.unlink(tmp)
+        raise
+    os.chmod(tmp, 0o644)  # mkstemp cria 0600; o arquivo final precisa ser legível
+    return tmp, h.hexdigest(), size
+
+def _place(tmp, digest, size, subdir, ext):
+    """Move o temporário para o caminho do hash (ou descarta, se já existir) e conta a referência."""
+    rel = f"{subdir}/{digest[:2]}/{digest}{ext}"
+    dst = os.path.join(upload_root(), rel)
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.exists(dst):
+        os.unlink(tmp)
+    else:
+        os.replace(tmp, dst)
+    blob = UploadBlob.query.filter_by(path=rel).first()
+    if blob:
+        blob.refcount += 1
+    else:
+        db.session.add(UploadBlob(path=rel, sha256=digest, size=size, refcount=1))
+    return rel
+
+def store(storage, subdir):
+    """Grava um FileStorage deduplicado. Retorna o caminho relativo a /uploads."""
+    ext = os.path.splitext(secure_filename(storage.filename))[1].lower()
+    tmp, digest, size = write_stream(storage.stream, os.path.join(upload_root(), subdir),
+                                     limit=max_bytes(storage.filename))
+    return _place(tmp, digest, size, subdir, ext)
+
+# ---------------------- envio em partes (retomável) ----------------------
+# O navegador cria a sessão (partial_create), manda o arquivo em pedaços com
+# o offset atual (partial_append) e, se a conexão cair, pergunta onde parou
+# (partial_info) e continua dali. Completo, o formulário envia só o id e a
+# rota chama store_partial, que calcula o hash e entra no armazenamento normal.
+
+def _partial_paths(upload_id):
+    if not _PARTIAL_ID.match(str(upload_id or "")):
+        raise UploadError("Envio não encontrado.")
+    base = os.path.join(upload_root(), PARTIAL_DIR, upload_id)
+    return base + ".part", base + ".json"
+
+def _partial_meta(upload_id, user):
+    data, meta = _partial_paths(upload_id)
+    try:
+        with open(meta, encoding="utf-8") as fh:
+            info = json.load(fh)
+    except (OSError, ValueError):
+        raise UploadError("Envio não encontrado.")
+    if info.get("user") != user:
+        raise UploadError("Envio não encontrado.")
+    return data, info
+
+def partial_create(filename, size, user):
+    """Abre uma sessão de envio. Retorna o id."""
+    from utils import ALLOWED_EXTENSIONS
+    ext = os.path.splitext(secure_filename(filename or ""))[1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        raise UploadError("Tipo de arquivo não permitido.")
+    limit = max_bytes(filename)
+    if size < 0 or size > limit:
+        raise UploadTooLarge(limit)
+    upload_id = uuid.uuid4().hex
+    data, meta = _partial_paths(upload_id)
+    os.makedirs(os.path.dirname(data), exist_ok=True)
+    open(data, "wb").close()
+    with open(meta, "w", encoding="utf-8") as fh:
+        json.dump({"filename": filename, "ext": ext, "size": size, "user": user}, fh)
+    return upload_id
+
+def partial_info(upload_id, user):
+    """(bytes recebidos, tamanho total)."""
+    data, info = _partial_meta(upload_id, user)
+    return os.path.getsize(data), info["size"]
+
+def partial_append(upload_id, user, offset, stream, sha256=None):
+    """
+    Acrescenta um pedaço a partir de `offset` (precisa ser o tamanho atual).
+    `sha256` opcional confere o pedaço; se não bater, ele é descartado.
+    Retorna o novo offset.
+    """
+    data, info = _partial_meta(upload_id, user)
+    with open(data, "r+b") as out:
+        out.seek(0, os.SEEK_END)
+        start = out.tell()
+        if offset != start:
+            raise UploadError(f"Offset {offset} inválido; recebido até {start}.")
+        h = hashlib.sha256()
+        try:
+            while True:
+                buf = stream.read(CHUNK)
+                if not buf: break
+                if out.tell() + len(buf) > info["size"]:
+                    raise UploadError("Pedaço além do tamanho declarado.")
+                h.update(buf); out.write(buf)
+            if sha256 and h.hexdigest() != sha256.lower():
+                raise UploadError("Pedaço corrompido (sha256 não confere).")
+        except Exception:
+            out.truncate(start)
+            raise
+        return out.tell()
+
+def store_partial(upload_id, user, subdir):
+    """Leva um envio completo para o armazenamento por hash. Retorna o caminho relativo."""
+    data, info = _partial_meta(upload_id, user)
+    if os.path.getsize(data) != info["size"]:
+        raise UploadError("Envio incompleto.")
+    h = hashlib.sha256()
+    with open(data, "rb") as fh:
+        for buf in iter(lambda: fh.read(CHUNK), b""):
+            h.update(buf)
+    os.chmod(data, 0o644)
+    # o próprio .part vira o arquivo final (mesmo disco: só renomeia)
+    rel = _place(data, h.hexdigest(), info["size"], subdir, info["ext"])
+    try: os.unlink(_partial_paths(upload_id)[1])
+    except OSError: pass
+    return rel
+
+def _gc_partials(cutoff):
+    """Apaga envios em partes abandonados (sem atividade desde `cutoff`)."""
+    d = os.path.join(upload_root(), PARTIAL_DIR)
+    if not os.path.isdir(d): return
+    for name in os.listdir(d):
+        p = os.path.join(d, name)
+        try:
+            if datetime.utcfromtimestamp(os.path.getmtime(p)) < cutoff:
+                os.unlink(p)
+        except OSError:
+            pass
+
+def release(rel):
+    """Uma referência a menos (o arquivo só é apagado pelo gc)."""
+    rel = norm(rel)
+    if not rel: return
+    blob = UploadBlob.query.filter_by(path=rel).first()
+    if blob and blob.refcount > 0:
+        blob.refcount -= 1
+
+def _referenced():
+    refs = {}
+    for model, col in REFERENCES:
+        for (p,) in db.session.query(getattr(model, col)).filter(getattr(model, col).isnot(None)):
+            p = norm(p)
+            if p: refs[p] = refs.get(p, 0) + 1
+    return refs
+
+def _remove(rel):
+    from images import VARIANTS, derivative_path
+    paths = [os.path.join(upload_root(), rel)] + [derivative_path(current_app, rel, v) for v in VARIANTS]
+    for p in paths:
+        try: os.unlink(p)
+        except OSError: pass
+
+def migrate_legacy():
+    """
+    Converte arquivos antigos (prefixo uuid) para o formato por hash,
+    unificando cópias idênticas e atualizando as referências no banco.
+    Retorna (arquivos convertidos, bytes liberados).
+    """
+    root = upload_root()
+    moved, freed = 0, 0
+    for rel in list(_referenced()):
+        if UploadBlob.query.filter_by(path=rel).first():
+            continue
+        src = os.path.join(root, rel)
+        if not os.path.isfile(src):
+            continue
+        subdir = rel.split("/", 1)[0]
+        ext = os.path.splitext(rel)[1].lower()
+        with open(src, "rb") as fh:
+            tmp, digest, size = write_stream(fh, os.path.join(root, subdir))
+        new_rel = f"{subdir}/{digest[:2]}/{digest}{ext}"
+        existed = os.path.exists(os.path.join(root, new_rel))
+        _place(tmp, digest, size, subdir, ext)
+        for model, col in REFERENCES:
+            model.query.filter(getattr(model, col).in_([rel, "uploads/" + rel])).update(
+                {col: new_rel}, synchronize_session=False)
+        _remove(rel)
+        moved += 1
+        freed += size if existed else 0
+    _recount(_referenced())
+    db.session.commit()
+    return moved, freed
+
+def _recount(refs):
+    blobs = UploadBlob.query.all()
+    for blob in blobs:
+        blob.refcount = refs.get(blob.path, 0)
+    return blobs
+
+def gc(grace_hours=1, dry_run=False):
+    """
+    Recalcula os contadores a partir do banco e apaga blobs sem referência
+    criados há mais de `grace_hours` (protege uploads em andamento).
+    Retorna (removidos, bytes liberados).
+    """
+    refs = _referenced()
+    cutoff = datetime.utcnow() - timedelta(hours=grace_hours)
+    removed, freed = 0, 0
+    for blob in _recount(refs):
+        if blob.refcount == 0 and (blob.created_at or cutoff) <= cutoff:
+            removed += 1; freed += blob.size or 0
+            if not dry_run:
+                _remove(blob.path)
+                db.session.delete(blob)
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+        _gc_partials(datetime.utcnow() - timedelta(hours=max(grace_hours, 24)))
+    return removed, freed
@@ -1,10 +1,17 @@
 
-from flask import Blueprint, render_template, redirect, url_for, flash, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, abort, Response
 from flask_login import login_required
-from utils import admin_required, save_file
+from utils import admin_required
+from blobstore import write_stream, max_bytes
 from alerts import send_alerts
-from models import AuditLog
-import os, shutil
+from models import AuditLog, OutboxMessage
+from pagination import keyset_paginate
+import outbox
+import audit as audit_log
+import instrumentation
+import os
+from datetime import datetime, time, timedelta
+from extensions import db
 
 admin_bp = Blueprint("admin", __name__, template_folder='../../templates/admin')
 
@@ -12,16 +19,91 @@ admin_bp = Blueprint("admin", __name__, template_folder='../../templates/admin')
 @login_required
 @admin_required
 def trigger_alerts():
-    send_alerts()
-    flash("Alertas disparados.", "success")
-    return redirect(url_for("main.index"))
+    novas = send_alerts()
+    _wake_outbox()
+    flash(f"Alertas enfileirados: {novas} mensagem(ns) nova(s). O envio segue em segundo plano.", "success")
+    return redirect(url_for("admin.outbox_status"))
+
+def _wake_outbox():
+    """Antecipa o próximo ciclo do worker da outbox (não bloqueia a requisição)."""
+    sched = current_app.extensions.get("scheduler")
+    if sched and sched.get_job("outbox"):
+        sched.modify_job("outbox", next_run_time=datetime.now(sched.timezone))
+
+@admin_bp.route("/outbox")
+@login_required
+@admin_required
+def outbox_status():
+    status = request.args.get("status", "")
+    query = OutboxMessage.query
+    if status: query = query.filter_by(status=status)
+    page = keyset_paginate(query, OutboxMessage.created_at, OutboxMessage.id, request.args, descending=True)
+    ultimo = None
+    if outbox.last_report:
+        quando, report = outbox.last_report
+        ultimo = dict(quando=quando, resumo=outbox.format_report(report),
+                      falhas=[f for canal in report.values() if isinstance(canal, dict) for f in canal["failed"]])
+    return render_template("admin/outbox.html", items=page.items, page=page, status=status,
+                           stats=outbox.stats(), ultimo=ultimo)
+
+@admin_bp.route("/outbox/<int:msg_id>/reenviar", methods=["POST"])
+@login_required
+@admin_required
+def outbox_retry(msg_id):
+    outbox.retry(msg_id)
+    _wake_outbox()
+    flash("Mensagem recolocada na fila.", "success")
+    return redirect(url_for("admin.outbox_status", status=request.args.get("status", "")))
 
 @admin_bp.route("/auditoria")
 @login_required
 @admin_required
 def audit():
-    logs = AuditLog.query.order_by(AuditLog.created_at.desc()).limit(500).all()
-    return render_template("admin/audit.html", logs=logs)
+    audit_log.flush()
+    user = request.args.get("user", "").strip()
+    entity = request.args.get("entity", "").strip()
+    entity_id = request.args.get("entity_id", type=int)
+    de, ate = _parse_date(request.args.get("de")), _parse_date(request.args.get("ate"))
+
+    query = AuditLog.query
+    if user: query = query.filter(AuditLog.user == user)
+    if entity: query = query.filter(AuditLog.entity == entity)
+    if entity_id is not None: query = query.filter(AuditLog.entity_id == entity_id)
+    if de: query = query.filter(AuditLog.created_at >= datetime.combine(de, time.min))
+    if ate: query = query.filter(AuditLog.created_at < datetime.combine(ate + timedelta(days=1), time.min))
+    page = keyset_paginate(query, AuditLog.created_at, AuditLog.id, request.args, descending=True)
+
+    entities = [e for (e,) in db.session.query(AuditLog.entity).distinct().order_by(AuditLog.entity) if e]
+    return render_template("admin/audit.html", logs=page.items, page=page, entities=entities,
+                           user=user, entity=entity, entity_id=entity_id,
+                           de=request.args.get("de", ""), ate=request.args.get("ate", ""))
+
+@admin_bp.route("/desempenho", methods=["GET", "POST"])
+@login_required
+@admin_required
+def performance():
+    cfg = current_app.extensions.get("instrumentation")
+    if request.method == "POST" and cfg:
+        cfg["registry"].reset()
+        flash("Métricas zeradas.", "success")
+        return redirect(url_for("admin.performance"))
+    rows, n_plus_one = cfg["registry"].snapshot() if cfg else ([], [])
+    return render_template("admin/performance.html", cfg=cfg, rows=rows, n_plus_one=n_plus_one,
+                           profiles=instrumentation.profiles(cfg["profile_dir"]) if cfg else [])
+
+@admin_bp.route("/desempenho/perfil/<name>")
+@login_required
+@admin_required
+def performance_profile(name):
+    cfg = current_app.extensions.get("instrumentation")
+    text = instrumentation.profile_summary(cfg["profile_dir"], name) if cfg else None
+    if text is None:
+        abort(404)
+    return Response(text, mimetype="text/plain")
+
+def _parse_date(s):
+    try: return datetime.strptime(s, "%Y-%m-%d").date()
+    except (TypeError, ValueError): return None
 
 @admin_bp.route("/config", methods=["GET","POST"])
 @login_required
@@ -37,19 +119,12 @@ def settings():
     form = SettingsForm()
     if form.validate_on_submit():
         msgs=[]
-        if form.logo_sidebar.data:
-            p = save_file(form.logo_sidebar.data, "branding")
-            if p:
-                src = os.path.join(current_app.root_path, p)
-                dst = os.path.join(current_app.root_path, "static", "img", "logo.png")
-                os.makedirs(os.path.dirname(dst), exist_ok=True)
-                shutil.copyfile(src, dst); msgs.append("Logo da sidebar atualizada.")
-        if form.logo_login.data:
-            p = save_file(form.logo_login.data, "branding")
-            if p:
-                src = os.path.join(current_app.root_path, p)
-                dst = os.path.join(current_app.root_path, "static", "img", "logo-login.png")
-                os.makedirs(os.path.dirname(dst), exist_ok=True)
-                shutil.copyfile(src, dst); msgs.append("Logo da tela de login atualizada.")
+        img_dir = os.path.join(current_app.root_path, "static", "img")
+        # grava direto no destino (sem cópia intermediária em uploads/branding)
+        for field, name, msg in ((form.logo_sidebar, "logo.png", "Logo da sidebar atualizada."),
+                                 (form.logo_login, "logo-login.png", "Logo da tela de login atualizada.")):
+            if field.data and field.data.filename:
+                tmp, _, _ = write_stream(field.data.stream, img_dir, limit=max_bytes(name))
+                os.replace(tmp, os.path.join(img_dir, name)); msgs.append(msg)
         flash(" ".join(msgs) if msgs else "Nenhum arquivo enviado.", "success" if msgs else "info")
     return render_template("admin/settings.html", form=form)
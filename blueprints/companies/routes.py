@@ -6,7 +6,10 @@ from models import Company
 from forms import CompanyForm
 from audit import log_action
 from pdf_reports import company_pdf as _company_pdf
-import io, requests
+from pagination import keyset_paginate
+import pdf_cache
+import search as fulltext
+import requests
 
 companies_bp = Blueprint("companies", __name__, template_folder='../../templates/companies')
 
@@ -16,10 +19,11 @@ def list():
     q = request.args.get("q","").strip()
     query = Company.query
     if q:
-        like = f"%{q}%"
-        query = query.filter((Company.razao_social.ilike(like)) | (Company.nome_fantasia.ilike(like)) | (Company.cnpj.ilike(like)))
-    items = query.order_by(Company.razao_social).all()
-    return render_template("companies/list.html", items=items, q=q)
+        # razão social, fantasia e CNPJ, sem acento e por prefixo (índice search_term)
+        cond = fulltext.name_filter("company", Company.id, q)
+        query = query.filter(cond if cond is not None else Company.razao_social.ilike(f"%{q}%"))
+    page = keyset_paginate(query, Company.razao_social, Company.id, request.args)
+    return render_template("companies/list.html", items=page.items, page=page, q=q)
 
 @companies_bp.route("/new", methods=["GET","POST"])
 @login_required
@@ -42,6 +46,7 @@ def edit(company_id):
         for f in form:
             if hasattr(c, f.name): setattr(c, f.name, f.data)
         db.session.commit(); log_action("update","Company", c.id, {"cnpj": c.cnpj})
+        pdf_cache.invalidate("company", c.id)
         flash("Empresa atualizada.", "success")
         return redirect(url_for("companies.list"))
     return render_template("companies/form.html", form=form, title="Editar Empresa")
@@ -50,10 +55,10 @@ def edit(company_id):
 @login_required
 def company_pdf(company_id):
     c = Company.query.get_or_404(company_id)
-    bio = io.BytesIO()
-    _company_pdf(bio, current_app, c)
-    bio.seek(0)
-    return send_file(bio, as_attachment=True, download_name=f"empresa_{c.id}.pdf", mimetype="application/pdf")
+    path, etag = pdf_cache.get_or_render("company", c, lambda buf: _company_pdf(buf, current_app, c))
+    resp = send_file(path, as_attachment=True, download_name=f"empresa_{c.id}.pdf", mimetype="application/pdf", etag=etag)
+    resp.cache_control.private = True
+    return resp
 
 @companies_bp.route("/api/cnpj/<cnpj>")
 @login_required
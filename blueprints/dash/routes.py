@@ -1,26 +1,90 @@
-
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, current_app
 from flask_login import login_required
+from sqlalchemy import event, func, case
+from sqlalchemy.orm import Session
+from extensions import db
 from models import Document, Employee
 from datetime import date, timedelta
+import threading, time
 
 dash_bp = Blueprint("dash", __name__, template_folder='../../templates')
 
-@dash_bp.route("/dash")
-@login_required
-def dashboard():
-    hoje = date.today(); em_30 = hoje + timedelta(days=30)
-    docs_venc = Document.query.filter(Document.data_vencimento != None, Document.data_vencimento < hoje).count()
-    docs_avencer = Document.query.filter(Document.data_vencimento != None, Document.data_vencimento >= hoje, Document.data_vencimento <= em_30).count()
-    aso_venc = Employee.query.filter(Employee.aso_validade != None, Employee.aso_validade < hoje).count()
-    aso_avencer = Employee.query.filter(Employee.aso_validade != None, Employee.aso_validade >= hoje, Employee.aso_validade <= em_30).count()
-    tox_venc = Employee.query.filter(Employee.exame_toxico_validade != None, Employee.exame_toxico_validade < hoje).count()
-    tox_avencer = Employee.query.filter(Employee.exame_toxico_validade != None, Employee.exame_toxico_validade >= hoje, Employee.exame_toxico_validade <= em_30).count()
-    total_func = Employee.query.count()
-    ativos = Employee.query.filter_by(ativo=True).count()
-    inativos = total_func - ativos
-    return render_template("dashboard.html",
+# Cache em memória dos contadores do painel (por processo).
+# Expira após DASHBOARD_CACHE_TTL segundos, na virada do dia ou quando
+# algum Employee/Document é gravado (depois do commit: antes dele outra
+# requisição ainda leria o estado antigo e o guardaria por todo o TTL).
+# `gen` muda a cada invalidação; um cálculo que começou antes não é guardado.
+_cache = {"data": None, "at": 0.0, "day": None, "gen": 0}
+_cache_lock = threading.Lock()
+
+def invalidate_dashboard_cache():
+    with _cache_lock:
+        _cache["data"] = None
+        _cache["gen"] += 1
+
+@event.listens_for(Session, "after_flush")
+def _mark_write(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (Employee, Document)):
+            session.info["_dash_dirty"] = True
+            return
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    if session.info.pop("_dash_dirty", False):
+        invalidate_dashboard_cache()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("_dash_dirty", None)
+
+def _count_between(col, lo=None, hi=None):
+    cond = col.isnot(None)
+    if lo is not None: cond = cond & (col >= lo)
+    if hi is not None: cond = cond & (col <= hi)
+    return func.coalesce(func.sum(case((cond, 1), else_=0)), 0)
+
+def _count_before(col, limit):
+    return func.coalesce(func.sum(case(((col.isnot(None)) & (col < limit), 1), else_=0)), 0)
+
+def _compute_counts(hoje):
+    em_30 = hoje + timedelta(days=30)
+    docs_venc, docs_avencer = db.session.query(
+        _count_before(Document.data_vencimento, hoje),
+        _count_between(Document.data_vencimento, hoje, em_30),
+    ).one()
+    aso_venc, aso_avencer, tox_venc, tox_avencer, total_func, ativos = db.session.query(
+        _count_before(Employee.aso_validade, hoje),
+        _count_between(Employee.aso_validade, hoje, em_30),
+        _count_before(Employee.exame_toxico_validade, hoje),
+        _count_between(Employee.exame_toxico_validade, hoje, em_30),
+        func.count(Employee.id),
+        func.coalesce(func.sum(case((Employee.ativo == True, 1), else_=0)), 0),
+    ).one()
+    return dict(
         docs_venc=docs_venc, docs_avencer=docs_avencer,
         aso_venc=aso_venc, aso_avencer=aso_avencer,
         tox_venc=tox_venc, tox_avencer=tox_avencer,
-        total_func=total_func, ativos=ativos, inativos=inativos)
+        total_func=total_func, ativos=ativos, inativos=total_func - ativos,
+    )
+
+def dashboard_counts():
+    hoje = date.today()
+    ttl = current_app.config.get("DASHBOARD_CACHE_TTL", 60)
+    now = time.monotonic()
+    with _cache_lock:
+        data = _cache["data"]
+        if data is not None and _cache["day"] == hoje and now - _cache["at"] < ttl:
+            return data
+        gen = _cache["gen"]
+    data = _compute_counts(hoje)
+    if ttl > 0:
+        with _cache_lock:
+            if _cache["gen"] == gen:
+                _cache.update(data=data, at=now, day=hoje)
+    return data
+
+@dash_bp.route("/dash")
+@login_required
+def dashboard():
+    return render_template("dashboard.html", **dashboard_counts())
@@ -2,16 +2,46 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, current_app
 from flask_login import login_required
 from extensions import db
-from models import Document, DocumentType, Company
+from models import Document, DocumentType, Company, EmployeeDocument
 from forms import DocumentForm, DocTypeForm
-from utils import save_file
+from utils import save_file, uploaded
+from blobstore import release
 from audit import log_action
 from pdf_reports import documents_pdf as _documents_pdf
-import io
+from pagination import keyset_paginate
+from queries import documents_query
+import search as fulltext
+import tempfile
 from datetime import date, datetime as _dt, timedelta
 
 documents_bp = Blueprint("documents", __name__, template_folder='../../templates/documents')
 
+PDF_SPOOL_MAX = 8 * 1024 * 1024  # acima disso o PDF vai para disco
+
+def _parse_date(s):
+    try: return _dt.strptime(s, "%Y-%m-%d").date()
+    except (TypeError, ValueError): return None
+
+def _filtered_query(args):
+    """Monta a consulta de documentos com todos os filtros aplicados no banco."""
+    company_id = args.get("company_id", type=int)
+    tipo_id = args.get("tipo_id", type=int)
+    status = args.get("status", "")
+    q = args.get("q","").strip()
+    d1, d2 = _parse_date(args.get("venc_de")), _parse_date(args.get("venc_ate"))
+
+    query = documents_query()
+    if company_id: query = query.filter(Document.company_id == company_id)
+    if tipo_id: query = query.filter(Document.tipo_id == tipo_id)
+    if q:
+        like = f"%{q}%"
+        query = query.filter((Document.descricao.ilike(like)) | (Document.numero.ilike(like)) | (Document.orgao_emissor.ilike(like)) | (Document.responsavel.ilike(like)))
+    cond = Document.status_filter(status)
+    if cond is not None: query = query.filter(cond)
+    if d1: query = query.filter(Document.data_vencimento >= d1)
+    if d2: query = query.filter(Document.data_vencimento <= d2)
+    return query.order_by(Document.data_vencimento.asc())
+
 @documents_bp.route("/")
 @login_required
 def list():
@@ -22,33 +52,27 @@ def list():
     venc_de = request.args.get("venc_de")
     venc_ate = request.args.get("venc_ate")
 
-    query = Document.query
-    if company_id: query = query.filter_by(company_id=company_id)
-    if tipo_id: query = query.filter_by(tipo_id=tipo_id)
-    if q:
-        like = f"%{q}%"
-        query = query.filter((Document.descricao.ilike(like)) | (Document.numero.ilike(like)) | (Document.orgao_emissor.ilike(like)) | (Document.responsavel.ilike(like)))
-    docs = query.order_by(Document.data_vencimento.asc()).all()
-
-    if status:
-        tmp=[]
-        for d in docs:
-            st = d.status
-            if status=="vencido" and st=="Vencido": tmp.append(d)
-            elif status=="a_vencer" and st=="A vencer": tmp.append(d)
-            elif status=="vigente" and st=="Vigente": tmp.append(d)
-        docs = tmp
-
-    def parse_date(s):
-        try: return _dt.strptime(s,"%Y-%m-%d").date()
-        except: return None
-    d1, d2 = parse_date(venc_de), parse_date(venc_ate)
-    if d1: docs = [d for d in docs if d.data_vencimento and d.data_vencimento >= d1]
-    if d2: docs = [d for d in docs if d.data_vencimento and d.data_vencimento <= d2]
+    page = keyset_paginate(_filtered_query(request.args), Document.data_vencimento, Document.id,
+                           request.args, nullable=True)
 
     companies = Company.query.order_by(Company.razao_social).all()
     tipos = DocumentType.query.order_by(DocumentType.nome).all()
-    return render_template("documents/list.html", items=docs, companies=companies, tipos=tipos, company_id=company_id, tipo_id=tipo_id, status=status, q=q, venc_de=venc_de, venc_ate=venc_ate)
+    return render_template("documents/list.html", items=page.items, page=page, companies=companies, tipos=tipos, company_id=company_id, tipo_id=tipo_id, status=status, q=q, venc_de=venc_de, venc_ate=venc_ate)
+
+@documents_bp.route("/busca")
+@login_required
+def search():
+    """Busca no conteúdo dos arquivos e nos metadados (documentos da empresa e dos colaboradores)."""
+    q = request.args.get("q", "").strip()
+    kind = request.args.get("tipo", "")
+    hits = fulltext.search(q, kind=kind or None, limit=100)
+    docs = {d.id: d for d in documents_query().filter(
+        Document.id.in_([h.ref_id for h in hits if h.kind == "document"]))}
+    emp_docs = {d.id: d for d in EmployeeDocument.query.filter(
+        EmployeeDocument.id.in_([h.ref_id for h in hits if h.kind == "employee_document"]))}
+    results = [(h, docs.get(h.ref_id) if h.kind == "document" else emp_docs.get(h.ref_id)) for h in hits]
+    return render_template("documents/search.html", q=q, tipo=kind,
+                           results=[(h, obj) for h, obj in results if obj is not None])
 
 @documents_bp.route("/new", methods=["GET","POST"])
 @login_required
@@ -58,8 +82,8 @@ def new():
     form.tipo_id.choices = [(t.id, t.nome) for t in DocumentType.query.order_by(DocumentType.nome)]
     if form.validate_on_submit():
         d = Document(**{k:getattr(form,k).data for k in ("company_id","tipo_id","descricao","numero","orgao_emissor","responsavel","data_expedicao","data_vencimento")})
-        if form.arquivo.data:
-            d.arquivo_path = save_file(form.arquivo.data, "docs")
+        if uploaded(form.arquivo):
+            d.arquivo_path = save_file(uploaded(form.arquivo), "docs")
         db.session.add(d); db.session.commit()
         log_action("create","Document", d.id, {"descricao": d.descricao})
         flash("Documento criado.", "success")
@@ -76,8 +100,9 @@ def edit(doc_id):
     if form.validate_on_submit():
         for f in form:
             if hasattr(d, f.name): setattr(d, f.name, f.data)
-        if form.arquivo.data:
-            d.arquivo_path = save_file(form.arquivo.data, "docs")
+        if uploaded(form.arquivo):
+            release(d.arquivo_path)
+            d.arquivo_path = save_file(uploaded(form.arquivo), "docs")
         db.session.commit()
         log_action("update","Document", d.id, {"descricao": d.descricao})
         flash("Documento atualizado.", "success")
@@ -113,60 +138,28 @@ def tipos_edit(tid):
         return redirect(url_for("documents.tipos"))
     return render_template("documents/type_form.html", form=form, title="Editar Tipo de Documento")
 
+def _send_documents_pdf(query, titulo, download_name):
+    """Gera o PDF lendo o banco em lotes e grava num arquivo temporário (memória limitada)."""
+    tmp = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX)
+    _documents_pdf(tmp, current_app, query.yield_per(500), titulo=titulo)
+    tmp.seek(0)
+    return send_file(tmp, as_attachment=True, download_name=download_name, mimetype="application/pdf")
+
 @documents_bp.route("/exportar.pdf")
 @login_required
 def export_pdf_filtered():
-    company_id = request.args.get("company_id", type=int)
-    tipo_id = request.args.get("tipo_id", type=int)
-    status = request.args.get("status", "")
-    q = request.args.get("q","").strip()
-    de = request.args.get("venc_de"); ate = request.args.get("venc_ate")
-
-    query = Document.query
-    if company_id: query = query.filter(Document.company_id == int(company_id))
-    if tipo_id: query = query.filter(Document.tipo_id == int(tipo_id))
-    if q:
-        like = f"%{q}%"
-        query = query.filter((Document.descricao.ilike(like)) | (Document.numero.ilike(like)) | (Document.orgao_emissor.ilike(like)) | (Document.responsavel.ilike(like)))
-    docs = query.order_by(Document.data_vencimento.asc()).all()
-
-    from datetime import datetime as _dt
-    if status:
-        tmp = []
-        for d in docs:
-            st = d.status
-            if status == "vencido" and st == "Vencido": tmp.append(d)
-            elif status == "a_vencer" and st == "A vencer": tmp.append(d)
-            elif status == "vigente" and st == "Vigente": tmp.append(d)
-        docs = tmp
-    def parse_date(s):
-        try: return _dt.strptime(s, "%Y-%m-%d").date()
-        except: return None
-    d1, d2 = parse_date(de), parse_date(ate)
-    if d1: docs = [d for d in docs if d.data_vencimento and d.data_vencimento >= d1]
-    if d2: docs = [d for d in docs if d.data_vencimento and d.data_vencimento <= d2]
-
-    bio = io.BytesIO()
-    _documents_pdf(bio, current_app, docs, titulo="Documentos (filtro aplicado)")
-    bio.seek(0)
-    return send_file(bio, as_attachment=True, download_name="documentos_filtro.pdf", mimetype="application/pdf")
+    return _send_documents_pdf(_filtered_query(request.args), "Documentos (filtro aplicado)", "documentos_filtro.pdf")
 
 @documents_bp.route("/exportar_vencidos.pdf")
 @login_required
 def export_pdf_vencidos():
     hoje = date.today()
-    docs = Document.query.filter(Document.data_vencimento < hoje).order_by(Document.data_vencimento.asc()).all()
-    bio = io.BytesIO()
-    _documents_pdf(bio, current_app, docs, titulo="Documentos Vencidos")
-    bio.seek(0)
-    return send_file(bio, as_attachment=True, download_name="documentos_vencidos.pdf", mimetype="application/pdf")
+    query = documents_query().filter(Document.data_vencimento < hoje).order_by(Document.data_vencimento.asc())
+    return _send_documents_pdf(query, "Documentos Vencidos", "documentos_vencidos.pdf")
 
 @documents_bp.route("/exportar_a_vencer.pdf")
 @login_required
 def export_pdf_a_vencer():
     hoje = date.today(); em_30 = hoje + timedelta(days=30)
-    docs = Document.query.filter(Document.data_vencimento >= hoje, Document.data_vencimento <= em_30).order_by(Document.data_vencimento.asc()).all()
-    bio = io.BytesIO()
-    _documents_pdf(bio, current_app, docs, titulo="Documentos a Vencer (30 dias)")
-    bio.seek(0)
-    return send_file(bio, as_attachment=True, download_name="documentos_a_vencer.pdf", mimetype="application/pdf")
+    query = documents_query().filter(Document.data_vencimento >= hoje, Document.data_vencimento <= em_30).order_by(Document.data_vencimento.asc())
+    return _send_documents_pdf(query, "Documentos a Vencer (30 dias)", "documentos_a_vencer.pdf")
@@ -1,20 +1,50 @@
 # blueprints/hr/routes.py
 from flask import (
     Blueprint, render_template, request, redirect, url_for,
-    flash, send_file, current_app
+    flash, send_file, current_app, Response, stream_with_context
 )
 from flask_login import login_required
 from extensions import db
 from models import Employee, Company, Funcao, EmployeeDocument
 from forms import EmployeeForm, FuncaoForm, EmployeeDocForm
-from utils import save_file
-from pdf_reports import employee_pdf
-import io, requests
+from utils import save_file, uploaded
+from blobstore import release
+from pdf_reports import employee_pdf, employees_pdf as _employees_pdf
+from ficha_export import render_parallel, zip_stream
+from pagination import keyset_paginate
+from queries import employees_query
+import pdf_cache
+import search as fulltext
+import requests, tempfile
 
 # --- CRIA O BLUEPRINT PRIMEIRO ---
 hr_bp = Blueprint("rh", __name__)
 
 # ---------------------- LISTAGEM DE COLABORADORES ----------------------
+def _employees_filtered(args):
+    """Consulta de colaboradores com os filtros da listagem (q, ativo, mes|semana, company_id)."""
+    q = args.get("q", "").strip()
+    ativo = args.get("ativo", "")
+    mes_aniversario = args.get("mes", "")
+    company_id = args.get("company_id", type=int)
+
+    query = employees_query()
+    if q:
+        # nome, CPF, empresa e função, sem acento e por prefixo (índice search_term)
+        cond = fulltext.name_filter("employee", Employee.id, q)
+        query = query.filter(cond if cond is not None else Employee.nome.ilike(f"%{q}%"))
+    if ativo in ("1", "0"):
+        query = query.filter_by(ativo=(ativo == "1"))
+    if company_id:
+        query = query.filter(Employee.company_id == company_id)
+
+    # aniversariantes do mês ou da semana — coluna indexada nascimento_mmdd
+    if mes_aniversario == "semana":
+        query = query.filter(Employee.aniversario_filter(dias=7))
+    elif mes_aniversario.isdigit():
+        query = query.filter(Employee.aniversario_filter(mes=int(mes_aniversario)))
+    return query
+
 @hr_bp.route("/colaboradores")
 @login_required
 def employees():
@@ -22,25 +52,10 @@ def employees():
     ativo = request.args.get("ativo", "")
     mes_aniversario = request.args.get("mes", "")
 
-    query = Employee.query
-    if q:
-        like = f"%{q}%"
-        query = query.filter(Employee.nome.ilike(like))
-    if ativo in ("1", "0"):
-        query = query.filter_by(ativo=(ativo == "1"))
-
-    items = query.order_by(Employee.nome).all()
-
-    # filtro de aniversariantes (opcional)
-    if mes_aniversario:
-        try:
-            m = int(mes_aniversario)
-            items = [e for e in items if e.data_nascimento and e.data_nascimento.month == m]
-        except Exception:
-            pass
+    page = keyset_paginate(_employees_filtered(request.args), Employee.nome, Employee.id, request.args)
 
     return render_template("hr/employees_list.html",
-                           items=items, q=q, ativo=ativo, mes=mes_aniversario)
+                           items=page.items, page=page, q=q, ativo=ativo, mes=mes_aniversario)
 
 def _apply_employee_form(e: Employee, form: EmployeeForm):
     """Copia dados do form para o modelo, ajustando campos especiais."""
@@ -104,8 +119,10 @@ def employees_edit(emp_id):
     if form.validate_on_submit():
         _apply_employee_form(e, form)
         if form.foto.data:
+            release(e.foto_path)
             e.foto_path = save_file(form.foto.data, "fotos")
         db.session.commit()
+        pdf_cache.invalidate("employee", e.id)
         flash("Colaborador atualizado.", "success")
         return redirect(url_for("rh.employees"))
 
@@ -116,8 +133,10 @@ def employees_edit(emp_id):
 @login_required
 def employees_delete(emp_id):
     e = Employee.query.get_or_404(emp_id)
+    release(e.foto_path)
     db.session.delete(e)
     db.session.commit()
+    pdf_cache.invalidate("employee", emp_id)
     flash("Colaborador excluído.", "success")
     return redirect(url_for("rh.employees"))
 
@@ -126,11 +145,33 @@ def employees_delete(emp_id):
 @login_required
 def employees_pdf(emp_id):
     e = Employee.query.get_or_404(emp_id)
-    bio = io.BytesIO()
-    employee_pdf(bio, current_app, e)
-    bio.seek(0)
-    return send_file(bio, as_attachment=True,
+    path, etag = pdf_cache.get_or_render("employee", e, lambda buf: employee_pdf(buf, current_app, e))
+    resp = send_file(path, as_attachment=True,
                      download_name=f"colaborador_{e.id}.pdf",
+                     mimetype="application/pdf", etag=etag)
+    resp.cache_control.private = True
+    return resp
+
+# ---------------------- FICHAS EM LOTE ----------------------
+@hr_bp.route("/colaboradores/fichas.zip")
+@login_required
+def employees_fichas_zip():
+    """Uma ficha por colaborador filtrado, geradas em paralelo e enviadas num ZIP à medida que ficam prontas."""
+    emps = _employees_filtered(request.args).order_by(Employee.nome, Employee.id).all()
+    app = current_app._get_current_object()
+    chunks = zip_stream(render_parallel(emps, app), total=len(emps))
+    return Response(stream_with_context(chunks), mimetype="application/zip",
+                    headers={"Content-Disposition": "attachment; filename=fichas_colaboradores.zip"})
+
+@hr_bp.route("/colaboradores/fichas.pdf")
+@login_required
+def employees_fichas_pdf():
+    """Todas as fichas filtradas num único PDF (uma por página)."""
+    query = _employees_filtered(request.args).order_by(Employee.nome, Employee.id)
+    tmp = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    _employees_pdf(tmp, current_app, query.yield_per(200))
+    tmp.seek(0)
+    return send_file(tmp, as_attachment=True, download_name="fichas_colaboradores.pdf",
                      mimetype="application/pdf")
 
 # ---------------------- DOCS DO COLABORADOR ----------------------
@@ -141,7 +182,7 @@ def employee_docs(emp_id):
     form = EmployeeDocForm()
 
     if form.validate_on_submit():
-        path = save_file(form.arquivo.data, "func_docs") if form.arquivo.data else None
+        path = save_file(uploaded(form.arquivo), "func_docs")
         d = EmployeeDocument(
             employee_id=emp.id,
             tipo=form.tipo.data,
@@ -153,13 +194,17 @@ def employee_docs(emp_id):
         flash("Documento anexado.", "success")
         return redirect(url_for("rh.employee_docs", emp_id=emp.id))
 
-    q = request.args.get("q", "").strip().lower()
-    docs = list(emp.documentos)
+    # filtro no banco: tipo/descrição ou texto do arquivo (índice de busca)
+    q = request.args.get("q", "").strip()
+    query = EmployeeDocument.query.filter_by(employee_id=emp.id)
     if q:
-        docs = [
-            d for d in docs
-            if (d.tipo and q in d.tipo.lower()) or (d.descricao and q in d.descricao.lower())
-        ]
+        like = f"%{q}%"
+        query = query.filter(
+            EmployeeDocument.tipo.ilike(like)
+            | EmployeeDocument.descricao.ilike(like)
+            | EmployeeDocument.id.in_(fulltext.matching_ids(q, "employee_document", employee_id=emp.id))
+        )
+    docs = query.order_by(EmployeeDocument.id).all()
 
     return render_template("hr/employee_docs.html", emp=emp, form=form, docs=docs)
 
@@ -1,19 +1,12 @@
 # blueprints/main/routes.py
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from flask_login import login_required
-from datetime import date, datetime, timedelta
-import os
+from sqlalchemy import func, case
+from datetime import date, timedelta
+import hashlib, json, os
 
-from models import Employee
-try:
-    from models import Funcao
-except Exception:
-    Funcao = None
-try:
-    from models import Document, DocumentType
-except Exception:
-    Document = None
-    DocumentType = None
+from extensions import db
+from models import Employee, Funcao
 
 main_bp = Blueprint("main", __name__, template_folder='../../templates')
 
@@ -24,66 +17,6 @@ def index():
     from blueprints.dash.routes import dashboard as dash_dashboard
     return dash_dashboard()
 
-def _get_cnh_expiration(emp):
-    # 1) tenta atributos comuns no modelo Employee
-    for attr in ("cnh_vencimento", "cnh_validade", "cnh_expira_em", "validade_cnh"):
-        if hasattr(emp, attr):
-            val = getattr(emp, attr)
-            if val:
-                return val
-
-    # 2) tenta via documentos relacionados (tipo 'CNH')
-    try:
-        docs = getattr(emp, "documents", None) or getattr(emp, "documentos", None)
-        if docs:
-            for d in docs:
-                # Identifica se o doc é CNH
-                name_ok = False
-                try:
-                    t = getattr(d, "tipo", None)
-                    if t is not None:
-                        nome_tipo = getattr(t, "nome", None)
-                        if isinstance(nome_tipo, str) and nome_tipo.strip().upper() == "CNH":
-                            name_ok = True
-                except Exception:
-                    pass
-                if not name_ok:
-                    try:
-                        if getattr(d, "nome", "").strip().upper() == "CNH":
-                            name_ok = True
-                    except Exception:
-                        pass
-                if not name_ok:
-                    continue
-
-                # pega a validade no doc
-                for a in ("validade", "data_validade", "vencimento", "expira_em"):
-                    if hasattr(d, a):
-                        vv = getattr(d, a)
-                        if vv:
-                            return vv
-    except Exception:
-        pass
-
-    return None
-
-def _is_driver(emp):
-    # considera Motorista por relação Funcao ou por texto no campo
-    try:
-        func = getattr(emp, "funcao", None)
-        nome = getattr(func, "nome", None)
-        if isinstance(nome, str) and nome.strip().lower() == "motorista":
-            return True
-    except Exception:
-        pass
-    # fallback: campos de texto
-    for a in ("cargo", "funcao_nome", "role_name"):
-        if hasattr(emp, a):
-            val = getattr(emp, a)
-            if isinstance(val, str) and val.strip().lower() == "motorista":
-                return True
-    return False
-
 @main_bp.route("/api/cnh-stats", endpoint="cnh_stats")
 @login_required
 def cnh_stats():
@@ -92,37 +25,71 @@ def cnh_stats():
     today = date.today()
     deadline = today + timedelta(days=horizon_days)
 
-    # busca todos e filtra em Python para robustez
-    emps = Employee.query.all()
-    drivers = [e for e in emps if _is_driver(e)]
+    # uma única agregação: motoristas (Funcao.nome) com CNH até o horizonte,
+    # separados em vencidas / a vencer (usa ix_employee_cnh_validade)
+    vencidas, a_vencer = (
+        db.session.query(
+            func.coalesce(func.sum(case((Employee.cnh_validade < today, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((Employee.cnh_validade >= today, 1), else_=0)), 0),
+        )
+        .join(Funcao, Employee.funcao_id == Funcao.id)
+        .filter(func.lower(Funcao.nome) == "motorista")
+        .filter(Employee.cnh_validade.isnot(None), Employee.cnh_validade <= deadline)
+        .one()
+    )
 
-    vencidas = 0
-    a_vencer = 0
-
-    for e in drivers:
-        dt = _get_cnh_expiration(e)
-        if not dt:
-            continue
-        if isinstance(dt, datetime):
-            dt = dt.date()
-        # se vier string "YYYY-MM-DD"
-        if isinstance(dt, str):
-            try:
-                dt = date.fromisoformat(dt[:10])
-            except Exception:
-                continue
+    payload = {
+        "cnh_vencidas": int(vencidas),
+        "cnh_a_vencer": int(a_vencer),
+        "horizon_days": horizon_days
+    }
+    resp = jsonify(payload)
+    resp.set_etag(hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest())
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp.make_conditional(request)
 
-        try:
-            if dt < today:
-                vencidas += 1
-            elif dt <= deadline:
-                a_vencer += 1
-        except Exception:
-            # em caso de tipos estranhos, ignora
-            continue
+@main_bp.route("/api/busca", endpoint="search_api")
+@login_required
+def search_api():
+    """Busca ordenada por relevância no texto e nos metadados dos documentos."""
+    from search import search
+    hits = search(request.args.get("q", ""), kind=request.args.get("tipo") or None,
+                  limit=min(request.args.get("limit", 20, type=int), 100))
+    return jsonify([
+        {"tipo": h.kind, "id": h.ref_id, "colaborador_id": h.employee_id, "titulo": h.title,
+         "trecho": str(h.snippet), "arquivo": h.arquivo_path, "rank": h.rank}
+        for h in hits
+    ])
 
-    return jsonify({
-        "cnh_vencidas": vencidas,
-        "cnh_a_vencer": a_vencer,
-        "horizon_days": horizon_days
-    })
+@main_bp.route("/api/aniversariantes", endpoint="aniversariantes")
+@login_required
+def aniversariantes():
+    """
+    Colaboradores ativos que fazem aniversário nos próximos `dias` dias (padrão 7)
+    ou no mês `mes`. Só lê a faixa do índice em nascimento_mmdd + as colunas exibidas.
+    """
+    from models import Company
+    mes = request.args.get("mes", type=int)
+    dias = min(max(request.args.get("dias", 7, type=int), 1), 366)
+    hoje = date.today()
+    cond = Employee.aniversario_filter(mes=mes) if mes else Employee.aniversario_filter(de=hoje, dias=dias)
+    inicio = 0 if mes else hoje.month * 100 + hoje.day
+    # ordem do próximo aniversário: quem já passou na virada do ano vai para o fim
+    ordem = case((Employee.nascimento_mmdd >= inicio, 0), else_=1)
+    rows = (
+        db.session.query(Employee.id, Employee.nome, Employee.nascimento_mmdd, Company.razao_social)
+        .outerjoin(Company, Company.id == Employee.company_id)
+        .filter(cond, Employee.ativo == True)
+        .order_by(ordem, Employee.nascimento_mmdd, Employee.nome)
+        .limit(200)
+        .all()
+    )
+    payload = [
+        {"id": r.id, "nome": r.nome, "dia": r.nascimento_mmdd % 100, "mes": r.nascimento_mmdd // 100,
+         "empresa": r.razao_social, "hoje": r.nascimento_mmdd == hoje.month * 100 + hoje.day}
+        for r in rows
+    ]
+    resp = jsonify(payload)
+    resp.set_etag(hashlib.sha1(json.dumps([hoje.isoformat(), payload], sort_keys=True).encode()).hexdigest())
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp.make_conditional(request)
@@ -0,0 +1,230 @@
+import os
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from pytz import timezone, utc
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from extensions import db
+from .models import CashMovement, CashDailySummary, CashClosing
+
+# Resumo do caixa por dia / operador / forma de pagamento.
+# Cada movimento gravado soma (se apagado, subtrai; se editado, subtrai os
+# valores antigos e soma os novos) no resumo do seu dia dentro da mesma
+# transação (listener after_flush). rebuild() refaz um intervalo a partir de
+# cash_movement (job noturno e `flask pdv-resumo`), o que também corrige
+# movimentos editados direto no banco.
+# Relatórios e o saldo do dia leem só cash_daily_summary.
+
+TZ = timezone(os.getenv("PDV_TIMEZONE", "America/Sao_Paulo"))
+PAGAMENTOS = ("DINHEIRO", "PIX", "CARTAO")
+ENTRADAS = ("VENDA",)
+CENTS = Decimal("0.01")
+ZERO = Decimal("0.00")
+
+def dec(v):
+    return Decimal(str(v or 0)).quantize(CENTS)
+
+def brl(v):
+    """Decimal -> 'R$ 1.234,56'."""
+    return "R$ " + f"{dec(v):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def local_day(dt):
+    """Dia (no fuso do PDV) de um created_at gravado em UTC."""
+    return utc.localize(dt).astimezone(TZ).date()
+
+def today():
+    return datetime.now(TZ).date()
+
+def utc_range(de, ate):
+    """[início, fim) em UTC ingênuo cobrindo os dias locais de `de` a `ate`."""
+    ini = TZ.localize(datetime.combine(de, time.min)).astimezone(utc).replace(tzinfo=None)
+    fim = TZ.localize(datetime.combine(ate + timedelta(days=1), time.min)).astimezone(utc).replace(tzinfo=None)
+    return ini, fim
+
+def _delta(mov, sign=1):
+    valor = dec(mov.valor) * sign
+    key = (local_day(mov.created_at or datetime.utcnow()), mov.user_id or 0, mov.pagamento)
+    if mov.tipo in ENTRADAS:
+        return key, (valor, ZERO, sign)
+    return key, (ZERO, valor, sign)
+
+_SUMMARY_FIELDS = ("tipo", "valor", "pagamento", "user_id", "created_at")
+
+# active_history: ao alterar um desses campos com o objeto expirado (após um
+# commit) o SQLAlchemy carrega o valor antigo, senão o histórico viria vazio.
+for _name in _SUMMARY_FIELDS:
+    event.listen(getattr(CashMovement, _name), "set", lambda *args: None, active_history=True)
+
+def _previous(mov):
+    """Valores de `mov` antes do flush, ou None se nenhum campo do resumo mudou."""
+    attrs = sa_inspect(mov).attrs
+    old, changed = {}, False
+    for name in _SUMMARY_FIELDS:
+        hist = attrs[name].history
+        if hist.has_changes():
+            changed = True
+            old[name] = hist.deleted[0] if hist.deleted else None
+        else:
+            old[name] = getattr(mov, name)
+    return SimpleNamespace(**old) if changed else None
+
+# ---------------------- atualização incremental ----------------------
+
+@event.listens_for(Session, "after_flush")
+def _apply_movements(session, flush_context):
+    deltas = defaultdict(lambda: [ZERO, ZERO, 0])
+    for obj in session.new:
+        if isinstance(obj, CashMovement):
+            key, d = _delta(obj)
+            for i in range(3): deltas[key][i] += d[i]
+    for obj in session.deleted:
+        if isinstance(obj, CashMovement):
+            key, d = _delta(obj, -1)
+            for i in range(3): deltas[key][i] += d[i]
+    for obj in session.dirty:
+        if isinstance(obj, CashMovement):
+            old = _previous(obj)
+            if old is None: continue
+            for mov, sign in ((old, -1), (obj, 1)):
+                key, d = _delta(mov, sign)
+                for i in range(3): deltas[key][i] += d[i]
+    if not deltas: return
+
+    conn = session.connection()
+    t = CashDailySummary.__table__
+    dialect = conn.dialect.name
+    for (dia, user_id, pagamento), (entradas, saidas, qtd) in deltas.items():
+        values = dict(dia=dia, user_id=user_id, pagamento=pagamento, entradas=entradas, saidas=saidas, qtd=qtd)
+        # soma atômica no banco: dois caixas lançando ao mesmo tempo não se sobrescrevem.
+        # INSERT ... ON CONFLICT DO UPDATE cobre a linha criada por outro processo, sem SAVEPOINT.
+        if dialect in ("sqlite", "postgresql"):
+            insert = sqlite_insert if dialect == "sqlite" else pg_insert
+            stmt = insert(t).values(**values)
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=["dia", "user_id", "pagamento"],
+                set_={"entradas": t.c.entradas + stmt.excluded.entradas,
+                      "saidas": t.c.saidas + stmt.excluded.saidas,
+                      "qtd": t.c.qtd + stmt.excluded.qtd}))
+            continue
+        # outros bancos: UPDATE e, se não havia linha, INSERT (corrida rara vira IntegrityError no commit)
+        where = (t.c.dia == dia) & (t.c.user_id == user_id) & (t.c.pagamento == pagamento)
+        upd = t.update().where(where).values(entradas=t.c.entradas + entradas,
+                                             saidas=t.c.saidas + saidas, qtd=t.c.qtd + qtd)
+        if not conn.execute(upd).rowcount:
+            conn.execute(t.insert().values(**values))
+
+# ---------------------- reconstrução ----------------------
+
+def rebuild(de, ate):
+    """Refaz os resumos dos dias `de`..`ate` a partir de cash_movement. Retorna nº de linhas."""
+    ini, fim = utc_range(de, ate)
+    totals = defaultdict(lambda: [ZERO, ZERO, 0])
+    q = (db.session.query(CashMovement.created_at, CashMovement.user_id, CashMovement.pagamento,
+                          CashMovement.tipo, CashMovement.valor)
+         .filter(CashMovement.created_at >= ini, CashMovement.created_at < fim)
+         .execution_options(yield_per=1000))
+    for mov in q:
+        key, d = _delta(mov)
+        for i in range(3): totals[key][i] += d[i]
+    CashDailySummary.query.filter(CashDailySummary.dia.between(de, ate)).delete(synchronize_session=False)
+    db.session.add_all([
+        CashDailySummary(dia=dia, user_id=user_id, pagamento=pagamento, entradas=e, saidas=s, qtd=n)
+        for (dia, user_id, pagamento), (e, s, n) in totals.items()
+    ])
+    db.session.commit()
+    return len(totals)
+
+# ---------------------- leitura ----------------------
+
+def day_summary(dia, user_id=None):
+    """
+    {'linhas': [(user_id, pagamento, entradas, saidas, saldo, qtd)], 'por_pagamento': {...},
+     'total': {...}} do dia, só a partir dos resumos.
+    """
+    q = CashDailySummary.query.filter_by(dia=dia)
+    if user_id is not None: q = q.filter_by(user_id=user_id)
+    linhas, por_pag = [], {p: [ZERO, ZERO] for p in PAGAMENTOS}
+    for r in q.order_by(CashDailySummary.user_id, CashDailySummary.pagamento):
+        e, s = dec(r.entradas), dec(r.saidas)
+        linhas.append((r.user_id, r.pagamento, e, s, e - s, r.qtd))
+        acc = por_pag.setdefault(r.pagamento, [ZERO, ZERO])
+        acc[0] += e; acc[1] += s
+    total_e = sum((v[0] for v in por_pag.values()), ZERO)
+    total_s = sum((v[1] for v in por_pag.values()), ZERO)
+    return {
+        "linhas": linhas,
+        "por_pagamento": {p: {"entradas": v[0], "saidas": v[1], "saldo": v[0] - v[1]} for p, v in por_pag.items()},
+        "total": {"entradas": total_e, "saidas": total_s, "saldo": total_e - total_s},
+    }
+
+def period_summary(de, ate):
+    """Totais por dia e forma de pagamento entre `de` e `ate` (inclusive): [(dia, {pag: saldo}, total)]."""
+    rows = (db.session.query(CashDailySummary.dia, CashDailySummary.pagamento,
+                             db.func.sum(CashDailySummary.entradas), db.func.sum(CashDailySummary.saidas))
+            .filter(CashDailySummary.dia.between(de, ate))
+            .group_by(CashDailySummary.dia, CashDailySummary.pagamento)
+            .order_by(CashDailySummary.dia))
+    dias = {}
+    for dia, pag, e, s in rows:
+        d = dias.setdefault(dia, {p: {"entradas": ZERO, "saidas": ZERO, "saldo": ZERO} for p in PAGAMENTOS})
+        e, s = dec(e), dec(s)
+        d[pag] = {"entradas": e, "saidas": s, "saldo": e - s}
+    return [(dia, por_pag, sum((v["saldo"] for v in por_pag.values()), ZERO))
+            for dia, por_pag in dias.items()]
+
+# ---------------------- consulta de movimentos ----------------------
+
+FILTROS = ("de", "ate", "tipo", "pagamento", "user_id", "ticket")
+
+def movements_query(de=None, ate=None, tipo=None, pagamento=None, user_id=None, ticket=None):
+    """
+    Movimentos filtrados por dias locais (`de`..`ate`), tipo, forma, operador e
+    ticket. Cada filtro cai num índice (created_at, pagamento/tipo/user_id + created_at);
+    o ticket é comparação exata em ix_cash_movement_ticket_ref.
+    """
+    q = CashMovement.query
+    if ticket:
+        return q.filter(CashMovement.ticket_ref == ticket.strip())
+    if de or ate:
+        ini, fim = utc_range(de or ate, ate or de)
+        q = q.filter(CashMovement.created_at >= ini, CashMovement.created_at < fim)
+    if tipo:
+        q = q.filter(CashMovement.tipo == tipo)
+    if pagamento:
+        q = q.filter(CashMovement.pagamento == pagamento)
+    if user_id is not None:
+        q = q.filter(CashMovement.user_id == (user_id or None))
+    return q
+
+def movements_totals(query):
+    """Entradas/saídas/saldo/qtd do conjunto filtrado (uma agregação, sem carregar linhas)."""
+    rows = (query.with_entities(CashMovement.tipo, db.func.sum(CashMovement.valor), db.func.count(CashMovement.id))
+            .order_by(None).group_by(CashMovement.tipo))
+    e, s, n = ZERO, ZERO, 0
+    for tipo, soma, qtd in rows:
+        if tipo in ENTRADAS: e += dec(soma)
+        else: s += dec(soma)
+        n += qtd
+    return {"entradas": e, "saidas": s, "saldo": e - s, "qtd": n}
+
+# ---------------------- fechamento de turno ----------------------
+
+def close_shift(dia, user_id, contado, fundo=0, observacao=""):
+    """Registra (ou refaz) o fechamento do turno do operador no dia."""
+    resumo = day_summary(dia, user_id=user_id)["por_pagamento"]
+    esperado = dec(fundo) + resumo["DINHEIRO"]["saldo"]
+    c = CashClosing.query.filter_by(dia=dia, user_id=user_id).first() or CashClosing(dia=dia, user_id=user_id)
+    c.fundo_troco = dec(fundo)
+    c.esperado_dinheiro = esperado
+    c.contado_dinheiro = dec(contado)
+    c.total_pix = resumo["PIX"]["saldo"]
+    c.total_cartao = resumo["CARTAO"]["saldo"]
+    c.observacao = observacao or ""
+    c.closed_at = datetime.utcnow()
+    db.session.add(c)
+    db.session.commit()
+    return c
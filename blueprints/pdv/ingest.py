@@ -0,0 +1,110 @@
+import re
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from .models import CashMovement
+from . import cash, spooler, tickets
+
+# Lançamentos do PDV offline (static/js/pdv_offline.js).
+# O navegador grava cada movimento no IndexedDB com uma chave própria e envia
+# em lotes; cada lote entra numa transação só. Chave já gravada volta como
+# "duplicado" (reenvio depois de queda de conexão), nunca como outro movimento.
+
+MAX_LOTE = 500
+TIPOS = ("VENDA", "SANGRIA", "RETIRADA")
+MAX_VALOR = Decimal("99999999.99")      # Numeric(10,2)
+FUTURO = timedelta(minutes=5)           # relógio do caixa adiantado: usa a hora do servidor
+_KEY = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+def _text(item, name, size):
+    return str(item.get(name) or "").strip()[:size]
+
+def _when(raw, now):
+    """created_at do navegador (ISO 8601) em UTC ingênuo."""
+    if not raw:
+        return now
+    dt = datetime.fromisoformat(str(raw).replace("Z", "+00:00"))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return now if dt > now + FUTURO else dt
+
+def _parse(item, now):
+    """Item do lote -> kwargs do CashMovement. ValueError com a mensagem para o caixa."""
+    key = str(item.get("key") or "")
+    if not _KEY.match(key):
+        raise ValueError("chave inválida")
+    tipo = str(item.get("tipo") or "").upper()
+    if tipo not in TIPOS:
+        raise ValueError(f"tipo inválido: {tipo or '-'}")
+    pagamento = str(item.get("pagamento") or "").upper()
+    if pagamento not in cash.PAGAMENTOS:
+        raise ValueError(f"forma de pagamento inválida: {pagamento or '-'}")
+    try:
+        valor = Decimal(str(item.get("valor")).replace(",", "."))
+        # Decimal aceita "NaN"/"Infinity": comparar NaN levanta InvalidOperation
+        if not valor.is_finite() or not (0 < valor <= MAX_VALOR):
+            raise ValueError
+        valor = cash.dec(valor)
+    except (InvalidOperation, ValueError):
+        raise ValueError("valor inválido")
+    try:
+        created_at = _when(item.get("created_at"), now)
+    except (ValueError, TypeError, OverflowError):
+        raise ValueError("data inválida")
+    return dict(client_key=key, tipo=tipo, valor=valor, pagamento=pagamento, created_at=created_at,
+                descricao=_text(item, "descricao", 255), ticket_ref=_text(item, "ticket_ref", 50),
+                cliente=_text(item, "cliente", 120))
+
+def ingest(items, user_id=None):
+    """
+    Grava um lote de movimentos. Devolve (resultados, nº de tickets na fila), com
+    um resultado por item: {"key", "status": criado|duplicado|invalido, "id"/"erro"}.
+    """
+    now = datetime.utcnow()
+    results = [None] * len(items)
+    lote = {}                           # chave -> (índices, kwargs, imprimir)
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[i] = {"key": None, "status": "invalido", "erro": "item inválido"}
+            continue
+        try:
+            kw = _parse(item, now)
+        except ValueError as e:
+            results[i] = {"key": item.get("key"), "status": "invalido", "erro": str(e)}
+            continue
+        if kw["client_key"] in lote:
+            lote[kw["client_key"]][0].append(i)     # repetido dentro do próprio lote
+        else:
+            lote[kw["client_key"]] = ([i], kw, bool(item.get("imprimir")))
+
+    for tentativa in (1, 2):
+        existentes = dict(db.session.query(CashMovement.client_key, CashMovement.id)
+                          .filter(CashMovement.client_key.in_(list(lote)))) if lote else {}
+        novos = {k: CashMovement(user_id=user_id, **kw) for k, (_, kw, _) in lote.items() if k not in existentes}
+        db.session.add_all(novos.values())
+        try:
+            db.session.flush()
+            impressos = 0
+            for k, mov in novos.items():
+                if lote[k][2]:
+                    spooler.enqueue(tickets.comprovante(mov), f"{mov.tipo} R$ {mov.valor:.2f} ({mov.pagamento})",
+                                    movement_id=mov.id, user_id=user_id)
+                    impressos += 1
+            db.session.commit()
+            break
+        except IntegrityError:
+            # outro envio com a mesma chave entrou no meio: refaz vendo o que já foi gravado
+            db.session.rollback()
+            if tentativa == 2:
+                raise
+
+    for k, (indices, _, _) in lote.items():
+        if k in novos:
+            first, rest = indices[0], indices[1:]
+            results[first] = {"key": k, "status": "criado", "id": novos[k].id}
+        else:
+            rest = indices
+        for i in rest:
+            results[i] = {"key": k, "status": "duplicado", "id": existentes.get(k) or novos[k].id}
+    return results, impressos
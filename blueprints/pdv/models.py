@@ -0,0 +1,80 @@
+from datetime import datetime
+from extensions import db
+
+# Modelos do PDV (caixa)
+
+class CashMovement(db.Model):  # tabela: cash_movement
+    __tablename__ = "cash_movement"
+    __table_args__ = (
+        db.Index("ix_cash_movement_created_at", "created_at", "id"),        # período + ordem da listagem
+        db.Index("ix_cash_movement_pagamento", "pagamento", "created_at"),
+        db.Index("ix_cash_movement_tipo", "tipo", "created_at"),
+        db.Index("ix_cash_movement_user", "user_id", "created_at"),
+        db.Index("ix_cash_movement_ticket_ref", "ticket_ref"),              # busca exata do ticket
+        db.UniqueConstraint("client_key", name="uq_cash_movement_client_key"),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(20), nullable=False)  # VENDA, SANGRIA, RETIRADA
+    valor = db.Column(db.Numeric(10,2), nullable=False)
+    pagamento = db.Column(db.String(20), nullable=False)  # DINHEIRO, PIX, CARTAO
+    descricao = db.Column(db.String(255))
+    ticket_ref = db.Column(db.String(50))  # número do ticket de pesagem (opcional)
+    cliente = db.Column(db.String(120))    # nome/identificação do cliente (opcional)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
+    client_key = db.Column(db.String(64))   # chave gerada no navegador (PDV offline)
+
+class CashDailySummary(db.Model):
+    """
+    Totais do caixa por dia (fuso do PDV), operador e forma de pagamento.
+    Atualizado a cada movimento (ver cash.py) e refeito pelo job noturno.
+    """
+    __tablename__ = "cash_daily_summary"
+    __table_args__ = (
+        db.UniqueConstraint("dia", "user_id", "pagamento", name="uq_cash_daily_summary"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    dia = db.Column(db.Date, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False, default=0)   # 0 = sem operador
+    pagamento = db.Column(db.String(20), nullable=False)
+    entradas = db.Column(db.Numeric(12,2), nullable=False, default=0)   # VENDA
+    saidas = db.Column(db.Numeric(12,2), nullable=False, default=0)     # SANGRIA + RETIRADA
+    qtd = db.Column(db.Integer, nullable=False, default=0)
+
+class CashClosing(db.Model):
+    """Fechamento do turno de um operador num dia: dinheiro esperado x contado."""
+    __tablename__ = "cash_closing"
+    __table_args__ = (
+        db.UniqueConstraint("dia", "user_id", name="uq_cash_closing"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    dia = db.Column(db.Date, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False, default=0)
+    fundo_troco = db.Column(db.Numeric(12,2), nullable=False, default=0)
+    esperado_dinheiro = db.Column(db.Numeric(12,2), nullable=False)
+    contado_dinheiro = db.Column(db.Numeric(12,2), nullable=False)
+    total_pix = db.Column(db.Numeric(12,2), nullable=False, default=0)
+    total_cartao = db.Column(db.Numeric(12,2), nullable=False, default=0)
+    observacao = db.Column(db.String(255))
+    closed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class PrintJob(db.Model):
+    """Fila persistente de impressão de tickets (bytes ESC/POS), drenada por spooler.drain."""
+    __tablename__ = "print_job"
+    __table_args__ = (
+        db.Index("ix_print_job_status_next", "status", "next_attempt_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    titulo = db.Column(db.String(120), nullable=False)
+    movement_id = db.Column(db.Integer, db.ForeignKey("cash_movement.id"), nullable=True, index=True)
+    user_id = db.Column(db.Integer, nullable=True)
+    payload = db.Column(db.LargeBinary, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="pendente")  # pendente, imprimindo, impresso, falhou
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    printed_at = db.Column(db.DateTime)
@@ -1,7 +1,7 @@
 \
 import os
 from decimal import Decimal
-from flask import request, render_template, redirect, url_for, flash
+from flask import request, render_template, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
 from . import pdv_bp
 
@@ -15,18 +15,9 @@ except Exception:
     # fallback: pegar de extensions se for o padrão do seu projeto
     from extensions import db
 
-# Modelo simples de movimentos de caixa (caso não exista no models principal)
-class CashMovement(db.Model):  # tabela: cash_movement
-    __tablename__ = "cash_movement"
-    id = db.Column(db.Integer, primary_key=True)
-    tipo = db.Column(db.String(20), nullable=False)  # VENDA, SANGRIA, RETIRADA
-    valor = db.Column(db.Numeric(10,2), nullable=False)
-    pagamento = db.Column(db.String(20), nullable=False)  # DINHEIRO, PIX, CARTAO
-    descricao = db.Column(db.String(255))
-    ticket_ref = db.Column(db.String(50))  # número do ticket de pesagem (opcional)
-    cliente = db.Column(db.String(120))    # nome/identificação do cliente (opcional)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
+# Modelos do caixa (movimentos, resumos diários, fechamentos)
+from .models import CashMovement, CashDailySummary, CashClosing, PrintJob
+from . import cash, ingest, spooler
 
 # WTForms locais para não depender do forms.py global
 from flask_wtf import FlaskForm
@@ -51,29 +42,9 @@ class MovForm(FlaskForm):
     submit = SubmitField("Lançar e imprimir")
     submit_no_print = SubmitField("Apenas lançar")
 
-# Utilitário de impressão
-from utils_printer import print_ticket, build_ticket_lines
-
-def _company_header():
-    # Tenta montar um cabeçalho com base no cadastro de empresa (se existir)
-    try:
-        from models import Company
-        c = Company.query.order_by(Company.id.asc()).first()
-        if c:
-            header = [
-                c.nome_fantasia or (c.razao_social or ""),
-                (c.endereco or "") + (" - " + c.cidade if getattr(c, "cidade", None) else ""),
-            ]
-            if getattr(c, "cnpj", None):
-                header.append(f"CNPJ: {c.cnpj}")
-            return [h for h in header if h.strip()]
-    except Exception:
-        pass
-    # Fallback: variáveis de ambiente
-    h1 = os.getenv("TICKET_HEADER_1", "TRANSer")
-    h2 = os.getenv("TICKET_HEADER_2", "")
-    h3 = os.getenv("TICKET_HEADER_3", "")
-    return [x for x in [h1,h2,h3] if x]
+# Tickets (layouts pré-compilados em tickets.py)
+from . import tickets
+from pagination import keyset_paginate
 
 @pdv_bp.route("/pdv", methods=["GET","POST"])
 @login_required
@@ -85,46 +56,75 @@ def pdv_index():
             valor=Decimal(form.valor.data or 0),
             pagamento=form.pagamento.data,
             descricao=form.descricao.data or "",
-            ticket_ref=form.ticket_ref.data or "",
+            ticket_ref=(form.ticket_ref.data or "").strip(),
             cliente=form.cliente.data or "",
             user_id=getattr(current_user, "id", None)
         )
         db.session.add(mov)
-        db.session.commit()
-        # Imprime?
+        # Imprime? (o ticket vai para a fila na mesma transação; a impressão é em segundo plano)
+        job = None
         if form.submit.data:
-            header = _company_header()
-            cols = int(os.getenv("TICKET_COLS","40"))
-            lines = build_ticket_lines(
-                title="COMPROVANTE DE CAIXA",
-                header_lines=header,
-                cols=cols,
-                fields=[
-                    ("Tipo", mov.tipo),
-                    ("Valor", f"R$ {mov.valor:,.2f}".replace(",", "X").replace(".", ",").replace("X",".")),
-                    ("Forma", mov.pagamento),
-                    ("Cliente", mov.cliente or "-"),
-                    ("Ticket", mov.ticket_ref or "-"),
-                    ("Descrição", mov.descricao or "-"),
-                    ("Data", mov.created_at.strftime("%d/%m/%Y %H:%M")),
-                ],
-                ask_signature=(mov.tipo in ("SANGRIA","RETIRADA"))
-            )
-            ok, err = print_ticket(lines)
-            if not ok:
-                flash(f"Movimento salvo, mas falha na impressão: {err}", "warning")
-            else:
-                flash("Movimento lançado e impresso!", "success")
-        else:
-            flash("Movimento lançado.", "success")
+            db.session.flush()
+            job = spooler.enqueue(tickets.comprovante(mov), f"{mov.tipo} R$ {mov.valor:.2f} ({mov.pagamento})",
+                                  movement_id=mov.id, user_id=mov.user_id)
+        db.session.commit()
+        if job is not None:
+            spooler.wake()
+            flash("Movimento lançado. Ticket enviado para a impressora.", "success")
+            return redirect(url_for("pdv.pdv_index", impressao=job.id))
+        flash("Movimento lançado.", "success")
         return redirect(url_for("pdv.pdv_index"))
-    return render_template("pdv/index.html", form=form)
+    return render_template("pdv/index.html", form=form, impressao=request.args.get("impressao", type=int))
+
+@pdv_bp.route("/pdv/rapido")
+@login_required
+def pdv_offline():
+    """Lançamento sem esperar o servidor: fila no navegador, envio em lote (static/js/pdv_offline.js)."""
+    return render_template("pdv/offline.html", tipos=MovForm.tipo.kwargs["choices"],
+                           pagamentos=MovForm.pagamento.kwargs["choices"], max_lote=ingest.MAX_LOTE)
+
+@pdv_bp.route("/api/pdv/movimentos/lote", methods=["POST"])
+@login_required
+def pdv_ingest():
+    """
+    Lote de movimentos {"movimentos": [{key, tipo, valor, pagamento, created_at,
+    descricao, ticket_ref, cliente, imprimir}]} gravado numa transação; `key`
+    repetida não duplica. Só JSON (formulário de outro site não chega aqui).
+    """
+    data = request.get_json(silent=True) if request.is_json else None
+    items = data.get("movimentos") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return jsonify({"erro": "esperado JSON {\"movimentos\": [...]}"}), 400
+    if len(items) > ingest.MAX_LOTE:
+        return jsonify({"erro": f"no máximo {ingest.MAX_LOTE} movimentos por lote"}), 413
+    resultados, impressos = ingest.ingest(items, user_id=getattr(current_user, "id", None))
+    if impressos:
+        spooler.wake()
+    contagem = {s: sum(1 for r in resultados if r["status"] == s) for s in ("criado", "duplicado", "invalido")}
+    return jsonify({"resultados": resultados, **contagem})
+
+def _movement_filters(args):
+    """Filtros de cash.movements_query lidos da query string (datas em AAAA-MM-DD)."""
+    f = {
+        "de": _parse_day(args.get("de"), None),
+        "ate": _parse_day(args.get("ate"), None),
+        "tipo": args.get("tipo") or None,
+        "pagamento": args.get("pagamento") or None,
+        "user_id": args.get("user_id", type=int),
+        "ticket": (args.get("ticket") or "").strip() or None,
+    }
+    return {k: v for k, v in f.items() if v is not None}
+
+def _parse_day(s, default):
+    try: return datetime.strptime(s, "%Y-%m-%d").date()
+    except (TypeError, ValueError): return default
 
 @pdv_bp.route("/pdv/mov")
 @login_required
 def pdv_list():
     q = request.args.get("q","").strip()
-    query = CashMovement.query.order_by(db.desc(CashMovement.created_at))
+    filtros = _movement_filters(request.args)
+    query = cash.movements_query(**filtros)
     if q:
         like = f"%{q}%"
         query = query.filter(
@@ -133,21 +133,134 @@ def pdv_list():
             (CashMovement.cliente.ilike(like)) |
             (CashMovement.tipo.ilike(like))
         )
-    items = query.limit(200).all()
-    total = sum([float(i.valor or 0) if i.tipo=="VENDA" else (-float(i.valor or 0)) for i in items])
-    return render_template("pdv/mov_list.html", items=items, total=total, q=q)
+    page = keyset_paginate(query, CashMovement.created_at, CashMovement.id, request.args, descending=True)
+    # saldo do dia inteiro, lido do resumo (não dos lançamentos da página)
+    hoje = cash.today()
+    total = cash.day_summary(hoje)["total"]["saldo"]
+    return render_template("pdv/mov_list.html", items=page.items, page=page, total=total, hoje=hoje, q=q,
+                           filtros=filtros, tipos=MovForm.tipo.kwargs["choices"], pagamentos=cash.PAGAMENTOS)
+
+@pdv_bp.route("/api/pdv/movimentos")
+@login_required
+def pdv_movements_api():
+    """
+    Movimentos por período (de/ate), tipo, pagamento, user_id e ticket (exato),
+    paginados por cursor (after/per_page) e com os totais do filtro inteiro.
+    """
+    filtros = _movement_filters(request.args)
+    query = cash.movements_query(**filtros)
+    page = keyset_paginate(query, CashMovement.created_at, CashMovement.id, request.args, descending=True)
+    totais = cash.movements_totals(query) if request.args.get("totais", "1") != "0" else None
+    return jsonify({
+        "itens": [
+            {"id": m.id, "created_at": m.created_at.isoformat(), "tipo": m.tipo, "valor": str(cash.dec(m.valor)),
+             "pagamento": m.pagamento, "user_id": m.user_id, "ticket_ref": m.ticket_ref or None,
+             "cliente": m.cliente or None, "descricao": m.descricao or None}
+            for m in page.items
+        ],
+        "proximo": page.next_cursor,
+        "totais": {k: v if isinstance(v, int) else str(v) for k, v in totais.items()} if totais else None,
+    })
+
+# ---------------------- fechamento e relatórios ----------------------
+
+@pdv_bp.app_template_filter("brl")
+def _brl_filter(v):
+    return cash.brl(v)
+
+def _usernames(ids):
+    from models import User
+    ids = {i for i in ids if i}
+    names = {u.id: u.username for u in User.query.filter(User.id.in_(ids))} if ids else {}
+    names[0] = "(sem operador)"
+    return names
+
+@pdv_bp.route("/pdv/caixa", methods=["GET", "POST"])
+@login_required
+def pdv_closing():
+    """Resumo do dia por operador/forma de pagamento e fechamento do turno do operador logado."""
+    dia = _parse_day(request.values.get("dia"), cash.today())
+    user_id = getattr(current_user, "id", None) or 0
+    if request.method == "POST":
+        try:
+            contado = Decimal(request.form.get("contado", "").replace(",", ".") or "0")
+            fundo = Decimal(request.form.get("fundo", "").replace(",", ".") or "0")
+        except ArithmeticError:
+            flash("Valor inválido.", "danger")
+            return redirect(url_for("pdv.pdv_closing", dia=dia.isoformat()))
+        c = cash.close_shift(dia, user_id, contado, fundo, request.form.get("observacao", ""))
+        diff = c.contado_dinheiro - c.esperado_dinheiro
+        flash(f"Turno fechado. Dinheiro esperado {cash.brl(c.esperado_dinheiro)}, contado "
+              f"{cash.brl(c.contado_dinheiro)} (diferença {cash.brl(diff)}).",
+              "success" if diff == 0 else "warning")
+        return redirect(url_for("pdv.pdv_closing", dia=dia.isoformat()))
+
+    resumo = cash.day_summary(dia)
+    closings = CashClosing.query.filter_by(dia=dia).all()
+    names = _usernames([l[0] for l in resumo["linhas"]] + [c.user_id for c in closings])
+    return render_template("pdv/closing.html", dia=dia, resumo=resumo, closings=closings, names=names,
+                           meu=next((c for c in closings if c.user_id == user_id), None))
+
+@pdv_bp.route("/pdv/relatorio")
+@login_required
+def pdv_report():
+    ate = _parse_day(request.args.get("ate"), cash.today())
+    de = _parse_day(request.args.get("de"), ate.replace(day=1))
+    dias = cash.period_summary(de, ate)
+    totais = {p: sum((d[1][p]["saldo"] for d in dias), cash.ZERO) for p in cash.PAGAMENTOS}
+    return render_template("pdv/report.html", de=de, ate=ate, dias=dias, totais=totais,
+                           total=sum(totais.values(), cash.ZERO), pagamentos=cash.PAGAMENTOS)
+
+@pdv_bp.route("/api/pdv/resumo")
+@login_required
+def pdv_summary_api():
+    """Saldo por dia e forma de pagamento (valores como texto decimal, ex.: "123.40")."""
+    ate = _parse_day(request.args.get("ate"), cash.today())
+    de = _parse_day(request.args.get("de"), ate)
+    return jsonify([
+        {"dia": dia.isoformat(), "total": str(total),
+         "pagamentos": {p: {k: str(v) for k, v in vals.items()} for p, vals in por_pag.items()}}
+        for dia, por_pag, total in cash.period_summary(de, ate)
+    ])
 
 @pdv_bp.route("/pdv/test-print")
 @login_required
 def test_print():
-    cols = int(os.getenv("TICKET_COLS","40"))
-    header = _company_header()
-    lines = build_ticket_lines(
-        title="TESTE DE IMPRESSÃO",
-        header_lines=header,
-        cols=cols,
-        fields=[("Modelo","EPSON TM-T20 (ESC/POS)"), ("Colunas", str(cols)), ("OK","Sucesso")]
-    )
-    ok, err = print_ticket(lines)
-    flash("Impresso!" if ok else f"Falhou: {err}", "success" if ok else "danger")
-    return redirect(url_for("pdv.pdv_index"))
+    job = spooler.enqueue(tickets.teste(), "Teste de impressão", user_id=getattr(current_user, "id", None))
+    db.session.commit()
+    spooler.wake()
+    flash("Teste enviado para a impressora.", "success")
+    return redirect(url_for("pdv.pdv_index", impressao=job.id))
+
+# ---------------------- fila de impressão ----------------------
+
+@pdv_bp.route("/pdv/impressoes")
+@login_required
+def print_jobs():
+    status = request.args.get("status", "")
+    query = PrintJob.query.options(db.defer(PrintJob.payload))
+    if status: query = query.filter_by(status=status)
+    page = keyset_paginate(query, PrintJob.created_at, PrintJob.id, request.args, descending=True)
+    return render_template("pdv/print_jobs.html", items=page.items, page=page, status=status,
+                           stats=spooler.stats(), printer=spooler.printer_state())
+
+@pdv_bp.route("/pdv/impressoes/<int:job_id>/reimprimir", methods=["POST"])
+@login_required
+def print_job_reprint(job_id):
+    j = PrintJob.query.get_or_404(job_id)
+    if j.status in ("pendente", "falhou"):
+        spooler.retry(job_id)
+        flash("Ticket recolocado na fila.", "success")
+    else:
+        spooler.reprint(job_id, user_id=getattr(current_user, "id", None))
+        flash("2ª via enviada para a impressora.", "success")
+    spooler.wake()
+    return redirect(url_for("pdv.print_jobs", status=request.args.get("status", "")))
+
+@pdv_bp.route("/api/pdv/impressoes/<int:job_id>")
+@login_required
+def print_job_status(job_id):
+    j = db.session.query(PrintJob.status, PrintJob.attempts, PrintJob.last_error).filter_by(id=job_id).first()
+    if j is None:
+        return jsonify({"erro": "não encontrado"}), 404
+    return jsonify({"id": job_id, "status": j.status, "tentativas": j.attempts, "erro": j.last_error})
@@ -0,0 +1,119 @@
+import os, threading
+from datetime import datetime, timedelta
+from flask import current_app
+from extensions import db
+from utils_printer import printer_from_env
+from .models import PrintJob
+
+# Fila de impressão do PDV.
+# O lançamento grava o ticket (bytes ESC/POS) em print_job na mesma transação
+# do movimento e volta na hora; o job "print_spool" do agendador (acordado por
+# wake()) imprime em ordem por uma conexão mantida com a impressora.
+# Impressora fora do ar: o job volta para a fila com espera crescente; um job
+# preso em "imprimindo" (processo morreu no meio) volta depois de LEASE.
+
+BACKOFF_BASE = 5            # segundos; dobra a cada tentativa
+BACKOFF_MAX = 120
+LEASE = timedelta(minutes=2)
+
+_printer = None
+_lock = threading.Lock()    # uma drenagem por processo (a conexão não é compartilhável)
+
+def enqueue(raw, titulo, movement_id=None, user_id=None):
+    """Grava o ticket na fila (mesma transação do chamador). Chame wake() depois do commit."""
+    job = PrintJob(titulo=titulo[:120], payload=raw, movement_id=movement_id, user_id=user_id)
+    db.session.add(job)
+    return job
+
+def wake():
+    """Antecipa o próximo ciclo do job de impressão (não bloqueia a requisição)."""
+    sched = current_app.extensions.get("scheduler")
+    if sched and sched.get_job("print_spool"):
+        sched.modify_job("print_spool", next_run_time=datetime.now(sched.timezone))
+
+def _backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX))
+
+def _claim(limit, now):
+    """Reserva os próximos jobs em ordem de criação; UPDATE condicional evita impressão dupla entre processos."""
+    due = (db.session.query(PrintJob.id, PrintJob.status, PrintJob.next_attempt_at)
+           .filter(PrintJob.status.in_(("pendente", "imprimindo")), PrintJob.next_attempt_at <= now)
+           .order_by(PrintJob.id)
+           .limit(limit).all())
+    claimed = []
+    for j in due:
+        n = (PrintJob.query
+             .filter_by(id=j.id, status=j.status, next_attempt_at=j.next_attempt_at)
+             .update({"status": "imprimindo", "next_attempt_at": now + LEASE}, synchronize_session=False))
+        if n:
+            claimed.append(j.id)
+    db.session.commit()
+    return PrintJob.query.filter(PrintJob.id.in_(claimed)).order_by(PrintJob.id).all() if claimed else []
+
+def drain(limit=50):
+    """Imprime os jobs vencidos. Retorna {"impresso": n, "pendente": n, "falhou": n}."""
+    global _printer
+    max_attempts = int(os.getenv("PRINT_MAX_ATTEMPTS", "30"))
+    summary = {"impresso": 0, "pendente": 0, "falhou": 0}
+    if not _lock.acquire(blocking=False):
+        return summary
+    try:
+        if _printer is None:
+            _printer = printer_from_env()
+        jobs = _claim(limit, datetime.utcnow())
+        for i, job in enumerate(jobs):
+            try:
+                _printer.send(job.payload)
+                err = None
+            except Exception as e:
+                err = str(e) or e.__class__.__name__
+            now = datetime.utcnow()
+            job.attempts = (job.attempts or 0) + 1
+            if err is None:
+                job.status, job.printed_at, job.last_error = "impresso", now, None
+            elif job.attempts >= max_attempts:
+                job.status, job.last_error = "falhou", err
+            else:
+                job.status, job.last_error = "pendente", err
+                job.next_attempt_at = now + _backoff(job.attempts)
+            summary[job.status] += 1
+            if err is not None:
+                # impressora fora: os seguintes esperam junto, sem gastar tentativa, e mantêm a ordem
+                for rest in jobs[i + 1:]:
+                    rest.status, rest.next_attempt_at = "pendente", now + _backoff(job.attempts)
+                    summary["pendente"] += 1
+                db.session.commit()
+                break
+            db.session.commit()     # um commit por ticket: queda no meio não reimprime os já saídos
+        _printer.close_if_idle()
+    finally:
+        _lock.release()
+    return summary
+
+def retry(job_id):
+    """Recoloca um job pendente/falho na fila para agora."""
+    j = PrintJob.query.get(job_id)
+    if j and j.status in ("pendente", "falhou"):
+        j.status, j.next_attempt_at = "pendente", datetime.utcnow()
+        db.session.commit()
+    return j
+
+def reprint(job_id, user_id=None):
+    """Nova cópia de um ticket já impresso (o original fica no histórico)."""
+    j = PrintJob.query.get(job_id)
+    if j is None:
+        return None
+    titulo = j.titulo if j.titulo.endswith("(2ª via)") else f"{j.titulo} (2ª via)"
+    copia = enqueue(j.payload, titulo, movement_id=j.movement_id, user_id=user_id)
+    db.session.commit()
+    return copia
+
+def stats():
+    rows = db.session.query(PrintJob.status, db.func.count(PrintJob.id)).group_by(PrintJob.status).all()
+    return dict(rows)
+
+def printer_state():
+    """Estado da conexão neste processo (None se ainda não imprimiu nada aqui)."""
+    if _printer is None:
+        return None
+    return {"conectada": _printer.connected, "erro": _printer.last_error}
@@ -0,0 +1,79 @@
+import os, time
+from functools import lru_cache
+from flask import current_app
+from sqlalchemy import event
+from models import Company
+from utils_printer import TicketTemplate, raster_image, qr_code
+from .cash import brl
+
+# Layouts dos tickets do PDV, compilados uma vez por (layout, colunas, cabeçalho, logo).
+# .env: TICKET_COLS, TICKET_LOGO (imagem, relativa à raiz do app), TICKET_LOGO_DOTS
+# (largura máxima do logo em pontos) e TICKET_QR ("1" = QR com o nº do ticket de
+# pesagem, ou um texto com {ticket}, ex.: https://exemplo/ticket/{ticket}).
+
+COMPROVANTE = ("Tipo", "Valor", "Forma", "Cliente", "Ticket", "Descrição", "Data")
+TESTE = ("Modelo", "Colunas", "OK")
+HEADER_TTL = 300    # segundos; alterações de empresa neste processo limpam na hora
+
+_header = {"linhas": None, "em": 0.0}
+
+@event.listens_for(Company, "after_insert")
+@event.listens_for(Company, "after_update")
+@event.listens_for(Company, "after_delete")
+def _company_changed(mapper, connection, target):
+    _header["linhas"] = None
+
+def company_header():
+    """Cabeçalho do ticket a partir da primeira empresa cadastrada (ou TICKET_HEADER_1..3)."""
+    if _header["linhas"] is not None and time.monotonic() - _header["em"] < HEADER_TTL:
+        return _header["linhas"]
+    linhas = None
+    c = Company.query.order_by(Company.id.asc()).first()
+    if c:
+        endereco = ", ".join(x for x in (c.logradouro, c.numero) if x)
+        if c.cidade:
+            endereco = f"{endereco} - {c.cidade}" if endereco else c.cidade
+        linhas = [c.nome_fantasia or (c.razao_social or ""), endereco]
+        if c.cnpj:
+            linhas.append(f"CNPJ: {c.cnpj}")
+        linhas = tuple(h for h in linhas if h.strip())
+    if not linhas:
+        linhas = tuple(x for x in (os.getenv("TICKET_HEADER_1", "TRANSer"),
+                                   os.getenv("TICKET_HEADER_2", ""),
+                                   os.getenv("TICKET_HEADER_3", "")) if x)
+    _header.update(linhas=linhas, em=time.monotonic())
+    return linhas
+
+def _cols():
+    return int(os.getenv("TICKET_COLS", "40"))
+
+def _logo(cols):
+    path = os.getenv("TICKET_LOGO", "")
+    if not path:
+        return b""
+    if not os.path.isabs(path):
+        path = os.path.join(current_app.root_path, path)
+    return raster_image(path, max_dots=int(os.getenv("TICKET_LOGO_DOTS", "384" if cols <= 32 else "512")))
+
+def _qr(ticket_ref):
+    conf = os.getenv("TICKET_QR", "")
+    if not conf or not ticket_ref:
+        return b""
+    return qr_code(ticket_ref if conf == "1" else conf.format(ticket=ticket_ref))
+
+@lru_cache(maxsize=32)
+def template(title, header, cols, labels, ask_signature=False, logo=b""):
+    return TicketTemplate(title, header, cols, labels, ask_signature, logo)
+
+def comprovante(mov):
+    """Bytes ESC/POS do comprovante de um CashMovement."""
+    cols = _cols()
+    t = template("COMPROVANTE DE CAIXA", company_header(), cols, COMPROVANTE,
+                 mov.tipo in ("SANGRIA", "RETIRADA"), _logo(cols))
+    return t.render((mov.tipo, brl(mov.valor), mov.pagamento, mov.cliente, mov.ticket_ref,
+                     mov.descricao, mov.created_at.strftime("%d/%m/%Y %H:%M")), qr=_qr(mov.ticket_ref))
+
+def teste():
+    cols = _cols()
+    t = template("TESTE DE IMPRESSÃO", company_header(), cols, TESTE, False, _logo(cols))
+    return t.render(("EPSON TM-T20 (ESC/POS)", str(cols), "Sucesso"))
@@ -1,12 +1,44 @@
-import os
-from flask import Blueprint, current_app, send_from_directory
-from flask_login import login_required
+import os, re, mimetypes
+from urllib.parse import quote
+from flask import Blueprint, current_app, send_file, abort, request, Response, jsonify
+from flask_login import login_required, current_user
+from werkzeug.security import safe_join
+from images import VARIANTS, derivative
+import blobstore
 
 uploads_bp = Blueprint("uploads", __name__)
 
+# nomes gerados pelo blobstore: <sha256>.<ext> — conteúdo imutável
+_HASHED = re.compile(r"(?:^|/)([0-9a-f]{64})\.[A-Za-z0-9]+$")
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+def _cache_headers(resp, immutable):
+    resp.cache_control.public = False
+    resp.cache_control.private = True
+    if immutable:
+        resp.cache_control.no_cache = None
+        resp.cache_control.max_age = IMMUTABLE_MAX_AGE
+        resp.cache_control.immutable = True
+    else:
+        resp.cache_control.no_cache = True
+    return resp
+
+def _etag(path, filename):
+    m = _HASHED.search(filename)
+    if m:
+        return m.group(1), True
+    st = os.stat(path)
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}", False
+
 @uploads_bp.route("/uploads/<path:filename>")
 @login_required
 def serve_upload(filename):
+    """
+    Entrega um upload após checar o login.
+    UPLOAD_OFFLOAD=x-accel: responde só com X-Accel-Redirect e o nginx envia os bytes;
+    UPLOAD_OFFLOAD=x-sendfile: idem via X-Sendfile (Apache/lighttpd);
+    padrão: o próprio Flask envia, com ETag, If-None-Match e Range (visualizadores de PDF).
+    """
     filename = filename.replace("\\", "/").lstrip("/")
     if filename.startswith("uploads/"):
         filename = filename[len("uploads/"):]
@@ -14,4 +46,90 @@ def serve_upload(filename):
         current_app.root_path,
         current_app.config.get("UPLOAD_FOLDER", "uploads"),
     )
-    return send_from_directory(root, filename, as_attachment=False)
+    path = safe_join(root, filename)
+    if not path:
+        abort(404)
+    # compara o caminho já normalizado: "fotos/../_partial/x.part" e "./_partial/..." também caem aqui
+    filename = os.path.relpath(path, root).replace(os.sep, "/")
+    if filename.startswith(blobstore.PARTIAL_DIR + "/") or not os.path.isfile(path):
+        abort(404)
+    etag, immutable = _etag(path, filename)
+
+    if current_app.config.get("UPLOAD_OFFLOAD") == "x-accel":
+        if request.if_none_match.contains(etag):
+            resp = Response(status=304)
+        else:
+            resp = Response(mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream")
+            resp.headers["X-Accel-Redirect"] = current_app.config["UPLOAD_ACCEL_PREFIX"].rstrip("/") + "/" + quote(filename)
+        resp.set_etag(etag)
+        return _cache_headers(resp, immutable)
+
+    # x-sendfile: USE_X_SENDFILE (ligado em create_app) faz o send_file só emitir o cabeçalho
+    resp = send_file(path, as_attachment=False, etag=etag, conditional=True)
+    return _cache_headers(resp, immutable)
+
+@uploads_bp.route("/uploads/img/<variant>/<path:filename>")
+@login_required
+def serve_image(variant, filename):
+    """Versão reduzida de uma foto (thumb, web, pdf), gerada sob demanda e reaproveitada."""
+    if variant not in VARIANTS:
+        abort(404)
+    path = derivative(current_app, filename, variant)
+    if not path:
+        abort(404)
+    resp = send_file(path, max_age=86400, conditional=True)
+    resp.cache_control.public = False
+    resp.cache_control.private = True
+    return resp
+
+# ---------------------- envio em partes (retomável) ----------------------
+# Usado por static/js/chunked_upload.js para PDFs grandes. Cada pedaço é uma
+# requisição curta gravada direto do corpo para o disco (sem multipart).
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+def _upload_error(e):
+    status = 413 if isinstance(e, blobstore.UploadTooLarge) else 400
+    return jsonify({"erro": str(e)}), status
+
+@uploads_bp.route("/uploads/parcial", methods=["POST"])
+@login_required
+def partial_create():
+    if not request.is_json:
+        abort(415)
+    data = request.get_json(silent=True) or {}
+    try:
+        upload_id = blobstore.partial_create(data.get("filename"), int(data.get("size", -1)),
+                                             current_user.username)
+    except (blobstore.UploadError, ValueError) as e:
+        return _upload_error(e)
+    return jsonify({"id": upload_id, "offset": 0, "chunk_size": CHUNK_SIZE}), 201
+
+@uploads_bp.route("/uploads/parcial/<upload_id>", methods=["GET"])
+@login_required
+def partial_status(upload_id):
+    try:
+        offset, size = blobstore.partial_info(upload_id, current_user.username)
+    except blobstore.UploadError as e:
+        return jsonify({"erro": str(e)}), 404
+    return jsonify({"id": upload_id, "offset": offset, "size": size})
+
+@uploads_bp.route("/uploads/parcial/<upload_id>", methods=["PATCH"])
+@login_required
+def partial_append(upload_id):
+    """Corpo = bytes do pedaço; cabeçalho Upload-Offset = posição onde ele começa."""
+    try:
+        offset = int(request.headers.get("Upload-Offset", ""))
+    except ValueError:
+        return jsonify({"erro": "Upload-Offset obrigatório."}), 400
+    try:
+        new_offset = blobstore.partial_append(upload_id, current_user.username, offset,
+                                              request.stream, request.headers.get("X-Chunk-SHA256"))
+    except blobstore.UploadError as e:
+        # offset fora de ordem: devolve onde parou para o navegador continuar dali
+        try:
+            current, _ = blobstore.partial_info(upload_id, current_user.username)
+        except blobstore.UploadError:
+            return jsonify({"erro": str(e)}), 404
+        return jsonify({"erro": str(e), "offset": current}), 409
+    return jsonify({"id": upload_id, "offset": new_offset})
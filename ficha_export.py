@@ -0,0 +1,85 @@
+import io, os, time, zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from types import SimpleNamespace
+from werkzeug.utils import secure_filename
+from pdf_reports import employee_pdf
+
+# Exportação em lote das fichas de colaboradores.
+# Módulo leve de propósito: os processos do pool só importam isto + pdf_reports.
+
+def snapshot(e):
+    """Cópia simples (picklável) do colaborador com os relacionamentos que a ficha usa."""
+    data = {c.key: getattr(e, c.key) for c in e.__mapper__.column_attrs}
+    data["company"] = SimpleNamespace(razao_social=e.company.razao_social) if e.company else None
+    data["funcao"] = SimpleNamespace(nome=e.funcao.nome) if e.funcao else None
+    return SimpleNamespace(**data)
+
+def _app_info(app):
+    return SimpleNamespace(root_path=app.root_path,
+                           config={"UPLOAD_FOLDER": app.config.get("UPLOAD_FOLDER", "uploads")})
+
+def _render(snap, app_info):
+    t0 = time.perf_counter()
+    buf = io.BytesIO()
+    employee_pdf(buf, app_info, snap)
+    return snap.id, snap.nome, buf.getvalue(), time.perf_counter() - t0
+
+def render_parallel(employees, app, workers=None):
+    """
+    Gera a ficha de cada colaborador num pool de processos (PDF_EXPORT_WORKERS,
+    padrão = nº de CPUs). Produz (id, nome, pdf_bytes, segundos) na ordem em que ficam prontas.
+    """
+    snaps = [snapshot(e) for e in employees]
+    info = _app_info(app)
+    workers = workers or int(os.getenv("PDF_EXPORT_WORKERS", "0")) or os.cpu_count() or 1
+    if workers == 1 or len(snaps) < 2:
+        for s in snaps:
+            yield _render(s, info)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(snaps))) as pool:
+        futures = [pool.submit(_render, s, info) for s in snaps]
+        for fut in as_completed(futures):
+            yield fut.result()
+
+class _Sink:
+    """Destino não-pesquisável para o ZipFile: acumula bytes até serem retirados."""
+    def __init__(self):
+        self._parts = []
+
+    def write(self, b):
+        self._parts.append(bytes(b))
+        return len(b)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        out = b"".join(self._parts)
+        self._parts = []
+        return out
+
+def zip_stream(results, total, on_progress=None):
+    """
+    Empacota os PDFs num ZIP, devolvendo pedaços do arquivo à medida que cada
+    ficha fica pronta. No fim inclui relatorio.txt com o tempo de cada uma.
+    """
+    sink = _Sink()
+    t0 = time.perf_counter()
+    report = []
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as zf:
+        for n, (emp_id, nome, data, secs) in enumerate(results, 1):
+            zf.writestr(f"colaborador_{emp_id}_{secure_filename(nome or '')}.pdf", data)
+            report.append(f"{emp_id};{nome};{secs:.3f}s;{len(data)} bytes")
+            if on_progress:
+                on_progress(n, total, emp_id, secs)
+            yield sink.take()
+        elapsed = time.perf_counter() - t0
+        header = [
+            f"Fichas de colaboradores - {datetime.now().strftime('%d/%m/%Y %H:%M')}",
+            f"Total: {len(report)} de {total} em {elapsed:.1f}s",
+            "",
+            "id;nome;tempo;tamanho",
+        ]
+        zf.writestr("relatorio.txt", "\n".join(header + report) + "\n")
+    yield sink.take()
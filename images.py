@@ -0,0 +1,72 @@
+import os
+from PIL import Image, ImageOps, features
+
+# Derivados pré-dimensionados das fotos enviadas (uploads/fotos).
+# Ficam em uploads/_deriv/<variante>/<caminho original>.<ext> e são
+# regerados quando o original é mais novo que o derivado.
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+DERIV_DIR = "_deriv"
+
+_WEBP = features.check("webp")
+
+# variante: (largura, altura, formato, extensão)
+VARIANTS = {
+    "pdf": (354, 472, "JPEG", ".jpg"),   # 3x4 cm a 300 DPI
+    "thumb": (48, 64, "JPEG", ".jpg"),   # miniatura da listagem
+    "web": (240, 320, "WEBP", ".webp") if _WEBP else (240, 320, "JPEG", ".jpg"),
+}
+
+def _upload_root(app):
+    return os.path.join(app.root_path, app.config.get("UPLOAD_FOLDER", "uploads"))
+
+def _norm(rel):
+    rel = str(rel or "").replace("\\", "/").lstrip("/")
+    if rel.startswith("uploads/"):
+        rel = rel[len("uploads/"):]
+    return rel
+
+def is_image(rel):
+    return os.path.splitext(str(rel or ""))[1].lower() in IMAGE_EXTENSIONS
+
+def derivative_path(app, rel, variant):
+    """Caminho absoluto do derivado (pode ainda não existir)."""
+    ext = VARIANTS[variant][3]
+    base = os.path.splitext(_norm(rel))[0]
+    return os.path.join(_upload_root(app), DERIV_DIR, variant, base + ext)
+
+def derivative(app, rel, variant):
+    """
+    Devolve o caminho do derivado, gerando-o se faltar ou estiver desatualizado.
+    Retorna None se o original não existir ou não for imagem.
+    """
+    rel = _norm(rel)
+    if not rel or not is_image(rel) or rel.startswith(DERIV_DIR + "/") or ".." in rel.split("/"):
+        return None
+    src = os.path.join(_upload_root(app), rel)
+    if not os.path.exists(src):
+        return None
+    dst = derivative_path(app, rel, variant)
+    if os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src):
+        return dst
+    w, h, fmt, _ = VARIANTS[variant]
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    with Image.open(src) as im:
+        im = ImageOps.exif_transpose(im).convert("RGB")
+        # nunca amplia: original pequeno só é recortado na proporção 3x4
+        f = min(1.0, im.width / w, im.height / h)
+        im = ImageOps.fit(im, (max(1, int(w * f)), max(1, int(h * f))), Image.LANCZOS)
+        tmp = dst + ".tmp"
+        im.save(tmp, fmt, quality=85, **({"dpi": (300, 300)} if variant == "pdf" else {}))
+    os.replace(tmp, dst)
+    return dst
+
+def make_derivatives(app, rel):
+    """Gera todas as variantes de uma imagem recém-enviada (erros não impedem o upload)."""
+    if not is_image(rel):
+        return
+    for variant in VARIANTS:
+        try:
+            derivative(app, rel, variant)
+        except Exception:
+            app.logger.warning("Falha ao gerar derivado %s de %s", variant, rel, exc_info=True)
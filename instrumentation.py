@@ -0,0 +1,229 @@
+import cProfile, glob, hmac, os, random, re, threading, time
+from datetime import datetime
+from flask import g, request, has_request_context, before_render_template, template_rendered, Response, abort, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from utils import admin_required
+
+# Instrumentação opcional (INSTRUMENTATION=1).
+# Por requisição: tempo total, nº e tempo de queries (cursor events do SQLAlchemy),
+# tempo de render de templates e detecção de N+1 (a mesma SQL repetida mais de
+# N_PLUS_ONE_THRESHOLD vezes). Agregado por endpoint em memória, por processo:
+# exposto em /admin/desempenho e em /metrics (formato Prometheus).
+# /metrics: com METRICS_TOKEN exige "Authorization: Bearer <token>" (ou ?token=);
+# sem token, só administrador logado (atrás do nginx todo acesso vem de localhost).
+# Uma amostra das requisições (PROFILE_SAMPLE_RATE) roda sob cProfile; se
+# passar de SLOW_REQUEST_MS, o perfil vai para PROFILE_DIR (.prof, abre com pstats/snakeviz).
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_N_PLUS_ONE = 50     # ocorrências guardadas para a página
+MAX_PROFILES = 50       # arquivos .prof mantidos em disco
+
+class _Stats:
+    __slots__ = ("count", "sum", "buckets", "queries", "query_time", "template_time", "n_plus_one", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.queries = 0
+        self.query_time = 0.0
+        self.template_time = 0.0
+        self.n_plus_one = 0
+
+    def quantile(self, q):
+        """Estimativa pelo histograma (limite superior do balde)."""
+        if not self.count: return 0.0
+        target = q * self.count
+        for le, n in zip(BUCKETS, self.buckets):
+            if n >= target: return le
+        return self.max
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.n_plus_one = []    # (quando, endpoint, vezes, sql)
+        self.started = datetime.now()
+
+    def record(self, endpoint, elapsed, queries, query_time, template_time, repeated):
+        with self.lock:
+            s = self.endpoints.get(endpoint)
+            if s is None:
+                s = self.endpoints[endpoint] = _Stats()
+            s.count += 1
+            s.sum += elapsed
+            s.max = max(s.max, elapsed)
+            for i, le in enumerate(BUCKETS):
+                if elapsed <= le: s.buckets[i] += 1
+            s.queries += queries
+            s.query_time += query_time
+            s.template_time += template_time
+            if repeated:
+                s.n_plus_one += 1
+                for sql, n in repeated:
+                    self.n_plus_one.append((datetime.now(), endpoint, n, sql))
+                del self.n_plus_one[:-MAX_N_PLUS_ONE]
+
+    def snapshot(self):
+        with self.lock:
+            rows = [(ep, _copy(s)) for ep, s in self.endpoints.items()]
+            return sorted(rows, key=lambda r: -r[1].sum), list(reversed(self.n_plus_one))
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+            self.n_plus_one.clear()
+            self.started = datetime.now()
+
+def _copy(s):
+    c = _Stats()
+    for k in _Stats.__slots__:
+        v = getattr(s, k)
+        setattr(c, k, list(v) if isinstance(v, list) else v)
+    return c
+
+registry = Registry()
+
+# ---------------------- ganchos ----------------------
+
+_WS = re.compile(r"\s+")
+
+def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "_metrics" in g:
+        conn.info.setdefault("_query_start", []).append(time.perf_counter())
+
+def _after_cursor(conn, cursor, statement, parameters, context, executemany):
+    if not (has_request_context() and "_metrics" in g): return
+    starts = conn.info.get("_query_start")
+    if not starts: return
+    m = g._metrics
+    m["queries"] += 1
+    m["query_time"] += time.perf_counter() - starts.pop()
+    # SQL já vem parametrizada: a mesma string repetida = mesmo formato de query
+    sql = _WS.sub(" ", statement).strip()[:300]
+    m["statements"][sql] = m["statements"].get(sql, 0) + 1
+
+def _template_start(app, template, context, **extra):
+    if "_metrics" in g:
+        g._metrics["template_start"].append(time.perf_counter())
+
+def _template_done(app, template, context, **extra):
+    if "_metrics" in g and g._metrics["template_start"]:
+        g._metrics["template_time"] += time.perf_counter() - g._metrics["template_start"].pop()
+
+def init_instrumentation(app):
+    """Liga os ganchos e /metrics (chamado em create_app quando INSTRUMENTATION=1)."""
+    if os.getenv("INSTRUMENTATION", "0") != "1":
+        return
+    threshold = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+    slow = int(os.getenv("SLOW_REQUEST_MS", "1000")) / 1000.0
+    sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    profile_dir = os.path.join(app.root_path, os.getenv("PROFILE_DIR", "profiles"))
+    app.extensions["instrumentation"] = {"registry": registry, "profile_dir": profile_dir,
+                                         "slow_ms": slow * 1000, "threshold": threshold}
+
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor):
+        event.listen(Engine, "before_cursor_execute", _before_cursor)
+        event.listen(Engine, "after_cursor_execute", _after_cursor)
+    before_render_template.connect(_template_start, app)
+    template_rendered.connect(_template_done, app)
+
+    @app.before_request
+    def _start():
+        g._metrics = {"start": time.perf_counter(), "queries": 0, "query_time": 0.0,
+                      "template_time": 0.0, "template_start": [], "statements": {}}
+        if sample_rate and random.random() < sample_rate:
+            g._profiler = cProfile.Profile()
+            try:
+                g._profiler.enable()
+            except ValueError:      # outro profiler ativo nesta thread
+                g._profiler = None
+
+    @app.teardown_request
+    def _finish(exc):
+        m = g.pop("_metrics", None)
+        if m is None: return
+        elapsed = time.perf_counter() - m["start"]
+        endpoint = request.endpoint or f"<{request.method} sem rota>"
+        repeated = [(sql, n) for sql, n in m["statements"].items() if n > threshold]
+        if repeated:
+            current_app.logger.warning("N+1? %s: %s", endpoint,
+                                       "; ".join(f"{n}x {sql[:120]}" for sql, n in repeated))
+        registry.record(endpoint, elapsed, m["queries"], m["query_time"], m["template_time"], repeated)
+
+        profiler = g.pop("_profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            if elapsed >= slow:
+                _dump_profile(profiler, profile_dir, endpoint, elapsed)
+
+    def metrics():
+        return Response(prometheus_text(), mimetype="text/plain; version=0.0.4")
+
+    token = os.getenv("METRICS_TOKEN", "")
+    if token:
+        def metrics_with_token():
+            sent = request.headers.get("Authorization", "").removeprefix("Bearer ") or request.args.get("token", "")
+            if not hmac.compare_digest(sent.encode(), token.encode()):
+                abort(403)
+            return metrics()
+        app.add_url_rule("/metrics", endpoint="metrics", view_func=metrics_with_token)
+    else:
+        app.add_url_rule("/metrics", endpoint="metrics", view_func=admin_required(metrics))
+
+def _dump_profile(profiler, profile_dir, endpoint, elapsed):
+    try:
+        os.makedirs(profile_dir, exist_ok=True)
+        name = f"{datetime.now():%Y%m%d-%H%M%S}_{re.sub(r'[^A-Za-z0-9_.-]', '_', endpoint)}_{int(elapsed * 1000)}ms.prof"
+        profiler.dump_stats(os.path.join(profile_dir, name))
+        for old in sorted(glob.glob(os.path.join(profile_dir, "*.prof")))[:-MAX_PROFILES]:
+            os.unlink(old)
+    except OSError:
+        current_app.logger.exception("Perfil não gravado (%s)", endpoint)
+
+def profiles(profile_dir):
+    """Arquivos .prof gravados, do mais novo para o mais antigo."""
+    return sorted((os.path.basename(p) for p in glob.glob(os.path.join(profile_dir, "*.prof"))), reverse=True)
+
+def profile_summary(profile_dir, name, limit=40):
+    """Top funções por tempo acumulado (texto do pstats)."""
+    import io, pstats
+    path = os.path.join(profile_dir, os.path.basename(name))
+    if not name.endswith(".prof") or not os.path.isfile(path):
+        return None
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).strip_dirs().sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+# ---------------------- exportação ----------------------
+
+def _label(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"')
+
+def prometheus_text():
+    rows, _ = registry.snapshot()
+    lines = [
+        "# HELP http_request_duration_seconds Tempo de resposta por endpoint.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for ep, s in rows:
+        ep = _label(ep)
+        for le, n in zip(BUCKETS, s.buckets):
+            lines.append(f'http_request_duration_seconds_bucket{{endpoint="{ep}",le="{le}"}} {n}')
+        lines.append(f'http_request_duration_seconds_bucket{{endpoint="{ep}",le="+Inf"}} {s.count}')
+        lines.append(f'http_request_duration_seconds_sum{{endpoint="{ep}"}} {s.sum:.6f}')
+        lines.append(f'http_request_duration_seconds_count{{endpoint="{ep}"}} {s.count}')
+    for name, attr, help_ in (
+        ("http_request_db_queries_total", "queries", "Queries SQL executadas."),
+        ("http_request_db_seconds_total", "query_time", "Tempo gasto em queries SQL."),
+        ("http_request_template_seconds_total", "template_time", "Tempo de render de templates."),
+        ("http_request_n_plus_one_total", "n_plus_one", "Requisições com SQL repetida (possível N+1)."),
+    ):
+        lines += [f"# HELP {name} {help_}", f"# TYPE {name} counter"]
+        for ep, s in rows:
+            v = getattr(s, attr)
+            lines.append(f'{name}{{endpoint="{_label(ep)}"}} {v:.6f}' if isinstance(v, float)
+                         else f'{name}{{endpoint="{_label(ep)}"}} {v}')
+    return "\n".join(lines) + "\n"
@@ -51,6 +51,25 @@ def get_metadata():
     return target_db.metadata
 
 
+# Objetos da busca criados com SQL puro em f6b8d0e2a457_search_doc (FTS5 e suas
+# tabelas-sombra no SQLite; coluna tsv e índice GIN no Postgres). Não estão nos
+# models, então o autogenerate os ignora em vez de gerar DROP.
+SEARCH_INDEX_COLUMNS = {("search_doc", "tsv")}
+SEARCH_INDEX_INDEXES = {"ix_search_doc_tsv"}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if not reflected or compare_to is not None:
+        return True
+    if type_ == "table":
+        return not name.startswith("search_doc_fts")
+    if type_ == "column":
+        return (object.table.name, name) not in SEARCH_INDEX_COLUMNS
+    if type_ == "index":
+        return name not in SEARCH_INDEX_INDEXES
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +84,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -93,6 +113,7 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
 
     connectable = get_engine()
 
@@ -0,0 +1,26 @@
+"""document: indice (company_id, tipo_id, data_vencimento)
+
+Revision ID: a1c3e5f7b901
+Revises: d9a8413e3fdb
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c3e5f7b901'
+down_revision = 'd9a8413e3fdb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.create_index('ix_document_company_tipo_venc', ['company_id', 'tipo_id', 'data_vencimento'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.drop_index('ix_document_company_tipo_venc')
@@ -0,0 +1,69 @@
+"""search_term: índice normalizado de colaboradores e empresas
+
+Revision ID: a7c9e1f3b568
+Revises: f6b8d0e2a457
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+import re
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c9e1f3b568'
+down_revision = 'f6b8d0e2a457'
+branch_labels = None
+depends_on = None
+
+
+def _words(s):
+    s = unicodedata.normalize("NFKD", str(s or "")).encode("ascii", "ignore").decode().lower()
+    return re.findall(r"[a-z0-9]+", s)
+
+
+def _digits(s):
+    return re.sub(r"\D", "", str(s or ""))
+
+
+def upgrade():
+    op.create_table('search_term',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(length=20), nullable=False),
+    sa.Column('ref_id', sa.Integer(), nullable=False),
+    sa.Column('term', sa.String(length=60), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('search_term', schema=None) as batch_op:
+        batch_op.create_index('ix_search_term_lookup', ['entity', 'term', 'ref_id'], unique=False)
+        batch_op.create_index('ix_search_term_ref', ['entity', 'ref_id'], unique=False)
+
+    # carga inicial (mesma normalização de search.py)
+    conn = op.get_bind()
+    term = sa.table('search_term', sa.column('entity'), sa.column('ref_id'), sa.column('term'))
+    rows = []
+    for r in conn.execute(sa.text("""
+        SELECT e.id, e.nome, e.cpf, c.razao_social, c.nome_fantasia, f.nome
+        FROM employee e
+        LEFT JOIN company c ON c.id = e.company_id
+        LEFT JOIN funcao f ON f.id = e.funcao_id
+    """)):
+        terms = set(_words(" ".join(str(x or "") for x in r[1:])))
+        if _digits(r[2]): terms.add(_digits(r[2]))
+        rows += [{"entity": "employee", "ref_id": r[0], "term": t[:60]} for t in terms]
+    for r in conn.execute(sa.text("SELECT id, razao_social, nome_fantasia, cnpj FROM company")):
+        terms = set(_words(" ".join(str(x or "") for x in r[1:])))
+        if _digits(r[3]): terms.add(_digits(r[3]))
+        rows += [{"entity": "company", "ref_id": r[0], "term": t[:60]} for t in terms]
+    if rows:
+        op.bulk_insert(term, rows)
+
+
+def downgrade():
+    with op.batch_alter_table('search_term', schema=None) as batch_op:
+        batch_op.drop_index('ix_search_term_ref')
+        batch_op.drop_index('ix_search_term_lookup')
+
+    op.drop_table('search_term')
@@ -0,0 +1,26 @@
+"""employee: indice em cnh_validade
+
+Revision ID: b2d4f6a8c013
+Revises: a1c3e5f7b901
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d4f6a8c013'
+down_revision = 'a1c3e5f7b901'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('employee', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_employee_cnh_validade'), ['cnh_validade'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('employee', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_employee_cnh_validade'))
@@ -0,0 +1,37 @@
+"""employee: nascimento_mmdd indexado (filtro de aniversariantes)
+
+Revision ID: b8d0f2a4c679
+Revises: a7c9e1f3b568
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d0f2a4c679'
+down_revision = 'a7c9e1f3b568'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('employee', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('nascimento_mmdd', sa.SmallInteger(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_employee_nascimento_mmdd'), ['nascimento_mmdd'], unique=False)
+
+    employee = sa.table('employee', sa.column('data_nascimento', sa.Date), sa.column('nascimento_mmdd'))
+    op.execute(
+        employee.update()
+        .where(employee.c.data_nascimento.isnot(None))
+        .values(nascimento_mmdd=sa.cast(
+            sa.extract('month', employee.c.data_nascimento) * 100 + sa.extract('day', employee.c.data_nascimento),
+            sa.SmallInteger))
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('employee', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_employee_nascimento_mmdd'))
+        batch_op.drop_column('nascimento_mmdd')
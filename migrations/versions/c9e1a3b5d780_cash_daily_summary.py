@@ -0,0 +1,80 @@
+"""pdv: resumo diário do caixa e fechamento de turno (une as heads do PDV e do app)
+
+Revision ID: c9e1a3b5d780
+Revises: b8d0f2a4c679, pdv_cash_20250811152802
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+import os
+from collections import defaultdict
+from decimal import Decimal
+from alembic import op
+import sqlalchemy as sa
+from pytz import timezone, utc
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e1a3b5d780'
+down_revision = ('b8d0f2a4c679', 'pdv_cash_20250811152802')
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'cash_daily_summary',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('dia', sa.Date(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('pagamento', sa.String(length=20), nullable=False),
+        sa.Column('entradas', sa.Numeric(12, 2), nullable=False),
+        sa.Column('saidas', sa.Numeric(12, 2), nullable=False),
+        sa.Column('qtd', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('dia', 'user_id', 'pagamento', name='uq_cash_daily_summary'),
+    )
+    op.create_table(
+        'cash_closing',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('dia', sa.Date(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('fundo_troco', sa.Numeric(12, 2), nullable=False),
+        sa.Column('esperado_dinheiro', sa.Numeric(12, 2), nullable=False),
+        sa.Column('contado_dinheiro', sa.Numeric(12, 2), nullable=False),
+        sa.Column('total_pix', sa.Numeric(12, 2), nullable=False),
+        sa.Column('total_cartao', sa.Numeric(12, 2), nullable=False),
+        sa.Column('observacao', sa.String(length=255), nullable=True),
+        sa.Column('closed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('dia', 'user_id', name='uq_cash_closing'),
+    )
+
+    # resumos dos movimentos já existentes (dia no fuso do PDV)
+    tz = timezone(os.getenv("PDV_TIMEZONE", "America/Sao_Paulo"))
+    conn = op.get_bind()
+    totals = defaultdict(lambda: [Decimal(0), Decimal(0), 0])
+    mov = sa.table('cash_movement', sa.column('created_at', sa.DateTime), sa.column('user_id', sa.Integer),
+                   sa.column('pagamento', sa.String), sa.column('tipo', sa.String), sa.column('valor', sa.Numeric(10, 2)))
+    rows = conn.execute(sa.select(mov.c.created_at, mov.c.user_id, mov.c.pagamento, mov.c.tipo, mov.c.valor))
+    for created_at, user_id, pagamento, tipo, valor in rows:
+        dia = utc.localize(created_at).astimezone(tz).date()
+        acc = totals[(dia, user_id or 0, pagamento)]
+        v = Decimal(str(valor or 0))
+        if tipo == 'VENDA':
+            acc[0] += v
+        else:
+            acc[1] += v
+        acc[2] += 1
+    if totals:
+        summary = sa.table('cash_daily_summary', sa.column('dia', sa.Date), sa.column('user_id', sa.Integer),
+                           sa.column('pagamento', sa.String), sa.column('entradas', sa.Numeric(12, 2)),
+                           sa.column('saidas', sa.Numeric(12, 2)), sa.column('qtd', sa.Integer))
+        op.bulk_insert(summary, [
+            {"dia": dia, "user_id": user_id, "pagamento": pagamento, "entradas": e, "saidas": s, "qtd": n}
+            for (dia, user_id, pagamento), (e, s, n) in totals.items()
+        ])
+
+
+def downgrade():
+    op.drop_table('cash_closing')
+    op.drop_table('cash_daily_summary')
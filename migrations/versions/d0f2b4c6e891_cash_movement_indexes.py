@@ -0,0 +1,34 @@
+"""cash_movement: índices para período, forma, tipo, operador e ticket
+
+Revision ID: d0f2b4c6e891
+Revises: c9e1a3b5d780
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd0f2b4c6e891'
+down_revision = 'c9e1a3b5d780'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('cash_movement', schema=None) as batch_op:
+        batch_op.create_index('ix_cash_movement_created_at', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_cash_movement_pagamento', ['pagamento', 'created_at'], unique=False)
+        batch_op.create_index('ix_cash_movement_tipo', ['tipo', 'created_at'], unique=False)
+        batch_op.create_index('ix_cash_movement_user', ['user_id', 'created_at'], unique=False)
+        batch_op.create_index('ix_cash_movement_ticket_ref', ['ticket_ref'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('cash_movement', schema=None) as batch_op:
+        batch_op.drop_index('ix_cash_movement_ticket_ref')
+        batch_op.drop_index('ix_cash_movement_user')
+        batch_op.drop_index('ix_cash_movement_tipo')
+        batch_op.drop_index('ix_cash_movement_pagamento')
+        batch_op.drop_index('ix_cash_movement_created_at')
@@ -0,0 +1,30 @@
+"""audit_log: indices para filtros e retenção
+
+Revision ID: d4f6b8c0e235
+Revises: c3e5a7b9d124
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f6b8c0e235'
+down_revision = 'c3e5a7b9d124'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('audit_log', schema=None) as batch_op:
+        batch_op.create_index('ix_audit_log_created_at', ['created_at'], unique=False)
+        batch_op.create_index('ix_audit_log_entity', ['entity', 'entity_id', 'created_at'], unique=False)
+        batch_op.create_index('ix_audit_log_user', ['user', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('audit_log', schema=None) as batch_op:
+        batch_op.drop_index('ix_audit_log_user')
+        batch_op.drop_index('ix_audit_log_entity')
+        batch_op.drop_index('ix_audit_log_created_at')
@@ -0,0 +1,46 @@
+"""pdv: fila persistente de impressão
+
+Revision ID: e1a3c5d7f902
+Revises: d0f2b4c6e891
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1a3c5d7f902'
+down_revision = 'd0f2b4c6e891'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'print_job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('titulo', sa.String(length=120), nullable=False),
+        sa.Column('movement_id', sa.Integer(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('payload', sa.LargeBinary(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('printed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['movement_id'], ['cash_movement.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('print_job', schema=None) as batch_op:
+        batch_op.create_index('ix_print_job_status_next', ['status', 'next_attempt_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_print_job_movement_id'), ['movement_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('print_job', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_print_job_movement_id'))
+        batch_op.drop_index('ix_print_job_status_next')
+
+    op.drop_table('print_job')
@@ -0,0 +1,38 @@
+"""upload_blob: armazenamento de uploads por hash
+
+Revision ID: e5a7c9d1f346
+Revises: d4f6b8c0e235
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7c9d1f346'
+down_revision = 'd4f6b8c0e235'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('upload_blob',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('path', sa.String(length=300), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=True),
+    sa.Column('refcount', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('path')
+    )
+    with op.batch_alter_table('upload_blob', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_upload_blob_sha256'), ['sha256'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('upload_blob', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_upload_blob_sha256'))
+
+    op.drop_table('upload_blob')
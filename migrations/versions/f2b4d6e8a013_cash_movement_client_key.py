@@ -0,0 +1,28 @@
+"""cash_movement: chave de idempotência do PDV offline
+
+Revision ID: f2b4d6e8a013
+Revises: e1a3c5d7f902
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b4d6e8a013'
+down_revision = 'e1a3c5d7f902'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('cash_movement', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('client_key', sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint('uq_cash_movement_client_key', ['client_key'])
+
+
+def downgrade():
+    with op.batch_alter_table('cash_movement', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_cash_movement_client_key', type_='unique')
+        batch_op.drop_column('client_key')
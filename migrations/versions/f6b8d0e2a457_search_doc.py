@@ -0,0 +1,93 @@
+"""search_doc: busca de texto em documentos (FTS5 / tsvector)
+
+Revision ID: f6b8d0e2a457
+Revises: e5a7c9d1f346
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b8d0e2a457'
+down_revision = 'e5a7c9d1f346'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('search_doc',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('ref_id', sa.Integer(), nullable=False),
+    sa.Column('employee_id', sa.Integer(), nullable=True),
+    sa.Column('title', sa.Text(), nullable=True),
+    sa.Column('body', sa.Text(), nullable=True),
+    sa.Column('arquivo_path', sa.String(length=300), nullable=True),
+    sa.Column('pending', sa.Boolean(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('indexed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('kind', 'ref_id', name='uq_search_doc_kind_ref')
+    )
+    with op.batch_alter_table('search_doc', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_search_doc_employee_id'), ['employee_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_search_doc_pending'), ['pending'], unique=False)
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        # índice FTS5 de conteúdo externo, sincronizado por triggers
+        op.execute("""
+            CREATE VIRTUAL TABLE search_doc_fts USING fts5(
+                title, body, content='search_doc', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2')
+        """)
+        op.execute("""
+            CREATE TRIGGER search_doc_ai AFTER INSERT ON search_doc BEGIN
+                INSERT INTO search_doc_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER search_doc_ad AFTER DELETE ON search_doc BEGIN
+                INSERT INTO search_doc_fts(search_doc_fts, rowid, title, body)
+                VALUES ('delete', old.id, old.title, old.body);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER search_doc_au AFTER UPDATE OF title, body ON search_doc BEGIN
+                INSERT INTO search_doc_fts(search_doc_fts, rowid, title, body)
+                VALUES ('delete', old.id, old.title, old.body);
+                INSERT INTO search_doc_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+            END
+        """)
+    elif dialect == 'postgresql':
+        op.execute("""
+            ALTER TABLE search_doc ADD COLUMN tsv tsvector GENERATED ALWAYS AS (
+                setweight(to_tsvector('portuguese', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('portuguese', coalesce(body, '')), 'B')) STORED
+        """)
+        op.execute("CREATE INDEX ix_search_doc_tsv ON search_doc USING gin (tsv)")
+
+    # tudo o que já existe entra na fila do indexador
+    op.execute("INSERT INTO search_doc (kind, ref_id, pending) SELECT 'document', id, true FROM document")
+    op.execute("""
+        INSERT INTO search_doc (kind, ref_id, employee_id, pending)
+        SELECT 'employee_document', id, employee_id, true FROM employee_document
+    """)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for trigger in ('search_doc_ai', 'search_doc_ad', 'search_doc_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS search_doc_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_search_doc_tsv")
+
+    with op.batch_alter_table('search_doc', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_search_doc_pending'))
+        batch_op.drop_index(batch_op.f('ix_search_doc_employee_id'))
+
+    op.drop_table('search_doc')
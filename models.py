@@ -1,9 +1,16 @@
 
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+from sqlalchemy import event, or_, false
 from extensions import db
 from flask_login import UserMixin
 
 class AuditLog(db.Model):
+    __table_args__ = (
+        db.Index("ix_audit_log_created_at", "created_at"),
+        db.Index("ix_audit_log_entity", "entity", "entity_id", "created_at"),
+        db.Index("ix_audit_log_user", "user", "created_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user = db.Column(db.String(120))
     action = db.Column(db.String(50))
@@ -76,17 +83,42 @@ class Employee(db.Model):
     aso_tipo = db.Column(db.String(50))
     aso_validade = db.Column(db.Date)
     cnh = db.Column(db.String(30))
-    cnh_validade = db.Column(db.Date)
+    cnh_validade = db.Column(db.Date, index=True)
     exame_toxico_validade = db.Column(db.Date)
     foto_path = db.Column(db.String(300))
 
     # Novos campos
     filho_menor14 = db.Column(db.Boolean)                # True/False
     escolaridade = db.Column(db.String(40))              # ex.: Médio completo
+    # mês*100 + dia do nascimento (15/03 -> 315), preenchido ao gravar
+    nascimento_mmdd = db.Column(db.SmallInteger, index=True)
 
     company = db.relationship("Company")
     funcao = db.relationship("Funcao")
 
+    @classmethod
+    def aniversario_filter(cls, mes=None, de=None, dias=None):
+        """
+        Predicado SQL de aniversariantes: do mês `mes` ou de `dias` dias a partir
+        de `de` (de `de` a `de + dias - 1`; atravessa a virada do ano).
+        Usa ix_employee_nascimento_mmdd.
+        """
+        col = cls.nascimento_mmdd
+        if mes:
+            return col.between(mes * 100 + 1, mes * 100 + 31)
+        if dias is None:
+            return None
+        de = de or date.today()
+        if dias <= 0:
+            return false()
+        if dias >= 365:
+            return col.isnot(None)
+        ate = de + timedelta(days=dias - 1)
+        ini, fim = de.month * 100 + de.day, ate.month * 100 + ate.day
+        if ini <= fim:
+            return col.between(ini, fim)
+        return or_(col >= ini, col <= fim)
+
     def tempo_de_casa(self):
         if not self.data_admissao:
             return ""
@@ -96,11 +128,21 @@ class Employee(db.Model):
         meses = (dias % 365) // 30
         return f"{anos}a {meses}m" if anos or meses else f"{dias}d"
 
+@event.listens_for(Employee, "before_insert")
+@event.listens_for(Employee, "before_update")
+def _set_nascimento_mmdd(mapper, connection, target):
+    d = target.data_nascimento
+    target.nascimento_mmdd = d.month * 100 + d.day if d else None
+
 class DocumentType(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(120), nullable=False)
 
 class Document(db.Model):
+    __table_args__ = (
+        db.Index("ix_document_company_tipo_venc", "company_id", "tipo_id", "data_vencimento"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     company_id = db.Column(db.Integer, db.ForeignKey("company.id"))
     tipo_id = db.Column(db.Integer, db.ForeignKey("document_type.id"))
@@ -127,6 +169,22 @@ class Document(db.Model):
             return "A vencer"
         return "Vigente"
 
+    @classmethod
+    def status_filter(cls, status, hoje=None):
+        """Predicado SQL equivalente a `status` (vencido, a_vencer, vigente, sem_vencimento)."""
+        hoje = hoje or date.today()
+        em_30 = hoje + timedelta(days=30)
+        col = cls.data_vencimento
+        if status == "vencido":
+            return col < hoje
+        if status == "a_vencer":
+            return col.between(hoje, em_30)
+        if status == "vigente":
+            return col > em_30
+        if status == "sem_vencimento":
+            return col.is_(None)
+        return None
+
 class EmployeeDocument(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey("employee.id"), nullable=False, index=True)
@@ -136,3 +194,68 @@ class EmployeeDocument(db.Model):
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     employee = db.relationship("Employee", backref="documentos")
+
+class OutboxMessage(db.Model):
+    """Fila persistente de notificações (e-mail / WhatsApp) drenada por outbox.drain."""
+    __table_args__ = (
+        db.Index("ix_outbox_message_status_next", "status", "next_attempt_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(20), nullable=False)       # email, whatsapp
+    destino = db.Column(db.String(500), nullable=False)      # e-mails separados por ; ou número
+    subject = db.Column(db.String(200))
+    body = db.Column(db.Text, nullable=False)
+    dedup_key = db.Column(db.String(64), unique=True)
+    status = db.Column(db.String(20), nullable=False, default="pendente")  # pendente, enviando, enviado, falhou
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+class UploadBlob(db.Model):
+    """Arquivo de upload endereçado por conteúdo (ver blobstore.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(300), unique=True, nullable=False)  # relativo a /uploads
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+    size = db.Column(db.BigInteger)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SearchDoc(db.Model):
+    """
+    Texto pesquisável de um Document / EmployeeDocument (metadados + texto do PDF).
+    Mantido por search.py; o índice de texto (FTS5 no SQLite, tsvector no
+    Postgres) é criado pela migração e acompanha esta tabela.
+    """
+    __table_args__ = (
+        db.UniqueConstraint("kind", "ref_id", name="uq_search_doc_kind_ref"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)          # document, employee_document
+    ref_id = db.Column(db.Integer, nullable=False)
+    employee_id = db.Column(db.Integer, index=True)           # só employee_document
+    title = db.Column(db.Text)                                 # metadados concatenados
+    body = db.Column(db.Text)                                  # texto extraído do arquivo
+    arquivo_path = db.Column(db.String(300))                   # arquivo de onde saiu o body
+    pending = db.Column(db.Boolean, nullable=False, default=True, index=True)
+    error = db.Column(db.Text)
+    indexed_at = db.Column(db.DateTime)
+
+class SearchTerm(db.Model):
+    """
+    Índice de busca de cadastros: uma linha por palavra normalizada
+    (sem acento, minúscula; CPF/CNPJ só dígitos) de cada colaborador/empresa.
+    Mantido por search.py; a busca é por prefixo em ix_search_term_lookup.
+    """
+    __table_args__ = (
+        db.Index("ix_search_term_lookup", "entity", "term", "ref_id"),   # cobre a busca por prefixo
+        db.Index("ix_search_term_ref", "entity", "ref_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)   # employee, company
+    ref_id = db.Column(db.Integer, nullable=False)
+    term = db.Column(db.String(60), nullable=False)
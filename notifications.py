@@ -1,29 +1,102 @@
-
 import os, smtplib
 from email.message import EmailMessage
 import requests
+from requests.adapters import HTTPAdapter
 
-def send_email(to_list, subject, body):
+HTTP_TIMEOUT = 15
+
+class ChannelDisabled(Exception):
+    """Canal sem configuração (.env): nada foi enviado."""
+
+class SMTPUnavailable(Exception):
+    """Não conectou ao servidor SMTP; os demais e-mails do lote falhariam igual."""
+
+def _smtp_config():
     host = os.getenv("SMTP_HOST")
-    if not host: return
-    port = int(os.getenv("SMTP_PORT","587"))
     user = os.getenv("SMTP_USER")
-    pwd  = os.getenv("SMTP_PASS")
-    from_addr = os.getenv("SMTP_FROM", user)
+    return {
+        "host": host,
+        "port": int(os.getenv("SMTP_PORT","587")),
+        "user": user,
+        "pwd": os.getenv("SMTP_PASS"),
+        "from_addr": os.getenv("SMTP_FROM", user),
+    }
+
+def _build_email(from_addr, to_list, subject, body):
     msg = EmailMessage()
     msg["Subject"] = subject
     msg["From"] = from_addr
     msg["To"] = ", ".join([t.strip() for t in to_list if t.strip()])
     msg.set_content(body)
-    with smtplib.SMTP(host, port) as s:
-        s.starttls()
-        if user: s.login(user, pwd)
-        s.send_message(msg)
+    return msg
+
+class SMTPSession:
+    """Uma conexão SMTP autenticada reaproveitada para vários e-mails (reconecta se cair)."""
+
+    def __init__(self):
+        self.cfg = _smtp_config()
+        self._smtp = None
+
+    @property
+    def enabled(self):
+        return bool(self.cfg["host"])
+
+    def _connect(self):
+        cfg = self.cfg
+        try:
+            s = smtplib.SMTP(cfg["host"], cfg["port"], timeout=HTTP_TIMEOUT)
+            s.starttls()
+            if cfg["user"]: s.login(cfg["user"], cfg["pwd"])
+        except (OSError, smtplib.SMTPException) as e:
+            raise SMTPUnavailable(f"SMTP {cfg['host']}:{cfg['port']}: {e or e.__class__.__name__}") from e
+        self._smtp = s
+
+    def send(self, to_list, subject, body):
+        if not self.enabled:
+            raise ChannelDisabled("E-mail não configurado (SMTP_HOST).")
+        msg = _build_email(self.cfg["from_addr"], to_list, subject, body)
+        if self._smtp is None:
+            self._connect()
+        try:
+            self._smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self._connect()
+            self._smtp.send_message(msg)
+
+    def close(self):
+        if self._smtp is not None:
+            try: self._smtp.quit()
+            except Exception: pass
+            self._smtp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def send_email(to_list, subject, body):
+    with SMTPSession() as s:
+        s.send(to_list, subject, body)
+
+_http = None
+
+def _http_session():
+    """requests.Session com pool de conexões (keep-alive) compartilhado entre threads."""
+    global _http
+    if _http is None:
+        s = requests.Session()
+        s.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+        _http = s
+    return _http
 
 def send_whatsapp(to_number, body):
-    if os.getenv("WHATSAPP_PROVIDER") != "twilio": return
+    if os.getenv("WHATSAPP_PROVIDER") != "twilio":
+        raise ChannelDisabled("WhatsApp não configurado (WHATSAPP_PROVIDER=twilio).")
     sid = os.getenv("TWILIO_SID"); token = os.getenv("TWILIO_TOKEN"); from_ = os.getenv("TWILIO_FROM")
-    if not sid or not token or not from_: return
+    if not sid or not token or not from_:
+        raise ChannelDisabled("WhatsApp sem credenciais (TWILIO_SID, TWILIO_TOKEN, TWILIO_FROM).")
     url = f"https://api.twilio.com/2010-04-01/Accounts/{sid}/Messages.json"
     data = {"To": f"whatsapp:{to_number}", "From": from_, "Body": body}
-    requests.post(url, data=data, auth=(sid, token))
+    r = _http_session().post(url, data=data, auth=(sid, token), timeout=HTTP_TIMEOUT)
+    r.raise_for_status()
@@ -0,0 +1,157 @@
+import hashlib, os, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from extensions import db
+from models import OutboxMessage
+from notifications import SMTPSession, send_whatsapp, ChannelDisabled, SMTPUnavailable
+
+BACKOFF_BASE = 60            # segundos; dobra a cada tentativa
+BACKOFF_MAX = 6 * 3600
+LEASE = timedelta(minutes=10)  # mensagem "enviando" volta à fila se o worker morrer
+DISABLED_RETRY = timedelta(minutes=30)  # canal sem configuração: espera sem gastar tentativa
+STATUSES = ("enviado", "pendente", "falhou")
+
+last_report = None   # (quando, relatório) do último drain com mensagens, por processo
+
+def dedup_key(*parts):
+    return hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()
+
+def enqueue(channel, destino, body, subject=None, key=None):
+    """
+    Grava a mensagem na outbox, na transação do chamador (sai junto com o commit dele).
+    Duplicada por `key` é ignorada com INSERT ... ON CONFLICT DO NOTHING, sem SAVEPOINT.
+    Retorna o id da mensagem nova ou None se já existia.
+    """
+    values = dict(channel=channel, destino=destino, subject=subject, body=body, dedup_key=key)
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect == "sqlite" else pg_insert
+        stmt = (insert(OutboxMessage).values(**values)
+                .on_conflict_do_nothing(index_elements=["dedup_key"])
+                .returning(OutboxMessage.id))
+        return db.session.execute(stmt).scalar()
+    # outros bancos: checagem prévia; corrida rara vira IntegrityError no commit do chamador
+    if key and db.session.query(OutboxMessage.id).filter_by(dedup_key=key).first():
+        return None
+    msg = OutboxMessage(**values)
+    db.session.add(msg)
+    db.session.flush()
+    return msg.id
+
+def _backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX))
+
+def _claim(limit, now):
+    """Reserva até `limit` mensagens vencidas; UPDATE condicional evita envio duplo entre workers."""
+    due = (OutboxMessage.query
+           .filter(OutboxMessage.status.in_(("pendente", "enviando")),
+                   OutboxMessage.next_attempt_at <= now)
+           .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+           .limit(limit).all())
+    claimed = []
+    for m in due:
+        n = (OutboxMessage.query
+             .filter_by(id=m.id, status=m.status, next_attempt_at=m.next_attempt_at)
+             .update({"status": "enviando", "next_attempt_at": now + LEASE}, synchronize_session=False))
+        if n:
+            claimed.append(m.id)
+    db.session.commit()
+    return OutboxMessage.query.filter(OutboxMessage.id.in_(claimed)).all() if claimed else []
+
+def _mark(m, err, now, max_attempts):
+    if isinstance(err, ChannelDisabled):
+        # nada foi enviado: continua pendente até o canal ser configurado
+        m.status, m.last_error, m.next_attempt_at = "pendente", str(err), now + DISABLED_RETRY
+        return
+    err = None if err is None else (str(err) or err.__class__.__name__)
+    m.attempts = (m.attempts or 0) + 1
+    if err is None:
+        m.status, m.sent_at, m.last_error = "enviado", now, None
+    elif m.attempts >= max_attempts:
+        m.status, m.last_error = "falhou", err
+    else:
+        m.status, m.last_error = "pendente", err
+        m.next_attempt_at = now + _backoff(m.attempts)
+
+def drain(limit=500):
+    """
+    Envia as mensagens pendentes cujo horário de tentativa já chegou.
+    E-mails compartilham uma sessão SMTP; WhatsApp vai num pool de threads limitado.
+    Retorna por canal {"sent": n, "failed": [(destino, erro)], "seconds": s}
+    mais os totais por status: {"email": {...}, "whatsapp": {...}, "enviado": n, "pendente": n, "falhou": n}.
+    """
+    global last_report
+    max_attempts = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+    workers = int(os.getenv("ALERT_WHATSAPP_WORKERS", "8"))
+    now = datetime.utcnow()
+    msgs = _claim(limit, now)
+    results, seconds = {}, {}
+
+    emails = [m for m in msgs if m.channel == "email"]
+    if emails:
+        t0 = time.perf_counter()
+        with SMTPSession() as smtp:
+            for i, m in enumerate(emails):
+                try:
+                    smtp.send(m.destino.split(";"), m.subject or "", m.body)
+                    results[m.id] = None
+                except (ChannelDisabled, SMTPUnavailable) as e:
+                    # sem servidor: o resto do lote falha junto, sem um timeout por mensagem
+                    for rest in emails[i:]:
+                        results[rest.id] = e
+                    break
+                except Exception as e:
+                    results[m.id] = e
+        seconds["email"] = time.perf_counter() - t0
+
+    whats = [m for m in msgs if m.channel == "whatsapp"]
+    if whats:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [(m, pool.submit(send_whatsapp, m.destino, m.body)) for m in whats]
+            for m, fut in futures:
+                try:
+                    fut.result(); results[m.id] = None
+                except Exception as e:
+                    results[m.id] = e
+        seconds["whatsapp"] = time.perf_counter() - t0
+
+    report = {canal: {"sent": 0, "failed": [], "seconds": s} for canal, s in seconds.items()}
+    report.update(dict.fromkeys(STATUSES, 0))
+    now = datetime.utcnow()
+    for m in msgs:
+        err = results.get(m.id, ValueError("canal desconhecido"))
+        _mark(m, err, now, max_attempts)
+        report[m.status] += 1
+        canal = report.setdefault(m.channel, {"sent": 0, "failed": [], "seconds": 0.0})
+        if err is None:
+            canal["sent"] += 1
+        else:
+            canal["failed"].append((m.destino, m.last_error))
+    db.session.commit()
+    if msgs:
+        last_report = (datetime.now(), report)
+    return report
+
+def format_report(report):
+    """'email: 3 enviados em 1.2s (1 falhas) | whatsapp: ...' — para log e para a tela da fila."""
+    partes = []
+    for canal, r in report.items():
+        if canal in STATUSES: continue
+        falhas = f" ({len(r['failed'])} falhas)" if r["failed"] else ""
+        partes.append(f"{canal}: {r['sent']} enviados em {r['seconds']:.1f}s{falhas}")
+    return " | ".join(partes)
+
+def retry(msg_id):
+    """Recoloca uma mensagem na fila para envio imediato."""
+    m = OutboxMessage.query.get(msg_id)
+    if m and m.status != "enviado":
+        m.status, m.next_attempt_at = "pendente", datetime.utcnow()
+        db.session.commit()
+    return m
+
+def stats():
+    rows = db.session.query(OutboxMessage.status, db.func.count(OutboxMessage.id)).group_by(OutboxMessage.status).all()
+    return dict(rows)
@@ -0,0 +1,117 @@
+import base64, json
+from datetime import date, datetime
+from flask import request, url_for
+from sqlalchemy import and_, or_
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+def _encode_value(v):
+    if isinstance(v, (date, datetime)):
+        return v.isoformat()
+    return v
+
+def _decode_value(col, v):
+    if v is None:
+        return None
+    try:
+        py = col.type.python_type
+    except NotImplementedError:
+        return v
+    if py is datetime:
+        return datetime.fromisoformat(v)
+    if py is date:
+        return date.fromisoformat(v)
+    return py(v)
+
+def encode_cursor(sort_value, row_id):
+    raw = json.dumps([_encode_value(sort_value), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor, sort_col):
+    """Devolve (valor, id) do cursor ou None se inválido."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, row_id = json.loads(raw)
+        return _decode_value(sort_col, value), int(row_id)
+    except Exception:
+        return None
+
+def _after(sort_col, id_col, value, row_id, nullable):
+    """Linhas posteriores a (value, row_id) na ordem crescente (NULLs por último)."""
+    if value is None:
+        return and_(sort_col.is_(None), id_col > row_id)
+    cond = or_(sort_col > value, and_(sort_col == value, id_col > row_id))
+    return or_(sort_col.is_(None), cond) if nullable else cond
+
+def _before(sort_col, id_col, value, row_id, nullable):
+    """Linhas anteriores a (value, row_id) na ordem crescente (NULLs por último)."""
+    if value is None:
+        return or_(sort_col.isnot(None), id_col < row_id)
+    cond = or_(sort_col < value, and_(sort_col == value, id_col < row_id))
+    return and_(sort_col.isnot(None), cond) if nullable else cond
+
+def _order(sort_col, id_col, ascending, nullable):
+    cols = [sort_col, id_col]
+    if nullable:
+        cols.insert(0, sort_col.is_(None))
+    return [c.asc() if ascending else c.desc() for c in cols]
+
+class KeysetPage:
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+def keyset_paginate(query, sort_col, id_col, args, descending=False, nullable=False):
+    """
+    Paginação por cursor (keyset) sobre (sort_col, id_col).
+    Lê `after`, `before` e `per_page` de `args` (request.args) e devolve um KeysetPage.
+    Com `nullable=True` os NULLs de sort_col vão sempre para o fim da listagem.
+    """
+    per_page = args.get("per_page", DEFAULT_PER_PAGE, type=int) or DEFAULT_PER_PAGE
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    after = decode_cursor(args.get("after"), sort_col)
+    before = decode_cursor(args.get("before"), sort_col) if not after else None
+
+    # "forward" = percorre na ordem crescente das chaves
+    backwards = before is not None
+    forward = descending == backwards
+    if after or before:
+        value, row_id = after or before
+        pred = _after if forward else _before
+        query = query.filter(pred(sort_col, id_col, value, row_id, nullable))
+    query = query.order_by(None).order_by(*_order(sort_col, id_col, forward, nullable))
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    key = lambda r: encode_cursor(getattr(r, sort_col.key), getattr(r, id_col.key))
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = key(rows[-1])
+        if (has_more and backwards) or after:
+            prev_cursor = key(rows[0])
+    return KeysetPage(rows, per_page, next_cursor, prev_cursor)
+
+def page_url(**cursor):
+    """URL da página atual preservando os filtros e trocando só o cursor (after/before)."""
+    args = request.args.to_dict()
+    args.pop("after", None); args.pop("before", None)
+    args.update({k: v for k, v in cursor.items() if v})
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
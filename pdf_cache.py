@@ -0,0 +1,80 @@
+import glob, hashlib, json, os, tempfile
+from datetime import date
+from sqlalchemy import inspect as sa_inspect
+from flask import current_app
+from pdf_reports import TEMPLATE_VERSION, _abs_upload_path
+
+# Cache em disco das fichas em PDF (colaborador / empresa).
+# Nome do arquivo: <tipo>_<id>_<hash>.pdf, onde o hash cobre a linha do banco,
+# os nomes relacionados exibidos, a foto (mtime/tamanho), a versão do layout
+# e o dia (a ficha imprime "Gerado em"). Qualquer mudança gera outro arquivo;
+# os antigos saem por invalidate() ou pela evicção LRU por tamanho.
+
+def _cache_dir():
+    d = os.path.join(current_app.root_path, os.getenv("PDF_CACHE_DIR", os.path.join("cache", "pdf")))
+    os.makedirs(d, exist_ok=True)
+    return d
+
+def _row(obj):
+    return {a.key: getattr(obj, a.key) for a in sa_inspect(obj).mapper.column_attrs}
+
+def _photo_sig(obj):
+    path = _abs_upload_path(current_app, getattr(obj, "foto_path", None))
+    if path and os.path.exists(path):
+        st = os.stat(path)
+        return [st.st_mtime_ns, st.st_size]
+    return None
+
+def cache_key(kind, obj):
+    extra = {}
+    for rel in ("company", "funcao"):
+        target = getattr(obj, rel, None) if rel in sa_inspect(obj).mapper.relationships else None
+        if target is not None:
+            extra[rel] = _row(target)
+    payload = [kind, TEMPLATE_VERSION, date.today().isoformat(), _row(obj), extra, _photo_sig(obj)]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+def get_or_render(kind, obj, render):
+    """
+    Devolve (caminho, etag) do PDF de `obj`, chamando render(buffer) só em cache miss.
+    Em hit o arquivo tem o mtime renovado (base da evicção LRU).
+    """
+    key = cache_key(kind, obj)
+    path = os.path.join(_cache_dir(), f"{kind}_{obj.id}_{key}.pdf")
+    if os.path.exists(path):
+        os.utime(path)
+        return path, key
+    invalidate(kind, obj.id)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            render(fh)
+        os.replace(tmp, path)
+    except Exception:
+        os.unlink(tmp)
+        raise
+    _evict()
+    return path, key
+
+def invalidate(kind, obj_id):
+    """Remove as versões em cache de uma entidade (chamado ao editar/excluir)."""
+    for p in glob.glob(os.path.join(_cache_dir(), f"{kind}_{obj_id}_*.pdf")):
+        try: os.unlink(p)
+        except OSError: pass
+
+def _evict():
+    max_bytes = int(os.getenv("PDF_CACHE_MAX_MB", "200")) * 1024 * 1024
+    files = []
+    for p in glob.glob(os.path.join(_cache_dir(), "*.pdf")):
+        try:
+            st = os.stat(p)
+        except OSError:
+            continue
+        files.append((st.st_mtime, st.st_size, p))
+    total = sum(f[1] for f in files)
+    for _, size, p in sorted(files):
+        if total <= max_bytes: break
+        try:
+            os.unlink(p); total -= size
+        except OSError:
+            pass
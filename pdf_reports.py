@@ -1,10 +1,14 @@
 from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
 from reportlab.lib import colors
 from datetime import date as _date, date
 import os
+from images import derivative
+
+# Incrementar ao mudar o layout das fichas (invalida o cache em pdf_cache.py)
+TEMPLATE_VERSION = "2"
 
 styles = getSampleStyleSheet()
 H1 = ParagraphStyle('H1', parent=styles['Heading1'], fontSize=16, spaceAfter=8)
@@ -26,18 +30,37 @@ def _abs_upload_path(app, rel):
     return os.path.join(app.root_path, app.config.get('UPLOAD_FOLDER', 'uploads'), rel)
 
 # -------------------- COLABORADOR (com foto 3x4) --------------------
-def employee_pdf(buffer, app, e):
-    doc = SimpleDocTemplate(
+def _employee_doc(buffer):
+    return SimpleDocTemplate(
         buffer, pagesize=A4,
         leftMargin=2*cm, rightMargin=2*cm, topMargin=1.5*cm, bottomMargin=1.5*cm
     )
+
+def employee_pdf(buffer, app, e):
+    _employee_doc(buffer).build(_employee_elems(app, e))
+
+def employees_pdf(buffer, app, employees):
+    """Várias fichas num único PDF (uma por página), geradas sob demanda."""
+    def flowables():
+        for i, e in enumerate(employees):
+            if i:
+                yield PageBreak()
+            yield from _employee_elems(app, e)
+    _employee_doc(buffer).build(_StreamedFlowables([], flowables()))
+
+def _employee_elems(app, e):
     elems=[]
     title = Paragraph(f"Ficha do Colaborador - #{e.id}", H1)
 
     photo_flow = None
     if getattr(e, 'foto_path', None):
         try:
-            photo_abs = _abs_upload_path(app, e.foto_path)
+            # versão 3x4 pré-dimensionada (300 DPI); cai no original se não der
+            try:
+                photo_abs = derivative(app, e.foto_path, "pdf")
+            except Exception:
+                photo_abs = None
+            photo_abs = photo_abs or _abs_upload_path(app, e.foto_path)
             if photo_abs and os.path.exists(photo_abs):
                 photo_flow = Image(photo_abs, width=3.0*cm, height=4.0*cm)  # 3x4 cm
         except Exception:
@@ -73,7 +96,7 @@ def employee_pdf(buffer, app, e):
         ('VALIGN',(0,0),(-1,-1),'TOP')
     ]))
     elems.extend([table, Spacer(1,0.5*cm), Paragraph(f"Gerado em {_date.today().strftime('%d/%m/%Y')}", N)])
-    doc.build(elems)
+    return elems
 
 # -------------------- EMPRESA --------------------
 def company_pdf(buffer, app, c):
@@ -103,47 +126,96 @@ def company_pdf(buffer, app, c):
     elems.extend([table, Spacer(1,0.5*cm), Paragraph(f"Gerado em {_date.today().strftime('%d/%m/%Y')}", N)])
     doc.build(elems)
 
+# -------------------- LISTAS LONGAS (streaming) --------------------
+ROWS_PER_CHUNK = 40  # ~1 página A4 por tabela
+
+class _StreamedFlowables(list):
+    """
+    Lista de flowables que se reabastece de um gerador à medida que o
+    doc.build() consome o início dela. Assim só alguns blocos da tabela
+    existem em memória por vez, independente do número de linhas.
+    """
+    def __init__(self, head, gen):
+        super().__init__(head)
+        self._gen = gen
+
+    def _fill(self):
+        while self._gen is not None and list.__len__(self) < 2:
+            nxt = next(self._gen, None)
+            if nxt is None:
+                self._gen = None
+            else:
+                self.append(nxt)
+
+    def __len__(self):
+        self._fill()
+        return list.__len__(self)
+
+    def __getitem__(self, i):
+        self._fill()
+        return list.__getitem__(self, i)
+
+def _chunked_tables(header, rows, col_widths, style):
+    """Agrupa `rows` (iterável) em tabelas de ROWS_PER_CHUNK linhas, cada uma com cabeçalho."""
+    chunk = []
+    for r in rows:
+        chunk.append(r)
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield _table(header, chunk, col_widths, style)
+            chunk = []
+    if chunk:
+        yield _table(header, chunk, col_widths, style)
+
+def _table(header, chunk, col_widths, style):
+    t = Table([header] + chunk, colWidths=col_widths, repeatRows=1, hAlign='LEFT')
+    t.setStyle(style)
+    return t
+
+def _status(dv, today):
+    """(dias, status) no mesmo critério de Document.status."""
+    if not dv:
+        return "", ""
+    dias = (dv - today).days
+    if dv < today:
+        return dias, "Vencido"
+    if dias <= 30:
+        return dias, "A vencer"
+    return dias, "Vigente"
+
+LIST_STYLE = TableStyle([
+    ('GRID',(0,0),(-1,-1),0.25,colors.grey),
+    ('BACKGROUND',(0,0),(-1,0),colors.whitesmoke),
+    ('FONTSIZE',(0,0),(-1,-1),9),
+    ('VALIGN',(0,0),(-1,-1),'TOP')
+])
+
 # -------------------- LISTA DE DOCUMENTOS --------------------
 def documents_pdf(buffer, app, docs, titulo="Documentos"):
+    """`docs` pode ser qualquer iterável (ex.: query.yield_per) — é consumido sob demanda."""
     doc = SimpleDocTemplate(
         buffer, pagesize=A4,
         leftMargin=1.2*cm, rightMargin=1.2*cm, topMargin=1.2*cm, bottomMargin=1.2*cm
     )
-    elems=[Paragraph(titulo, H1)]
-    data=[["Empresa","Tipo","Descrição","Número","Expedição","Vencimento","Dias","Status"]]
+    header = ["Empresa","Tipo","Descrição","Número","Expedição","Vencimento","Dias","Status"]
     today = date.today()
-    for d in docs:
-        dias = ""
-        status = ""
-        if d.data_vencimento:
-            dv = d.data_vencimento
-            dias = (dv - today).days
-            if dv < today:
-                status = "Vencido"
-            elif dias <= 30:
-                status = "A vencer"
-            else:
-                status = "Vigente"
-        data.append([
-            P(d.company.razao_social if getattr(d,'company',None) else ""),
-            P(d.tipo.nome if getattr(d,'tipo',None) else ""),
-            P(getattr(d,'descricao',"")),
-            P(getattr(d,'numero',"")),
-            P(getattr(d,'data_expedicao',"")),
-            P(getattr(d,'data_vencimento',"")),
-            P(dias),
-            P(status or getattr(d,'status','')),
-        ])
+
+    def rows():
+        for d in docs:
+            dias, status = _status(d.data_vencimento, today)
+            yield [
+                P(d.company.razao_social if getattr(d,'company',None) else ""),
+                P(d.tipo.nome if getattr(d,'tipo',None) else ""),
+                P(getattr(d,'descricao',"")),
+                P(getattr(d,'numero',"")),
+                _s(getattr(d,'data_expedicao',"")),
+                _s(getattr(d,'data_vencimento',"")),
+                _s(dias),
+                status or _s(getattr(d,'status','')),
+            ]
+
     col_widths = [4.0*cm, 2.0*cm, 5.0*cm, 1.6*cm, 1.8*cm, 1.9*cm, 0.9*cm, 1.4*cm]
-    table = Table(data, colWidths=col_widths, repeatRows=1, hAlign='LEFT')
-    table.setStyle(TableStyle([
-        ('GRID',(0,0),(-1,-1),0.25,colors.grey),
-        ('BACKGROUND',(0,0),(-1,0),colors.whitesmoke),
-        ('FONTSIZE',(0,0),(-1,-1),9),
-        ('VALIGN',(0,0),(-1,-1),'TOP')
-    ]))
-    elems.append(table)
-    doc.build(elems)
+    tables = _chunked_tables(header, rows(), col_widths, LIST_STYLE)
+    doc.build(_StreamedFlowables([Paragraph(titulo, H1)], tables))
 
 # -------------------- LISTA DE TOXICOLÓGICOS --------------------
 def toxicos_pdf(buffer, app, items, titulo="Exame Toxicológico"):
@@ -151,34 +223,24 @@ def toxicos_pdf(buffer, app, items, titulo="Exame Toxicológico"):
         buffer, pagesize=A4,
         leftMargin=1.6*cm, rightMargin=1.6*cm, topMargin=1.2*cm, bottomMargin=1.2*cm
     )
-    elems=[Paragraph(titulo, H1)]
-    data=[["Colaborador","Empresa","Validade","Dias","Status"]]
+    header = ["Colaborador","Empresa","Validade","Dias","Status"]
     today = date.today()
-    for e in items:
-        dias = ""
-        status = ""
-        val = getattr(e,'exame_toxico_validade',None)
-        if val:
-            dias = (val - today).days
-            if val < today:
-                status = "Vencido"
-            elif dias <= 30:
-                status = "A vencer"
-            else:
-                status = "Vigente"
-        data.append([
-            P(e.nome),
-            P(e.company.razao_social if getattr(e,'company',None) else ""),
-            P(val),
-            P(dias),
-            P(status),
-        ])
-    table = Table(data, colWidths=[5.0*cm,6.0*cm,2.5*cm,1.5*cm,2.0*cm], repeatRows=1, hAlign='LEFT')
-    table.setStyle(TableStyle([
-        ('GRID',(0,0),(-1,-1),0.25,colors.grey),
-        ('BACKGROUND',(0,0),(-1,0),colors.whitesmoke),
-        ('FONTSIZE',(0,0),(-1,-1),9),
-        ('VALIGN',(0,0),(-1,-1),'TOP')
-    ]))
-    elems.extend([table, Spacer(1,0.4*cm), Paragraph(f"Gerado em {_date.today().strftime('%d/%m/%Y')}", N)])
-    doc.build(elems)
+
+    def rows():
+        for e in items:
+            val = getattr(e,'exame_toxico_validade',None)
+            dias, status = _status(val, today)
+            yield [
+                P(e.nome),
+                P(e.company.razao_social if getattr(e,'company',None) else ""),
+                _s(val),
+                _s(dias),
+                status,
+            ]
+
+    def flowables():
+        yield from _chunked_tables(header, rows(), [5.0*cm,6.0*cm,2.5*cm,1.5*cm,2.0*cm], LIST_STYLE)
+        yield Spacer(1,0.4*cm)
+        yield Paragraph(f"Gerado em {_date.today().strftime('%d/%m/%Y')}", N)
+
+    doc.build(_StreamedFlowables([Paragraph(titulo, H1)], flowables()))
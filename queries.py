@@ -0,0 +1,15 @@
+from sqlalchemy.orm import joinedload
+from models import Document, Employee
+
+# Consultas compartilhadas que já trazem os relacionamentos usados nas
+# listagens, PDFs e alertas no mesmo SELECT (evita uma consulta por linha).
+
+def documents_query(query=None):
+    """Documentos com `company` e `tipo` carregados via JOIN."""
+    query = Document.query if query is None else query
+    return query.options(joinedload(Document.company), joinedload(Document.tipo))
+
+def employees_query(query=None):
+    """Colaboradores com `company` e `funcao` carregados via JOIN."""
+    query = Employee.query if query is None else query
+    return query.options(joinedload(Employee.company), joinedload(Employee.funcao))
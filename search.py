@@ -0,0 +1,354 @@
+import os, re, unicodedata
+from datetime import datetime
+from markupsafe import Markup, escape
+from sqlalchemy import event, text, or_, and_, select, inspect as sa_inspect
+from sqlalchemy.orm import Session
+from extensions import db
+from models import SearchDoc, SearchTerm, Document, DocumentType, EmployeeDocument, Employee, Company, Funcao
+from blobstore import norm, upload_root
+
+# Busca de texto em Document e EmployeeDocument.
+# Gravar um desses registros marca a linha correspondente de search_doc como
+# pendente (na mesma transação), assim como renomear a empresa, o tipo ou o
+# colaborador que aparecem no título; index_pending(), chamado pelo agendador,
+# extrai o texto do PDF e preenche title/body. O índice em si é do banco:
+# FTS5 (SQLite) ou coluna tsvector com GIN (Postgres), ambos criados pela
+# migração. Sem esse índice a busca cai para ILIKE.
+# Fotos/escaneados sem camada de texto ficam só com os metadados (sem OCR).
+
+KINDS = {Document: "document", EmployeeDocument: "employee_document"}
+MAX_CHARS = int(os.getenv("SEARCH_MAX_CHARS", "200000"))
+
+# marcadores dos trechos destacados (trocados por <mark> depois do escape)
+_HL_START, _HL_END = "⟦", "⟧"
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # sem pypdf: indexa só os metadados
+    PdfReader = None
+
+# ---------------------- fila (listener) ----------------------
+
+@event.listens_for(Session, "after_flush")
+def _mark_pending(session, flush_context):
+    table = SearchDoc.__table__
+    changed, deleted = [], []
+    for obj in (*session.new, *session.dirty):
+        kind = KINDS.get(type(obj))
+        if kind and obj.id is not None and obj not in session.deleted:
+            changed.append((kind, obj.id, getattr(obj, "employee_id", None)))
+    for obj in session.deleted:
+        kind = KINDS.get(type(obj))
+        if kind: deleted.append((kind, obj.id))
+    # nomes que entram em _title(): renomear reindexa os documentos que os citam
+    renamed = {Company: set(), DocumentType: set(), Employee: set()}
+    for obj in session.dirty:
+        if isinstance(obj, Company) and _changed(obj, "razao_social", "nome_fantasia"):
+            renamed[Company].add(obj.id)
+        elif isinstance(obj, (DocumentType, Employee)) and _changed(obj, "nome"):
+            renamed[type(obj)].add(obj.id)
+    if not (changed or deleted or any(renamed.values())): return
+
+    conn = session.connection()
+    refs = [("document", select(Document.id).where(Document.company_id.in_(renamed[Company]))),
+            ("document", select(Document.id).where(Document.tipo_id.in_(renamed[DocumentType]))),
+            ("employee_document", select(EmployeeDocument.id)
+                                  .where(EmployeeDocument.employee_id.in_(renamed[Employee])))]
+    for (kind, ref_ids), ids in zip(refs, renamed.values()):
+        if ids:
+            conn.execute(table.update().where(table.c.kind == kind, table.c.ref_id.in_(ref_ids))
+                         .values(pending=True))
+    for kind, ref_id, employee_id in changed:
+        res = conn.execute(table.update()
+                           .where(table.c.kind == kind, table.c.ref_id == ref_id)
+                           .values(pending=True, employee_id=employee_id))
+        if res.rowcount == 0:
+            conn.execute(table.insert().values(kind=kind, ref_id=ref_id,
+                                               employee_id=employee_id, pending=True))
+    for kind, ref_id in deleted:
+        conn.execute(table.delete().where(table.c.kind == kind, table.c.ref_id == ref_id))
+
+# ---------------------- indexador ----------------------
+
+def _title(kind, obj):
+    if kind == "document":
+        parts = [obj.tipo.nome if obj.tipo else None, obj.descricao, obj.numero, obj.orgao_emissor,
+                 obj.responsavel, obj.company.razao_social if obj.company else None]
+    else:
+        parts = [obj.tipo, obj.descricao, obj.employee.nome if obj.employee else None]
+    return " | ".join(p for p in parts if p)
+
+def extract_text(path):
+    """Texto de um PDF (até SEARCH_MAX_CHARS caracteres). Outros formatos: ''."""
+    if PdfReader is None or not path.lower().endswith(".pdf"):
+        return ""
+    out, size = [], 0
+    for page in PdfReader(path).pages:
+        t = page.extract_text() or ""
+        out.append(t); size += len(t)
+        if size >= MAX_CHARS: break
+    return re.sub(r"\s+", " ", " ".join(out)).strip()[:MAX_CHARS]
+
+def _body_for(rel):
+    """Texto do arquivo; reaproveita o de outro registro com o mesmo arquivo (uploads por hash)."""
+    rel = norm(rel)
+    if not rel:
+        return "", None
+    done = (SearchDoc.query.filter(SearchDoc.arquivo_path == rel, SearchDoc.pending == False,
+                                   SearchDoc.error.is_(None))
+            .with_entities(SearchDoc.body).first())
+    if done:
+        return done.body or "", None
+    path = os.path.join(upload_root(), rel)
+    if not os.path.isfile(path):
+        return "", "arquivo não encontrado"
+    try:
+        return extract_text(path), None
+    except Exception as e:
+        return "", f"falha ao extrair texto: {e}"
+
+def index_pending(limit=200):
+    """Processa até `limit` itens pendentes. Retorna quantos foram indexados."""
+    rows = (SearchDoc.query.filter_by(pending=True)
+            .order_by(SearchDoc.id).limit(limit).all())
+    models = {v: k for k, v in KINDS.items()}
+    for row in rows:
+        obj = db.session.get(models[row.kind], row.ref_id)
+        if obj is None:
+            db.session.delete(row)
+            continue
+        rel = obj.arquivo_path
+        if norm(rel) != row.arquivo_path or row.body is None or row.error:
+            row.body, row.error = _body_for(rel)
+            row.arquivo_path = norm(rel) or None
+        row.title = _title(row.kind, obj)
+        row.pending = False
+        row.indexed_at = datetime.utcnow()
+    db.session.commit()
+    return len(rows)
+
+# ---------------------- consulta ----------------------
+
+_fts_cache = {}
+
+def _backend():
+    """'fts5', 'tsvector' ou 'like', conforme o banco e a migração aplicada."""
+    engine = db.engine
+    if engine.url not in _fts_cache:
+        name = engine.dialect.name
+        backend = "like"
+        with engine.connect() as conn:
+            if name == "sqlite":
+                if conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'search_doc_fts'")).first():
+                    backend = "fts5"
+            elif name == "postgresql":
+                if conn.execute(text("SELECT 1 FROM information_schema.columns "
+                                     "WHERE table_name = 'search_doc' AND column_name = 'tsv'")).first():
+                    backend = "tsvector"
+        _fts_cache[engine.url] = backend
+    return _fts_cache[engine.url]
+
+def _fts5_query(q):
+    # cada termo digitado vira uma frase com prefixo: "123 456 2024"* acha 123.456/2024
+    terms = []
+    for term in q.split():
+        tokens = re.findall(r"\w+", term)
+        if tokens:
+            terms.append('"' + " ".join(tokens) + '"*')
+    return " ".join(terms)
+
+def _highlight(snippet):
+    s = str(escape(snippet or ""))
+    return Markup(s.replace(_HL_START, "<mark>").replace(_HL_END, "</mark>"))
+
+class Hit:
+    def __init__(self, row, rank, snippet):
+        self.kind, self.ref_id, self.employee_id = row.kind, row.ref_id, row.employee_id
+        self.title, self.arquivo_path = row.title, row.arquivo_path
+        self.rank = rank
+        self.snippet = _highlight(snippet)
+
+def search(q, kind=None, employee_id=None, limit=50):
+    """
+    Busca ordenada por relevância (título pesa mais que o texto do arquivo).
+    Retorna lista de Hit com trecho destacado.
+    """
+    q = (q or "").strip()
+    if not q:
+        return []
+    backend = _backend()
+    filters, params = [], {"limit": limit}
+    if kind:
+        filters.append("d.kind = :kind"); params["kind"] = kind
+    if employee_id is not None:
+        filters.append("d.employee_id = :employee_id"); params["employee_id"] = employee_id
+    where = "".join(f" AND {f}" for f in filters)
+
+    if backend == "fts5":
+        params["q"] = _fts5_query(q)
+        if not params["q"]:
+            return []
+        sql = text(f"""
+            SELECT d.id, bm25(search_doc_fts, 5.0, 1.0) AS rank,
+                   snippet(search_doc_fts, -1, '{_HL_START}', '{_HL_END}', '…', 16) AS snip
+            FROM search_doc_fts JOIN search_doc d ON d.id = search_doc_fts.rowid
+            WHERE search_doc_fts MATCH :q{where}
+            ORDER BY rank LIMIT :limit
+        """)
+    elif backend == "tsvector":
+        params["q"] = q
+        sql = text(f"""
+            SELECT d.id, ts_rank(d.tsv, query) AS rank,
+                   ts_headline('portuguese', coalesce(d.title, '') || ' ' || coalesce(d.body, ''), query,
+                               'StartSel={_HL_START}, StopSel={_HL_END}, MaxWords=30, MinWords=10') AS snip
+            FROM search_doc d, websearch_to_tsquery('portuguese', :q) query
+            WHERE d.tsv @@ query{where}
+            ORDER BY rank DESC LIMIT :limit
+        """)
+    else:
+        like = f"%{q}%"
+        query = SearchDoc.query.filter(or_(SearchDoc.title.ilike(like), SearchDoc.body.ilike(like)))
+        if kind: query = query.filter(SearchDoc.kind == kind)
+        if employee_id is not None: query = query.filter(SearchDoc.employee_id == employee_id)
+        return [Hit(r, 0.0, r.title) for r in query.order_by(SearchDoc.id.desc()).limit(limit)]
+
+    found = db.session.execute(sql, params).all()
+    rows = {r.id: r for r in SearchDoc.query.filter(SearchDoc.id.in_([f.id for f in found]))}
+    return [Hit(rows[f.id], f.rank, f.snip) for f in found if f.id in rows]
+
+def matching_ids(q, kind, employee_id=None, limit=1000):
+    """ids (ref_id) dos registros de `kind` que batem com `q` no título ou no texto."""
+    return [h.ref_id for h in search(q, kind=kind, employee_id=employee_id, limit=limit)]
+
+
+# ---------------------- busca de cadastros (colaboradores / empresas) ----------------------
+# search_term guarda cada palavra normalizada (sem acento, minúscula) do nome,
+# empresa e função do colaborador, e da razão social / fantasia da empresa;
+# CPF e CNPJ entram só com dígitos. A busca casa cada palavra digitada como
+# prefixo de algum termo (faixa term >= p AND term < próximo(p), que usa o
+# índice (entity, term, ref_id) em qualquer banco, sem ler a tabela). Atualizado no mesmo flush que
+# grava o cadastro; renomear empresa/função reindexa os colaboradores dela.
+
+_ALNUM = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+def words(s):
+    """'João da Silva-Jr.' -> ['joao', 'da', 'silva', 'jr']"""
+    s = unicodedata.normalize("NFKD", str(s or "")).encode("ascii", "ignore").decode().lower()
+    return re.findall(r"[a-z0-9]+", s)
+
+def digits(s):
+    return re.sub(r"\D", "", str(s or ""))
+
+def _terms(texts, doc=None):
+    terms = set(words(" ".join(str(t or "") for t in texts)))
+    if digits(doc): terms.add(digits(doc))
+    return {t[:60] for t in terms}
+
+def _changed(obj, *attrs):
+    state = sa_inspect(obj)
+    return any(state.attrs[a].history.has_changes() for a in attrs)
+
+def _replace_terms(conn, entity, rows):
+    """rows: {ref_id: termos}. Troca os termos desses registros."""
+    table = SearchTerm.__table__
+    ids = list(rows)
+    for i in range(0, len(ids), 500):
+        conn.execute(table.delete().where(table.c.entity == entity, table.c.ref_id.in_(ids[i:i + 500])))
+    values = [{"entity": entity, "ref_id": ref_id, "term": t} for ref_id, terms in rows.items() for t in terms]
+    if values:
+        conn.execute(table.insert(), values)
+
+@event.listens_for(Session, "after_flush")
+def _refresh_terms(session, flush_context):
+    emp_ids, comp_ids, cascade_comp, cascade_func = set(), set(), set(), set()
+    removed = {"employee": set(), "company": set()}
+    for obj in (*session.new, *session.dirty):
+        if obj in session.deleted: continue
+        if isinstance(obj, Employee):
+            emp_ids.add(obj.id)
+        elif isinstance(obj, Company):
+            comp_ids.add(obj.id)
+            if obj not in session.new and _changed(obj, "razao_social", "nome_fantasia"):
+                cascade_comp.add(obj.id)
+        elif isinstance(obj, Funcao) and obj not in session.new and _changed(obj, "nome"):
+            cascade_func.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, Employee): removed["employee"].add(obj.id)
+        elif isinstance(obj, Company): removed["company"].add(obj.id)
+    if not (emp_ids or comp_ids or cascade_func or removed["employee"] or removed["company"]):
+        return
+
+    conn = session.connection()
+    table = SearchTerm.__table__
+    for entity, ids in removed.items():
+        if ids:
+            conn.execute(table.delete().where(table.c.entity == entity, table.c.ref_id.in_(ids)))
+
+    if cascade_comp or cascade_func:
+        emp_ids.update(conn.execute(select(Employee.id).where(
+            or_(Employee.company_id.in_(cascade_comp), Employee.funcao_id.in_(cascade_func)))).scalars())
+    if emp_ids: _index_employees(conn, Employee.id.in_(emp_ids))
+    if comp_ids: _index_companies(conn, Company.id.in_(comp_ids))
+
+def _index_employees(conn, where):
+    rows = conn.execute(
+        select(Employee.id, Employee.nome, Employee.cpf, Company.razao_social,
+               Company.nome_fantasia, Funcao.nome)
+        .select_from(Employee)
+        .outerjoin(Company, Company.id == Employee.company_id)
+        .outerjoin(Funcao, Funcao.id == Employee.funcao_id)
+        .where(where)
+    )
+    _replace_terms(conn, "employee", {r[0]: _terms(r[1:], doc=r[2]) for r in rows})
+
+def _index_companies(conn, where):
+    rows = conn.execute(select(Company.id, Company.razao_social, Company.nome_fantasia, Company.cnpj)
+                        .where(where))
+    _replace_terms(conn, "company", {r[0]: _terms(r[1:], doc=r[3]) for r in rows})
+
+def reindex_terms(chunk=1000):
+    """Refaz search_term de todos os cadastros (em blocos de `chunk` ids)."""
+    conn = db.session.connection()
+    for model, index in ((Employee, _index_employees), (Company, _index_companies)):
+        last = 0
+        while True:
+            ids = conn.execute(select(model.id).where(model.id > last)
+                               .order_by(model.id).limit(chunk)).scalars().all()
+            if not ids: break
+            index(conn, model.id.in_(ids))
+            last = ids[-1]
+    db.session.commit()
+
+def _upper_bound(prefix):
+    """Menor string (em [0-9a-z]) maior que todas as que começam com `prefix`; None se não houver."""
+    p = prefix
+    while p:
+        i = _ALNUM.find(p[-1])
+        if 0 <= i < len(_ALNUM) - 1:
+            return p[:-1] + _ALNUM[i + 1]
+        p = p[:-1]
+    return None
+
+def query_terms(q):
+    """Palavras da busca já normalizadas; '123.456.789-00' vira '12345678900'."""
+    out = []
+    for w in (q or "").split():
+        if re.fullmatch(r"[\d.\-/]+", w):
+            if digits(w): out.append(digits(w))
+        else:
+            out.extend(words(w))
+    return out
+
+def name_filter(entity, id_col, q):
+    """
+    Condição SQL: `id_col` tem, para cada palavra de `q`, um termo que começa com ela.
+    None se `q` não tiver nenhuma palavra pesquisável.
+    """
+    conds = []
+    for t in query_terms(q):
+        t = t[:60]
+        rng = SearchTerm.term >= t
+        upper = _upper_bound(t)
+        if upper: rng = and_(rng, SearchTerm.term < upper)
+        conds.append(id_col.in_(select(SearchTerm.ref_id).where(SearchTerm.entity == entity, rng)))
+    return and_(*conds) if conds else None
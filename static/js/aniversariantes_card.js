@@ -0,0 +1,25 @@
+// Card "Aniversariantes da semana" no painel, preenchido por /api/aniversariantes.
+document.addEventListener('DOMContentLoaded', async () => {
+  const list = document.getElementById('aniversariantes-list');
+  if (!list) return;
+  try {
+    const resp = await fetch('/api/aniversariantes?dias=7', {credentials: 'same-origin'});
+    if (!resp.ok) throw new Error(`HTTP ${resp.status}`);
+    const items = await resp.json();
+    list.innerHTML = '';
+    if (!items.length) {
+      list.innerHTML = '<li class="list-group-item text-muted">Nenhum nos próximos 7 dias.</li>';
+      return;
+    }
+    for (const a of items) {
+      const li = document.createElement('li');
+      li.className = 'list-group-item d-flex justify-content-between';
+      const dia = `${String(a.dia).padStart(2, '0')}/${String(a.mes).padStart(2, '0')}`;
+      li.innerHTML = `<span></span><span class="badge ${a.hoje ? 'text-bg-success' : 'text-bg-light'}">${dia}</span>`;
+      li.firstElementChild.textContent = a.empresa ? `${a.nome} (${a.empresa})` : a.nome;
+      list.appendChild(li);
+    }
+  } catch (err) {
+    list.innerHTML = '<li class="list-group-item text-muted">Não foi possível carregar.</li>';
+  }
+});
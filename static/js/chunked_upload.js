@@ -0,0 +1,104 @@
+// Envio em partes (retomável) para <input type="file" data-chunked>.
+// Arquivos acima do limite (data-chunked em MB, padrão 8) vão para /uploads/parcial
+// em pedaços; se a conexão cair, retoma do último byte confirmado pelo servidor.
+// No fim o formulário é enviado só com o id (<campo>_upload), sem o arquivo.
+(() => {
+  const BASE = '/uploads/parcial';
+  const RETRIES = 5;
+
+  const sleep = ms => new Promise(r => setTimeout(r, ms));
+  const storeKey = f => `upload:${f.name}:${f.size}:${f.lastModified}`;
+
+  async function sha256(buf) {
+    if (!(window.crypto && crypto.subtle)) return null;   // só em HTTPS/localhost
+    const h = await crypto.subtle.digest('SHA-256', buf);
+    return [...new Uint8Array(h)].map(b => b.toString(16).padStart(2, '0')).join('');
+  }
+
+  async function json(resp) {
+    const data = await resp.json().catch(() => ({}));
+    if (!resp.ok && resp.status !== 409) throw new Error(data.erro || `HTTP ${resp.status}`);
+    return data;
+  }
+
+  async function session(file) {
+    // sessão anterior do mesmo arquivo (página recarregada no meio do envio)?
+    const saved = localStorage.getItem(storeKey(file));
+    if (saved) {
+      const r = await fetch(`${BASE}/${saved}`, {credentials: 'same-origin'});
+      if (r.ok) return {chunk_size: 4 * 1024 * 1024, ...(await r.json())};
+      localStorage.removeItem(storeKey(file));
+    }
+    const r = await fetch(BASE, {
+      method: 'POST', credentials: 'same-origin',
+      headers: {'Content-Type': 'application/json'},
+      body: JSON.stringify({filename: file.name, size: file.size}),
+    });
+    const s = await json(r);
+    localStorage.setItem(storeKey(file), s.id);
+    return s;
+  }
+
+  async function upload(file, onProgress) {
+    const s = await session(file);
+    let offset = s.offset, failures = 0;
+    while (offset < file.size) {
+      const chunk = await file.slice(offset, offset + s.chunk_size).arrayBuffer();
+      const headers = {'Upload-Offset': String(offset), 'Content-Type': 'application/octet-stream'};
+      const digest = await sha256(chunk);
+      if (digest) headers['X-Chunk-SHA256'] = digest;
+      try {
+        const r = await fetch(`${BASE}/${s.id}`, {method: 'PATCH', credentials: 'same-origin', headers, body: chunk});
+        const data = await json(r);
+        offset = data.offset;          // 409 também traz o offset certo
+        failures = 0;
+        onProgress(offset / file.size);
+      } catch (err) {
+        if (++failures > RETRIES) throw err;
+        await sleep(1000 * 2 ** failures);
+        const r = await fetch(`${BASE}/${s.id}`, {credentials: 'same-origin'});
+        if (r.ok) offset = (await r.json()).offset;
+      }
+    }
+    localStorage.removeItem(storeKey(file));
+    return s.id;
+  }
+
+  function bind(input) {
+    const form = input.form;
+    const threshold = (parseFloat(input.dataset.chunked) || 8) * 1024 * 1024;
+    form.addEventListener('submit', async ev => {
+      const file = input.files[0];
+      if (!file || file.size < threshold) return;
+      ev.preventDefault();
+
+      const bar = document.createElement('div');
+      bar.className = 'progress mt-1';
+      bar.innerHTML = '<div class="progress-bar" role="progressbar" style="width:0%">0%</div>';
+      input.after(bar);
+      const fill = bar.firstElementChild;
+      const buttons = form.querySelectorAll('button, [type=submit]');
+      buttons.forEach(b => b.disabled = true);
+      try {
+        const id = await upload(file, p => {
+          fill.style.width = fill.textContent = `${Math.floor(p * 100)}%`;
+        });
+        const hidden = document.createElement('input');
+        hidden.type = 'hidden';
+        hidden.name = `${input.name}_upload`;
+        hidden.value = id;
+        form.appendChild(hidden);
+        input.value = '';
+        form.submit();
+      } catch (err) {
+        bar.remove();
+        buttons.forEach(b => b.disabled = false);
+        alert(`Falha no envio: ${err.message}`);
+      }
+    });
+  }
+
+  document.addEventListener('DOMContentLoaded', () => {
+    document.querySelectorAll('input[type=file][data-chunked]').forEach(bind);
+  });
+})();
@@ -0,0 +1,135 @@
+// PDV modo rápido: cada lançamento vai para o IndexedDB na hora, com uma chave
+// gerada aqui, e um laço envia os pendentes em lote para /api/pdv/movimentos/lote.
+// A chave torna o reenvio seguro: se a resposta se perder, o servidor devolve
+// "duplicado" em vez de gravar de novo.
+(() => {
+  const form = document.getElementById('pdv-rapido');
+  if (!form) return;
+  const URL = form.dataset.syncUrl;
+  const LOTE = Math.min(parseInt(form.dataset.maxLote, 10) || 200, 200);
+  const INTERVAL = 3000;
+  const MANTER_ENVIADOS = 30;
+  const status = document.getElementById('pdv-sync-status');
+  const pendentesBadge = document.getElementById('pdv-pendentes');
+  const recentes = document.getElementById('pdv-recentes');
+  let db, syncing = false, timer = null;
+
+  const newKey = () => [...crypto.getRandomValues(new Uint8Array(16))]
+    .map(b => b.toString(16).padStart(2, '0')).join('');   // funciona também em http na rede local
+
+  const req = r => new Promise((ok, fail) => { r.onsuccess = () => ok(r.result); r.onerror = () => fail(r.error); });
+
+  function openDb() {
+    const r = indexedDB.open('pdv', 1);
+    r.onupgradeneeded = () => r.result.createObjectStore('fila', {keyPath: 'key'});
+    return req(r);
+  }
+
+  const store = mode => db.transaction('fila', mode).objectStore('fila');
+  const all = () => req(store('readonly').getAll());
+
+  function setStatus(text, cls) {
+    status.textContent = text;
+    status.className = `badge ${cls}`;
+  }
+
+  const brl = v => Number(v).toLocaleString('pt-BR', {style: 'currency', currency: 'BRL'});
+
+  async function render() {
+    const items = await all();
+    const pendentes = items.filter(i => i.estado === 'pendente').length;
+    pendentesBadge.textContent = `${pendentes} na fila`;
+    pendentesBadge.className = `badge ${pendentes ? 'bg-warning text-dark' : 'bg-light text-dark'}`;
+    items.sort((a, b) => b.created_at.localeCompare(a.created_at));
+    recentes.innerHTML = '';
+    for (const i of items.slice(0, 20)) {
+      const tr = document.createElement('tr');
+      const hora = new Date(i.created_at).toLocaleTimeString('pt-BR');
+      const sit = i.estado === 'enviado' ? `<span class="badge bg-success">enviado #${i.id}</span>`
+        : i.estado === 'erro' ? '<span class="badge bg-danger">recusado</span>'
+        : '<span class="badge bg-warning text-dark">na fila</span>';
+      tr.innerHTML = `<td>${hora}</td><td></td><td>${brl(i.valor)}</td><td></td><td></td><td>${sit}</td>`;
+      tr.children[1].textContent = i.tipo;
+      tr.children[3].textContent = i.pagamento;
+      tr.children[4].textContent = i.ticket_ref || '-';
+      if (i.erro) tr.children[5].append(` ${i.erro}`);
+      recentes.appendChild(tr);
+    }
+  }
+
+  async function prune() {
+    const enviados = (await all()).filter(i => i.estado === 'enviado')
+      .sort((a, b) => b.created_at.localeCompare(a.created_at));
+    const s = store('readwrite');
+    for (const i of enviados.slice(MANTER_ENVIADOS)) s.delete(i.key);
+  }
+
+  async function sync() {
+    if (syncing) return;
+    syncing = true;
+    try {
+      for (;;) {
+        const lote = (await all()).filter(i => i.estado === 'pendente')
+          .sort((a, b) => a.created_at.localeCompare(b.created_at)).slice(0, LOTE);
+        if (!lote.length) { setStatus('em dia', 'bg-success'); break; }
+        setStatus(`enviando ${lote.length}...`, 'bg-info text-dark');
+        const resp = await fetch(URL, {
+          method: 'POST', credentials: 'same-origin',
+          headers: {'Content-Type': 'application/json', 'Accept': 'application/json'},
+          body: JSON.stringify({movimentos: lote.map(({estado, erro, id, ...m}) => m)}),
+        });
+        const ctype = resp.headers.get('Content-Type') || '';
+        if (resp.redirected || !ctype.includes('json')) throw new Error('sessão expirada: entre de novo (nada foi perdido)');
+        const data = await resp.json();
+        if (!resp.ok) throw new Error(data.erro || `HTTP ${resp.status}`);
+        const byKey = new Map(lote.map(i => [i.key, i]));
+        const s = store('readwrite');
+        for (const r of data.resultados) {
+          const item = byKey.get(r.key);
+          if (!item) continue;
+          if (r.status === 'invalido') Object.assign(item, {estado: 'erro', erro: r.erro});
+          else Object.assign(item, {estado: 'enviado', id: r.id});
+          s.put(item);
+        }
+        await prune();
+        await render();
+      }
+    } catch (err) {
+      setStatus(navigator.onLine === false ? 'sem rede' : `sem conexão: ${err.message}`, 'bg-danger');
+    } finally {
+      syncing = false;
+    }
+  }
+
+  function soon(ms = 300) {
+    clearTimeout(timer);
+    timer = setTimeout(sync, ms);     // lançamentos seguidos vão no mesmo lote
+  }
+
+  form.addEventListener('submit', async ev => {
+    ev.preventDefault();
+    const f = new FormData(form);
+    const raw = String(f.get('valor') || '').trim();
+    // "1.234,56" ou "12,50" (vírgula decimal) e também "12.50"
+    const valor = Number(raw.includes(',') ? raw.replace(/\./g, '').replace(',', '.') : raw);
+    if (!(valor > 0)) { form.valor.focus(); return; }
+    await req(store('readwrite').add({
+      key: newKey(), estado: 'pendente', created_at: new Date().toISOString(),
+      tipo: f.get('tipo'), valor: valor.toFixed(2), pagamento: f.get('pagamento'),
+      ticket_ref: f.get('ticket_ref') || '', cliente: f.get('cliente') || '',
+      descricao: f.get('descricao') || '', imprimir: f.get('imprimir') === 'on',
+    }));
+    for (const name of ['valor', 'ticket_ref', 'cliente', 'descricao']) form[name].value = '';
+    form.valor.focus();
+    render();
+    soon();
+  });
+
+  openDb().then(d => {
+    db = d;
+    render();
+    sync();
+    setInterval(sync, INTERVAL);
+    window.addEventListener('online', () => soon(0));
+  }).catch(err => setStatus(`IndexedDB indisponível: ${err}`, 'bg-danger'));
+})();
@@ -0,0 +1,29 @@
+// Acompanha o ticket enviado para a fila de impressão do PDV (/api/pdv/impressoes/<id>).
+document.addEventListener('DOMContentLoaded', () => {
+  const badge = document.querySelector('[data-print-status]');
+  if (!badge) return;
+  const classes = {pendente: 'bg-warning text-dark', imprimindo: 'bg-info text-dark', impresso: 'bg-success', falhou: 'bg-danger'};
+  let tries = 0;
+  const poll = async () => {
+    try {
+      const resp = await fetch(badge.dataset.printStatus, {credentials: 'same-origin'});
+      if (!resp.ok) throw new Error(`HTTP ${resp.status}`);
+      const job = await resp.json();
+      badge.className = `badge ${classes[job.status] || 'bg-secondary'}`;
+      badge.textContent = job.erro ? `${job.status}: ${job.erro}` : job.status;
+      if (job.status === 'impresso') return;
+      if (job.status === 'falhou' || (job.erro && tries > 2)) {
+        const link = document.createElement('a');
+        link.href = badge.dataset.jobsUrl;
+        link.className = 'ms-2';
+        link.textContent = 'ver fila';
+        badge.after(link);
+        if (job.status === 'falhou') return;
+      }
+    } catch (err) {
+      badge.textContent = 'sem resposta';
+    }
+    if (++tries < 60) setTimeout(poll, Math.min(500 * tries, 5000));
+  };
+  poll();
+});
@@ -0,0 +1,49 @@
+import os, sys
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# banco em memória e sem instrumentação; precisa vir antes de importar o app.
+# Auditoria síncrona: a thread do AuditWriter usaria a mesma conexão em memória
+# (StaticPool) ao mesmo tempo que o teste; test_audit.py cria o seu próprio writer.
+os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+os.environ["INSTRUMENTATION"] = "0"
+os.environ["AUDIT_ASYNC"] = "0"
+
+from app import app as flask_app  # noqa: E402
+from extensions import db  # noqa: E402
+import audit  # noqa: E402
+
+assert audit._writer is None
+
+# os jobs do agendador não rodam nos testes
+_sched = flask_app.extensions.pop("scheduler", None)
+if _sched is not None:
+    _sched.shutdown(wait=False)
+
+@pytest.fixture
+def app():
+    flask_app.config.update(TESTING=True, LOGIN_DISABLED=True, WTF_CSRF_ENABLED=False)
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@contextmanager
+def count_queries():
+    """Lista com as SQL executadas dentro do bloco (before_cursor_execute)."""
+    statements = []
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", _count)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _count)
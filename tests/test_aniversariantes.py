@@ -0,0 +1,28 @@
+from datetime import date
+import pytest
+from extensions import db
+from models import Employee
+
+NASCIMENTOS = [date(1990, 12, 28), date(1991, 12, 29), date(1992, 12, 31), date(1993, 1, 1),
+               date(1994, 1, 4), date(1995, 1, 5), date(1996, 2, 3), date(1997, 2, 4)]
+
+@pytest.fixture
+def funcionarios(app):
+    db.session.add_all([Employee(nome=f"F{i}", data_nascimento=d) for i, d in enumerate(NASCIMENTOS)])
+    db.session.commit()
+
+def _aniversarios(**kw):
+    rows = Employee.query.filter(Employee.aniversario_filter(**kw)).all()
+    return sorted((e.data_nascimento.month, e.data_nascimento.day) for e in rows)
+
+@pytest.mark.parametrize("de, esperado", [
+    (date(2026, 12, 29), [(1, 1), (1, 4), (12, 29), (12, 31)]),    # 29/12 .. 04/01
+    (date(2026, 1, 28), [(2, 3)]),                                   # 28/01 .. 03/02
+    (date(2026, 12, 22), [(12, 28)]),                                # 22/12 .. 28/12
+])
+def test_window_covers_exactly_n_days(funcionarios, de, esperado):
+    assert _aniversarios(de=de, dias=7) == esperado
+
+def test_single_day_and_empty(funcionarios):
+    assert _aniversarios(de=date(2026, 1, 4), dias=1) == [(1, 4)]
+    assert _aniversarios(de=date(2026, 1, 4), dias=0) == []
@@ -0,0 +1,48 @@
+import pytest
+from audit import AuditWriter
+from models import AuditLog
+
+def _row(i):
+    return dict(user="t", action="teste", entity="x", entity_id=i, payload="{}")
+
+@pytest.fixture
+def writer(app):
+    return AuditWriter(app, batch_size=10, interval=60, max_buffer=20)   # sem thread: flush manual
+
+def _fail(monkeypatch, writer, when):
+    orig = writer._write
+    def write(rows):
+        if when(rows): raise RuntimeError("banco fora")
+        orig(rows)
+    monkeypatch.setattr(writer, "_write", write)
+
+def test_failed_batch_is_kept_and_rewritten(writer, monkeypatch):
+    for i in range(5): writer.put(_row(i))
+    _fail(monkeypatch, writer, lambda rows: True)
+    assert writer.flush() is False
+    assert AuditLog.query.count() == 0
+    monkeypatch.undo()
+    assert writer.flush() is True
+    assert AuditLog.query.count() == 5
+
+def test_flush_includes_rows_already_taken_from_queue(writer):
+    writer.put(_row(1))
+    writer._pending = writer._drain()          # como a thread no meio de um lote
+    writer.put(_row(2))
+    writer.flush()
+    assert sorted(r.entity_id for r in AuditLog.query) == [1, 2]
+
+def test_bad_row_does_not_block_others(writer, monkeypatch):
+    for i in range(4): writer.put(_row(i))
+    _fail(monkeypatch, writer, lambda rows: any(r["entity_id"] == 2 for r in rows))
+    for _ in range(AuditWriter.MAX_RETRIES): writer.flush()
+    assert sorted(r.entity_id for r in AuditLog.query) == [0, 1, 3]
+    assert writer._pending == []
+
+def test_full_queue_with_db_error_does_not_raise(writer, monkeypatch):
+    _fail(monkeypatch, writer, lambda rows: True)
+    for i in range(30): writer.put(_row(i))     # fila (20) enche; put não levanta
+    assert writer.queue.qsize() + len(writer._pending) <= 2 * writer.max_buffer
+    monkeypatch.undo()
+    writer.flush()
+    assert AuditLog.query.count() >= 20
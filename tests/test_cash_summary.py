@@ -0,0 +1,46 @@
+from datetime import datetime, date
+from decimal import Decimal
+from extensions import db
+from blueprints.pdv import cash
+from blueprints.pdv.models import CashMovement, CashDailySummary
+
+DIA = datetime(2026, 3, 10, 15, 0)          # 12:00 em America/Sao_Paulo
+
+def _resumo():
+    rows = CashDailySummary.query.order_by(CashDailySummary.dia, CashDailySummary.user_id,
+                                           CashDailySummary.pagamento).all()
+    return {(r.dia, r.user_id, r.pagamento): (Decimal(r.entradas), Decimal(r.saidas), r.qtd)
+            for r in rows if r.qtd or r.entradas or r.saidas}
+
+def _assert_matches_rebuild():
+    incremental = _resumo()
+    cash.rebuild(date(2026, 3, 1), date(2026, 3, 31))
+    assert incremental == _resumo()
+
+def _mov(**kw):
+    data = dict(tipo="VENDA", valor=Decimal("10.00"), pagamento="PIX", user_id=1, created_at=DIA)
+    data.update(kw)
+    return CashMovement(**data)
+
+def test_edit_moves_totals(app):
+    a, b = _mov(), _mov(tipo="SANGRIA", valor=Decimal("3.00"), pagamento="DINHEIRO")
+    db.session.add_all([a, b])
+    db.session.commit()
+    # objetos expirados pelo commit: o valor antigo precisa ser carregado ao editar
+    a.valor = Decimal("25.00")
+    a.pagamento = "CARTAO"
+    b.tipo = "VENDA"
+    b.created_at = datetime(2026, 3, 12, 15, 0)
+    b.user_id = 2
+    db.session.commit()
+    _assert_matches_rebuild()
+
+def test_edit_untracked_field_and_delete(app):
+    a, b = _mov(), _mov(valor=Decimal("7.50"))
+    db.session.add_all([a, b])
+    db.session.commit()
+    a.descricao = "só a descrição"
+    db.session.delete(b)
+    db.session.commit()
+    assert _resumo() == {(date(2026, 3, 10), 1, "PIX"): (Decimal("10.00"), Decimal("0.00"), 1)}
+    _assert_matches_rebuild()
@@ -0,0 +1,34 @@
+from extensions import db
+from models import Employee
+from blueprints.dash import routes as dash
+
+def test_cache_invalidated_on_commit_not_flush(app):
+    dash.invalidate_dashboard_cache()
+    assert dash.dashboard_counts()["total_func"] == 0
+    db.session.add(Employee(nome="Ana"))
+    db.session.flush()
+    # antes do commit o cache não é tocado (outra requisição ainda vê o estado antigo)
+    assert dash._cache["data"] is not None
+    db.session.commit()
+    assert dash._cache["data"] is None
+    assert dash.dashboard_counts()["total_func"] == 1
+
+def test_rollback_does_not_invalidate(app):
+    dash.invalidate_dashboard_cache()
+    dash.dashboard_counts()
+    db.session.add(Employee(nome="Bia"))
+    db.session.flush()
+    db.session.rollback()
+    db.session.commit()
+    assert dash._cache["data"] is not None
+
+def test_stale_computation_is_not_cached(app, monkeypatch):
+    dash.invalidate_dashboard_cache()
+    orig = dash._compute_counts
+    def compute_then_commit(hoje):
+        data = orig(hoje)                     # leu o estado antigo...
+        dash.invalidate_dashboard_cache()     # ...e outro commit chegou no meio
+        return data
+    monkeypatch.setattr(dash, "_compute_counts", compute_then_commit)
+    dash.dashboard_counts()
+    assert dash._cache["data"] is None
@@ -0,0 +1,10 @@
+import logging
+from images import make_derivatives
+
+def test_broken_image_is_logged_not_raised(app, tmp_path, monkeypatch, caplog):
+    monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+    (tmp_path / "foto.jpg").write_bytes(b"isto nao e um jpeg")
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        make_derivatives(app, "foto.jpg")
+    falhas = [r for r in caplog.records if "Falha ao gerar derivado" in r.getMessage()]
+    assert falhas and all(r.exc_info for r in falhas)
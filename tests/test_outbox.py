@@ -0,0 +1,70 @@
+import smtplib
+import outbox
+from models import OutboxMessage
+
+def _enqueue(n, channel="email", destino="a@x.com"):
+    for i in range(n):
+        outbox.enqueue(channel, destino, f"corpo {i}", subject="s", key=f"{channel}-{i}")
+    outbox.db.session.commit()
+
+def test_disabled_channels_are_not_marked_sent(app, monkeypatch):
+    monkeypatch.delenv("SMTP_HOST", raising=False)
+    monkeypatch.delenv("WHATSAPP_PROVIDER", raising=False)
+    _enqueue(2)
+    _enqueue(2, channel="whatsapp", destino="+5511999999999")
+    summary = outbox.drain()
+    assert summary["enviado"] == 0
+    assert summary["email"]["sent"] == 0 and len(summary["email"]["failed"]) == 2
+    assert summary["whatsapp"]["failed"][0][0] == "+5511999999999"
+    for m in OutboxMessage.query:
+        assert m.status == "pendente" and m.attempts == 0 and m.sent_at is None
+        assert "configurado" in m.last_error
+
+def test_unreachable_smtp_fails_batch_after_first_connect(app, monkeypatch):
+    monkeypatch.setenv("SMTP_HOST", "smtp.invalido")
+    calls = []
+    def refuse(*a, **kw):
+        calls.append(a)
+        raise OSError("connection refused")
+    monkeypatch.setattr(smtplib, "SMTP", refuse)
+    _enqueue(5)
+    summary = outbox.drain()
+    assert len(calls) == 1
+    assert {k: summary[k] for k in outbox.STATUSES} == {"enviado": 0, "pendente": 5, "falhou": 0}
+    assert [d for d, _ in summary["email"]["failed"]] == ["a@x.com"] * 5
+    assert all("connection refused" in erro for _, erro in summary["email"]["failed"])
+    assert "email: 0 enviados em" in outbox.format_report(summary)
+    assert all("connection refused" in m.last_error and m.attempts == 1 for m in OutboxMessage.query)
+
+def test_report_has_per_channel_counts_and_timing(app, monkeypatch):
+    monkeypatch.setenv("SMTP_HOST", "smtp.teste")
+    class FakeSMTP:
+        def __init__(self, *a, **kw): pass
+        def starttls(self): pass
+        def send_message(self, msg):
+            if "ruim" in msg["To"]: raise smtplib.SMTPRecipientsRefused({})
+        def quit(self): pass
+        def close(self): pass
+    monkeypatch.setattr(smtplib, "SMTP", FakeSMTP)
+    _enqueue(3)
+    outbox.enqueue("email", "ruim@x.com", "corpo", key="ruim")
+    outbox.db.session.commit()
+    report = outbox.drain()
+    assert report["enviado"] == 3 and report["pendente"] == 1
+    assert report["email"]["sent"] == 3 and report["email"]["seconds"] >= 0
+    assert [d for d, _ in report["email"]["failed"]] == ["ruim@x.com"]
+    assert outbox.format_report(report).startswith("email: 3 enviados em")
+    assert outbox.last_report[1] is report
+
+def test_enqueue_dedup_is_part_of_callers_transaction(app):
+    first = outbox.enqueue("email", "a@x.com", "corpo", key="k1")
+    assert first is not None
+    assert outbox.enqueue("email", "a@x.com", "corpo", key="k1") is None   # mesma transação
+    outbox.db.session.rollback()                                             # chamador desiste
+    assert OutboxMessage.query.count() == 0
+    assert outbox.enqueue("email", "a@x.com", "corpo", key="k1") is not None
+    outbox.db.session.commit()
+    assert outbox.enqueue("email", "a@x.com", "corpo", key="k1") is None
+    assert outbox.enqueue("email", "a@x.com", "corpo") is not None            # sem chave: sem dedup
+    outbox.db.session.commit()
+    assert OutboxMessage.query.count() == 2
@@ -0,0 +1,32 @@
+import uuid
+import pytest
+from blueprints.pdv.models import CashMovement
+
+URL = "/api/pdv/movimentos/lote"
+
+def _item(**kw):
+    item = {"key": uuid.uuid4().hex, "tipo": "VENDA", "valor": "10,50", "pagamento": "PIX"}
+    item.update(kw)
+    return item
+
+@pytest.mark.parametrize("bad", [
+    {"valor": "NaN"}, {"valor": "-NaN"}, {"valor": "sNaN"}, {"valor": "Infinity"}, {"valor": "-inf"},
+    {"valor": None}, {"valor": "0"}, {"valor": "abc"},
+    {"created_at": "ontem"}, {"created_at": "2026-13-45T99:00:00Z"}, {"created_at": 12345},
+])
+def test_invalid_item_does_not_fail_batch(client, bad):
+    good = _item()
+    r = client.post(URL, json={"movimentos": [_item(**bad), good]})
+    assert r.status_code == 200
+    data = r.get_json()
+    assert [x["status"] for x in data["resultados"]] == ["invalido", "criado"]
+    assert CashMovement.query.filter_by(client_key=good["key"]).count() == 1
+
+def test_resend_is_deduplicated(client):
+    items = [_item(), _item()]
+    first = client.post(URL, json={"movimentos": items}).get_json()
+    again = client.post(URL, json={"movimentos": items + [items[0]]}).get_json()
+    assert first["criado"] == 2
+    assert again["criado"] == 0 and again["duplicado"] == 3
+    assert [x["id"] for x in again["resultados"][:2]] == [x["id"] for x in first["resultados"]]
+    assert CashMovement.query.count() == 2
@@ -0,0 +1,117 @@
+import socket, socketserver, threading, time
+from datetime import datetime
+import pytest
+from extensions import db
+from blueprints.pdv import spooler
+from blueprints.pdv.models import PrintJob
+from utils_printer import PrinterConnection
+
+class _Printer(socketserver.ThreadingTCPServer):
+    """Impressora de mentira na 127.0.0.1: guarda os bytes recebidos por conexão."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, close_after_first=False):
+        self.received = []                  # um bytearray por conexão
+        self.close_after_first = close_after_first
+        super().__init__(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def data(self, expected, timeout=2):
+        deadline = time.monotonic() + timeout
+        while b"".join(self.received) != expected and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return b"".join(self.received)
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        buf = bytearray()
+        self.server.received.append(buf)
+        while True:
+            chunk = self.request.recv(4096)
+            if not chunk: break
+            buf += chunk
+            if self.server.close_after_first: break     # impressora derruba a conexão
+
+@pytest.fixture
+def printer():
+    srv = _Printer()
+    yield srv
+    srv.shutdown(); srv.server_close()
+
+@pytest.fixture
+def use_printer(monkeypatch):
+    conns = []
+    def _use(port):
+        conn = PrinterConnection(host="127.0.0.1", port=port, timeout=1)
+        conns.append(conn)
+        monkeypatch.setattr(spooler, "_printer", conn)
+        return conn
+    yield _use
+    for c in conns: c.close()
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _job(payload=b"\x1b@ticket 1\n"):
+    job = spooler.enqueue(payload, "Ticket 1")
+    db.session.commit()
+    return job
+
+def test_drain_prints_and_marks_done(app, printer, use_printer):
+    use_printer(printer.port)
+    job = _job()
+    assert spooler.drain() == {"impresso": 1, "pendente": 0, "falhou": 0}
+    assert printer.data(job.payload) == job.payload
+    db.session.refresh(job)
+    assert job.status == "impresso" and job.printed_at and job.attempts == 1
+
+def test_printer_down_backs_off_and_keeps_job(app, printer, use_printer):
+    use_printer(_free_port())
+    a, b = _job(b"primeiro\n"), _job(b"segundo\n")
+    antes = datetime.utcnow()
+    assert spooler.drain() == {"impresso": 0, "pendente": 2, "falhou": 0}
+    for j in (a, b):
+        db.session.refresh(j)
+        # volta para a fila (lease liberado) com espera de backoff, não de LEASE
+        assert j.status == "pendente"
+        assert antes < j.next_attempt_at < antes + spooler.LEASE
+    assert a.attempts == 1 and a.last_error and b.attempts == 0
+    assert spooler.drain()["impresso"] == 0           # ainda na espera
+
+    use_printer(printer.port)
+    spooler.retry(a.id); spooler.retry(b.id)
+    assert spooler.drain()["impresso"] == 2
+    assert printer.data(b"primeiro\nsegundo\n") == b"primeiro\nsegundo\n"
+
+def test_connection_reopens_after_peer_close():
+    srv = _Printer(close_after_first=True)
+    conn = PrinterConnection(host="127.0.0.1", port=srv.port, timeout=1)
+    try:
+        conn.send(b"um\n")
+        assert srv.data(b"um\n") == b"um\n"
+        time.sleep(0.05)                              # impressora fechou o socket
+        first = conn.sock
+        conn.send(b"dois\n")
+        assert conn.sock is not first
+        assert srv.data(b"um\ndois\n") == b"um\ndois\n"
+        assert len(srv.received) == 2 and conn.last_error is None
+    finally:
+        conn.close(); srv.shutdown(); srv.server_close()
+
+def test_reprint_requeues_copy(app, printer, use_printer):
+    use_printer(printer.port)
+    job = _job()
+    spooler.drain()
+    copia = spooler.reprint(job.id)
+    assert copia.id != job.id and copia.status == "pendente"
+    assert copia.payload == job.payload and copia.titulo.endswith("(2ª via)")
+    assert spooler.drain()["impresso"] == 1
+    assert printer.data(job.payload * 2) == job.payload * 2
+    assert PrintJob.query.filter_by(status="impresso").count() == 2
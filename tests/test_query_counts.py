@@ -0,0 +1,59 @@
+from datetime import date, timedelta
+import pytest
+from extensions import db
+from models import Company, Document, DocumentType, Employee, Funcao
+from alerts import collect_alerts
+from conftest import count_queries
+
+# Listagens, PDFs e alertas leem empresa/tipo de cada documento (e empresa/função
+# de cada colaborador): o número de queries não pode crescer com o número de linhas (N+1).
+
+def _docs(n):
+    hoje = date.today()
+    for i in range(n):
+        c = Company(razao_social=f"Empresa {i}", cnpj=f"{i:014d}")
+        t = DocumentType(nome=f"Tipo {i}")
+        db.session.add(Document(company=c, tipo=t, descricao=f"Doc {i}",
+                                data_vencimento=hoje - timedelta(days=i % 3)))
+    db.session.commit()
+    db.session.expunge_all()
+
+def _employees(n):
+    for i in range(n):
+        db.session.add(Employee(nome=f"Colaborador {i}", company=Company(razao_social=f"Empresa {i}"),
+                                funcao=Funcao(nome=f"Funcao {i}")))
+    db.session.commit()
+    db.session.expunge_all()
+
+def _count(fn, n, seed=_docs):
+    seed(n)
+    with count_queries() as statements:
+        fn()
+    db.session.rollback()
+    for model in (Document, DocumentType, Employee, Funcao, Company):
+        model.query.delete()
+    db.session.commit()
+    db.session.expunge_all()
+    return len(statements)
+
+@pytest.mark.parametrize("url", ["/documentos/", "/documentos/exportar.pdf", "/documentos/exportar_vencidos.pdf"])
+def test_documents_views_constant_queries(client, url):
+    def get():
+        assert client.get(url).status_code == 200
+    assert _count(get, 1) == _count(get, 20)
+
+def test_collect_alerts_constant_queries(app):
+    def collect():
+        for _title, company, docs in collect_alerts():
+            company and company.razao_social
+            for d in docs:
+                d.company.razao_social, d.tipo.nome
+    assert _count(collect, 1) == _count(collect, 20)
+
+@pytest.mark.parametrize("url", ["/rh/colaboradores", "/rh/colaboradores?q=colab"])
+def test_employee_list_constant_queries(client, url):
+    def get():
+        r = client.get(url)
+        assert r.status_code == 200
+        assert b"Funcao 0" in r.data
+    assert _count(get, 1, _employees) == _count(get, 20, _employees)
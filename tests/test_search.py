@@ -0,0 +1,42 @@
+import search
+from extensions import db
+from models import Company, Document, DocumentType, Employee, EmployeeDocument, SearchDoc
+
+def _setup():
+    comp, tipo = Company(razao_social="Antiga Ltda"), DocumentType(nome="Alvara")
+    emp = Employee(nome="Carlos Souza", company=comp)
+    db.session.add_all([comp, tipo, emp])
+    db.session.flush()
+    outro = Company(razao_social="Outra SA")
+    db.session.add_all([outro,
+                        Document(company=comp, tipo=tipo, descricao="licenca"),
+                        Document(company=outro, descricao="sem tipo"),
+                        EmployeeDocument(employee=emp, tipo="CNH")])
+    db.session.commit()
+    search.index_pending()
+    return comp, tipo, emp
+
+def _titles(q):
+    return sorted(h.title for h in search.search(q))
+
+def test_renaming_names_in_title_reindexes_documents(app):
+    comp, tipo, emp = _setup()
+    assert SearchDoc.query.filter_by(pending=True).count() == 0
+
+    comp.razao_social = "Renomeada SA"
+    tipo.nome = "Licenca Ambiental"
+    emp.nome = "Carlos Pereira"
+    db.session.commit()
+    assert SearchDoc.query.filter_by(pending=True).count() == 2     # o documento de "Outra SA" não
+    search.index_pending()
+
+    assert _titles("Renomeada") == ["Licenca Ambiental | licenca | Renomeada SA"]
+    assert _titles("Pereira") == ["CNH | Carlos Pereira"]
+    assert _titles("Antiga") == [] and _titles("Alvara") == []
+
+def test_unrelated_edit_does_not_reindex(app):
+    comp, tipo, emp = _setup()
+    comp.cnpj = "00.000.000/0001-00"
+    emp.cpf = "000.000.000-00"
+    db.session.commit()
+    assert SearchDoc.query.filter_by(pending=True).count() == 0
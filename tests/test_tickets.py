@@ -0,0 +1,59 @@
+from datetime import datetime
+from decimal import Decimal
+import pytest
+from extensions import db
+from models import Company
+from blueprints.pdv import tickets
+from blueprints.pdv.models import CashMovement
+from utils_printer import build_ticket_lines, _to_escpos_bytes
+
+# Bytes gerados pelo caminho antigo (build_ticket_lines + _to_escpos_bytes), 32 colunas.
+TESTE_32 = (b"\x1b@            TRANSer             \n--------------------------------\n"
+            b"       TESTE DE IMPRESS\x8eO       \n--------------------------------\n"
+            b"Modelo: EPSON TM-T20 (ESC/POS)\nColunas: 32\nOK: Sucesso\n"
+            b"--------------------------------\n\n\x1dVA\x10")
+
+@pytest.fixture(autouse=True)
+def _env(app, monkeypatch):
+    for var in ("TICKET_LOGO", "TICKET_QR", "TICKET_HEADER_1", "TICKET_HEADER_2", "TICKET_HEADER_3"):
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setenv("TICKET_COLS", "32")
+    tickets._header["linhas"] = None
+    yield
+    tickets._header["linhas"] = None
+
+def _legacy_comprovante(mov, header, cols):
+    """Montagem do comprovante antes dos layouts pré-compilados (blueprints/pdv/routes.py)."""
+    lines = build_ticket_lines(
+        title="COMPROVANTE DE CAIXA", header_lines=header, cols=cols,
+        fields=[
+            ("Tipo", mov.tipo),
+            ("Valor", f"R$ {mov.valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")),
+            ("Forma", mov.pagamento),
+            ("Cliente", mov.cliente or "-"),
+            ("Ticket", mov.ticket_ref or "-"),
+            ("Descrição", mov.descricao or "-"),
+            ("Data", mov.created_at.strftime("%d/%m/%Y %H:%M")),
+        ],
+        ask_signature=(mov.tipo in ("SANGRIA", "RETIRADA")))
+    return _to_escpos_bytes(lines)
+
+def test_teste_ticket_bytes_are_pinned():
+    assert tickets.teste() == TESTE_32
+
+@pytest.mark.parametrize("mov", [
+    CashMovement(tipo="VENDA", valor=Decimal("1234.5"), pagamento="PIX", cliente="José",
+                 ticket_ref="", descricao=None, created_at=datetime(2026, 3, 1, 9, 5)),
+    CashMovement(tipo="SANGRIA", valor=Decimal("80"), pagamento="DINHEIRO", cliente=None, ticket_ref="T-991",
+                 descricao="Retirada para troco do caixa 2 — conferida pela gerência no fim do turno",
+                 created_at=datetime(2026, 12, 31, 23, 59)),
+])
+def test_comprovante_matches_pre_refactor_output(mov):
+    assert tickets.comprovante(mov) == _legacy_comprovante(mov, ["TRANSer"], 32)
+
+def test_company_change_refreshes_header_right_after_boot(monkeypatch):
+    monkeypatch.setattr(tickets.time, "monotonic", lambda: 10.0)     # processo recém-iniciado
+    assert tickets.company_header() == ("TRANSer",)
+    db.session.add(Company(razao_social="Balança Sul Ltda", cidade="Curitiba", cnpj="12.345.678/0001-90"))
+    db.session.commit()
+    assert tickets.company_header() == ("Balança Sul Ltda", "Curitiba", "CNPJ: 12.345.678/0001-90")
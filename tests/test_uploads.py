@@ -0,0 +1,26 @@
+import pytest
+import blobstore
+
+PART = "0123456789abcdef0123456789abcdef.part"
+
+@pytest.fixture
+def uploads(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+    (tmp_path / "fotos").mkdir()
+    (tmp_path / "fotos" / "a.txt").write_bytes(b"publico")
+    (tmp_path / blobstore.PARTIAL_DIR).mkdir()
+    (tmp_path / blobstore.PARTIAL_DIR / PART).write_bytes(b"envio pela metade")
+    return tmp_path
+
+@pytest.mark.parametrize("url", [
+    f"/uploads/_partial/{PART}",
+    f"/uploads/fotos/../_partial/{PART}",
+    f"/uploads/./_partial/{PART}",
+    f"/uploads/uploads/./_partial/{PART}",
+])
+def test_partial_uploads_are_never_served(client, uploads, url):
+    assert client.get(url).status_code == 404
+
+def test_regular_upload_is_served(client, uploads):
+    r = client.get("/uploads/fotos/a.txt")
+    assert r.status_code == 200 and r.data == b"publico"
@@ -1,10 +1,8 @@
 import os
-import uuid
 from functools import wraps
 
-from flask import current_app, abort, redirect, url_for, flash
+from flask import current_app, abort, redirect, url_for, flash, request
 from flask_login import current_user, login_required
-from werkzeug.utils import secure_filename
 
 # Extensões permitidas p/ upload
 ALLOWED_EXTENSIONS = {".pdf", ".png", ".jpg", ".jpeg"}
@@ -13,27 +11,45 @@ def _allowed(filename: str) -> bool:
     ext = os.path.splitext(filename)[1].lower()
     return ext in ALLOWED_EXTENSIONS or ext == ""
 
+class PartialUpload:
+    """Arquivo já recebido em partes por /uploads/parcial (o formulário traz só o id)."""
+    def __init__(self, upload_id):
+        self.upload_id = upload_id
+        self.filename = upload_id
+
+def uploaded(field):
+    """
+    Arquivo de um FileField: o enviado junto com o formulário ou, se o navegador
+    mandou em partes, o campo oculto <campo>_upload com o id do envio.
+    """
+    upload_id = request.form.get(f"{field.name}_upload")
+    if upload_id:
+        return PartialUpload(upload_id)
+    data = field.data
+    return data if data and getattr(data, "filename", None) else None
+
 def save_file(storage, subdir: str):
     """
-    Salva o arquivo em <root>/uploads/<subdir>/<arquivo>
-    Retorna o caminho relativo a /uploads: ex.: 'func_docs/xxxx_arquivo.pdf'
+    Salva o arquivo em <root>/uploads/<subdir>/ sem duplicar conteúdo
+    (ver blobstore.store). Retorna o caminho relativo a /uploads:
+    ex.: 'func_docs/3f/3f9a...e1.pdf'. A referência entra na transação
+    de quem chamou (commit fica com a rota). Acima do limite do tipo
+    levanta blobstore.UploadTooLarge.
     """
     if not storage or not storage.filename:
         return None
 
-    safe = secure_filename(storage.filename)
-    prefix = uuid.uuid4().hex[:8]
-    name, ext = os.path.splitext(safe)
-    filename = f"{prefix}_{name}{ext}"
-
-    abs_dir = os.path.join(current_app.root_path, "uploads", subdir)
-    os.makedirs(abs_dir, exist_ok=True)
-
-    abs_path = os.path.join(abs_dir, filename)
-    storage.save(abs_path)
+    from blobstore import store, store_partial
+    if isinstance(storage, PartialUpload):
+        rel = store_partial(storage.upload_id, getattr(current_user, "username", None), subdir)
+    else:
+        rel = store(storage, subdir)
 
-    # caminho que sua rota /uploads/<path> entende
-    return f"{subdir}/{filename}".replace("\\", "/")
+    # fotos: já gera as versões reduzidas (PDF 3x4, miniatura, web)
+    if subdir == "fotos":
+        from images import make_derivatives
+        make_derivatives(current_app, rel)
+    return rel
 
 def admin_required(fn):
     """
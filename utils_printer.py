@@ -1,4 +1,5 @@
-import os, socket
+import os, select, socket, time
+from functools import lru_cache
 ENC = "cp860"  # acentos PT-BR em muitas térmicas
 
 def _encode(s: str) -> bytes:
@@ -41,38 +42,185 @@ def _to_escpos_bytes(lines):
     bbody = b"".join([_encode(l) + b"\n" for l in (lines or [])])
     return INIT + bbody + _cut()
 
-def print_ticket(lines):
-    """Imprime via TCP (host/port) ou via Spooler do Windows (nome da impressora)."""
-    host = os.getenv("TICKET_PRINTER_HOST")
-    port = int(os.getenv("TICKET_PRINTER_PORT","9100"))
-    name = os.getenv("TICKET_PRINTER_NAME")  # ex.: EPSON TM-T20 ReceiptE4
-    raw = _to_escpos_bytes(lines)
+# ---------------------- tickets pré-compilados ----------------------
+# Tudo que não muda entre impressões (logo, cabeçalho centralizado, separadores,
+# rótulos, área de assinatura, corte) é codificado uma vez por layout; por ticket
+# só os valores dos campos passam por cp860. Mesmo resultado de
+# _to_escpos_bytes(build_ticket_lines(...)) quando não há logo/QR.
+
+INIT = b"\x1b\x40"
+ALIGN_LEFT = b"\x1b\x61\x00"
+ALIGN_CENTER = b"\x1b\x61\x01"
+
+def _lines(lines):
+    return b"".join(_encode(l) + b"\n" for l in lines)
+
+class TicketTemplate:
+    def __init__(self, title, header_lines, cols, labels, ask_signature=False, logo=b""):
+        cols = self.cols = int(cols or 40)
+        sep = "-" * cols
+        head = [h.center(cols) for h in (header_lines or [])] + [sep, title.center(cols), sep]
+        self._head = INIT + (ALIGN_CENTER + logo + ALIGN_LEFT if logo else b"") + _lines(head)
+        self._labels = [(len(str(k)), _encode(f"{k}: "), _encode(f"{k}:\n")) for k in labels]
+        self._sep = _lines([sep])
+        self._sign = _lines(["Assinatura:".ljust(cols), "", "_" * int(cols * 0.6), sep]) if ask_signature else b""
+        self._end = b"\n" + _cut()
+
+    def render(self, values, qr=b""):
+        """Bytes ESC/POS do ticket; `values` na ordem dos rótulos, `qr` de qr_code()."""
+        cols = self.cols
+        out = [self._head]
+        for (n, inline, block), v in zip(self._labels, values):
+            v = "-" if v is None or v == "" else str(v)
+            if n + 2 + len(v) <= cols:
+                out += [inline, _encode(v), b"\n"]
+            else:
+                out.append(block)
+                out += [_encode(v[i:i + cols]) + b"\n" for i in range(0, len(v), cols)]
+        out.append(self._sep)
+        if qr:
+            out += [ALIGN_CENTER, qr, b"\n", ALIGN_LEFT]
+        out += [self._sign, self._end]
+        return b"".join(out)
+
+def raster_image(path, max_dots=384, max_height=240):
+    """Imagem (logo) em raster ESC/POS (GS v 0); convertida uma vez por arquivo/mtime."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return b""
+    return _raster(path, mtime, int(max_dots), int(max_height))
+
+@lru_cache(maxsize=8)
+def _raster(path, mtime, max_dots, max_height):
+    from PIL import Image
+    with Image.open(path) as im:
+        im = im.convert("RGBA")
+        bg = Image.new("RGBA", im.size, "white")
+        bg.alpha_composite(im)
+        im = bg.convert("L")
+    f = min(1.0, max_dots / im.width, max_height / im.height)
+    if f < 1:
+        im = im.resize((max(1, int(im.width * f)), max(1, int(im.height * f))), Image.LANCZOS)
+    # no modo "1" do Pillow bit 1 = branco; na impressora bit 1 = ponto preto
+    bits = im.point(lambda p: 255 - p).convert("1")
+    w, h = bits.size
+    wb = (w + 7) // 8
+    return b"\x1d\x76\x30\x00" + bytes([wb & 0xFF, wb >> 8, h & 0xFF, h >> 8]) + bits.tobytes()
+
+@lru_cache(maxsize=256)
+def qr_code(data, size=6):
+    """QR nativo da impressora (GS ( k, modelo 2, correção M): só os bytes do comando."""
+    d = _encode(data)
+    n = len(d) + 3
+    return (b"\x1d(k\x04\x001A2\x00"                  # modelo 2
+            + b"\x1d(k\x03\x001C" + bytes([size])       # tamanho do módulo
+            + b"\x1d(k\x03\x001E1"                      # correção de erro M
+            + b"\x1d(k" + bytes([n & 0xFF, n >> 8]) + b"1P0" + d
+            + b"\x1d(k\x03\x001Q0")                     # imprime
+
+class PrinterError(Exception):
+    pass
+
+class PrinterConnection:
+    """
+    Conexão mantida com a impressora: TCP (host/port) ou Spooler do Windows (nome).
+    O socket TCP fica aberto entre tickets e é reaberto se a impressora caiu;
+    fecha depois de `idle` segundos parado (muitas térmicas só aceitam um
+    cliente por vez na 9100).
+    """
+    def __init__(self, host=None, port=9100, name=None, timeout=5, idle=60):
+        self.host, self.port, self.name = host, int(port), name
+        self.timeout, self.idle = timeout, idle
+        self.sock = None
+        self.last_used = 0.0
+        self.last_error = None
+
+    @property
+    def connected(self):
+        return self.sock is not None
 
-    if host:
+    def send(self, raw):
         try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            s.settimeout(5)
-            s.connect((host, port))
-            s.sendall(raw)
-            s.close()
-            return True, None
+            if self.host:
+                self._send_tcp(raw)
+            elif self.name:
+                self._send_win32(raw)
+            else:
+                raise PrinterError("Nenhuma impressora configurada. Defina TICKET_PRINTER_NAME (USB) ou TICKET_PRINTER_HOST.")
         except Exception as e:
-            return False, str(e)
+            self.last_error = str(e) or e.__class__.__name__
+            raise
+        self.last_error = None
+        self.last_used = time.monotonic()
 
-    if name:
+    def _connect(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+
+    def _alive(self):
+        """Conexão antiga ainda aberta do lado da impressora? (EOF/erro = caiu)"""
         try:
-            import win32print
-            h = win32print.OpenPrinter(name)
-            try:
-                job = win32print.StartDocPrinter(h, 1, ("Ticket", None, "RAW"))
-                win32print.StartPagePrinter(h)
-                win32print.WritePrinter(h, raw)
-                win32print.EndPagePrinter(h)
-                win32print.EndDocPrinter(h)
-            finally:
-                win32print.ClosePrinter(h)
-            return True, None
-        except Exception as e:
-            return False, str(e)
+            readable, _, _ = select.select([self.sock], [], [], 0)
+            if readable and not self.sock.recv(1024):   # bytes de status são descartados
+                return False
+            return True
+        except OSError:
+            return False
+
+    def _send_tcp(self, raw):
+        if self.sock is not None and not self._alive():
+            self.close()
+        reused = self.sock is not None
+        if not reused:
+            self._connect()
+        try:
+            self.sock.sendall(raw)
+        except OSError:
+            self.close()
+            if not reused:
+                raise
+            self._connect()             # conexão velha morreu no meio: uma nova tentativa
+            self.sock.sendall(raw)
+
+    def _send_win32(self, raw):
+        import win32print
+        h = win32print.OpenPrinter(self.name)
+        try:
+            win32print.StartDocPrinter(h, 1, ("Ticket", None, "RAW"))
+            win32print.StartPagePrinter(h)
+            win32print.WritePrinter(h, raw)
+            win32print.EndPagePrinter(h)
+            win32print.EndDocPrinter(h)
+        finally:
+            win32print.ClosePrinter(h)
+
+    def close_if_idle(self):
+        if self.sock is not None and time.monotonic() - self.last_used > self.idle:
+            self.close()
+
+    def close(self):
+        if self.sock is not None:
+            try: self.sock.close()
+            except OSError: pass
+            self.sock = None
 
-    return False, "Nenhuma impressora configurada. Defina TICKET_PRINTER_NAME (USB) ou TICKET_PRINTER_HOST."
+def printer_from_env():
+    return PrinterConnection(
+        host=os.getenv("TICKET_PRINTER_HOST") or None,
+        port=os.getenv("TICKET_PRINTER_PORT", "9100"),
+        name=os.getenv("TICKET_PRINTER_NAME") or None,
+        timeout=float(os.getenv("TICKET_PRINTER_TIMEOUT", "5")),
+        idle=float(os.getenv("PRINTER_IDLE_SECONDS", "60")),
+    )
+
+def print_ticket(lines):
+    """Imprime na hora (bloqueia até a impressora responder). O PDV usa a fila: blueprints/pdv/spooler.py."""
+    printer = printer_from_env()
+    try:
+        printer.send(_to_escpos_bytes(lines))
+        return True, None
+    except Exception as e:
+        return False, str(e)
+    finally:
+        printer.close()